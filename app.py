@@ -2,8 +2,41 @@ import streamlit as st
 import time
 import random
 import json
-import base64
-from datetime import datetime
+import contextlib
+import copy
+import csv
+import functools
+import hashlib
+import importlib
+import io
+import logging
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from collections import deque
+from urllib.parse import quote
+from datetime import date, datetime, timedelta, timezone
+
+# Datastore plumbing lives in the nodex package: Streamlit re-executes this script on
+# every rerun, but imported modules (and the classes and context variables they
+# define) are loaded once per process.
+from nodex.caching import LRUCache, ReadCache
+from nodex.local_backend import create_local_client
+from nodex.metering import (
+    LATENCY_BUCKETS_MS, CountingFirestore, DatastoreMeter, estimate_cost, histogram_percentile, metered,
+)
+from nodex.mirror import MIRROR_STALE_SECONDS, SnapshotMirror
+from nodex.profiling import PROFILE_SLOW_RERUN_MS, RenderProfiler, profile_span, profiled
+from nodex.resilience import (
+    DATASTORE_READ_DEADLINE_SECONDS, CircuitBreaker, DatastoreUnavailable, LastGoodReads, ParallelFetcher, resilient,
+)
+from nodex.write_queue import WRITE_QUEUE_MAX_ATTEMPTS, WRITE_QUEUE_MAX_DEPTH, PeriodicTask, VisitBuffer, WriteQueue, WriteQueueFull
+
+# Start of this script run; time to first paint is measured from here
+RUN_STARTED = time.perf_counter()
+
+logger = logging.getLogger("nodex")
 
 # ==========================================
 # 1. CONFIGURATION & TRANSLATIONS
@@ -14,6 +47,9 @@ PRIMARY_COLOR = "#C40046"  # POSTECH Signature Red
 SECONDARY_COLOR = "#333333"
 ACCENT_COLOR = "#F0F2F6"
 
+# static/theme.css as served by Streamlit (server.enableStaticServing in .streamlit/config.toml)
+THEME_CSS_URL = "app/static/theme.css"
+
 # Language Dictionary
 TRANSLATIONS = {
     "en": {
@@ -60,6 +96,8 @@ TRANSLATIONS = {
         "mypage_no_events": "You haven't joined any events yet.",
         "mypage_login_prompt": "Enter your name to view your profile",
         "mypage_view": "View Profile",
+        "db_unavailable": "The database is not responding right now. Please try again in a moment.",
+        "db_stale": "The database is not responding; showing data saved at {time}.",
     },
     "kr": {
         "nav_home": "홈",
@@ -105,6 +143,8 @@ TRANSLATIONS = {
         "mypage_no_events": "아직 참여한 이벤트가 없습니다.",
         "mypage_login_prompt": "프로필을 보려면 이름을 입력하세요",
         "mypage_view": "프로필 보기",
+        "db_unavailable": "지금은 데이터베이스가 응답하지 않습니다. 잠시 후 다시 시도해주세요.",
+        "db_stale": "데이터베이스가 응답하지 않아 {time}에 저장된 데이터를 표시합니다.",
     }
 }
 
@@ -213,30 +253,416 @@ INITIAL_EVENTS = [
     }
 ]
 
+# Format of the human-readable `date` string on events
+EVENT_DATE_FORMAT = "%Y-%m-%d %H:%M"
+
+# Timezone event dates are written in, whatever the server's; `timezone` under [events] in secrets overrides it
+EVENT_TIMEZONE = "Asia/Seoul"
+
+def event_timezone():
+    from zoneinfo import ZoneInfo
+    return ZoneInfo(get_settings("events").get("timezone", EVENT_TIMEZONE))
+
+def parse_event_date(value):
+    """Parses an event `date` string (in the event timezone) into an aware datetime (None if invalid)."""
+    try:
+        return datetime.strptime(value, EVENT_DATE_FORMAT).replace(tzinfo=event_timezone())
+    except (ValueError, TypeError):
+        return None
+
+def event_start_cutoff():
+    """Returns (cutoff, seconds until it moves): events starting at or before cutoff have started.
+
+    Event dates have minute precision, so the cutoff is the start of the current
+    minute, and a read using it stays correct until the next one.
+    """
+    now = datetime.now(timezone.utc)
+    return now.replace(second=0, microsecond=0), 60 - now.second - now.microsecond / 1e6
+
+# Granularities of the time-series stats, finest first
+STATS_PERIODS = ("day", "week", "month")
+
+def period_key(period, day):
+    """Returns (key, start datetime) of the day/week/month period containing a date."""
+    if period == "day":
+        start, key = day, day.isoformat()
+    elif period == "week":
+        start = day - timedelta(days=day.weekday())
+        iso_year, iso_week, _ = start.isocalendar()
+        key = f"{iso_year}-W{iso_week:02d}"
+    elif period == "month":
+        start = day.replace(day=1)
+        key = start.strftime("%Y-%m")
+    else:
+        raise ValueError(f"Unknown stats period: {period}")
+    return key, datetime.combine(start, datetime.min.time()).astimezone()
+
+def period_range(period, first_day, last_day):
+    """Lists (key, start) for every period overlapping [first_day, last_day], in order."""
+    periods = []
+    day = first_day
+    while day <= last_day:
+        key, start = period_key(period, day)
+        periods.append((key, start))
+        if period == "day":
+            day = start.date() + timedelta(days=1)
+        elif period == "week":
+            day = start.date() + timedelta(days=7)
+        else:
+            day = (start.date().replace(day=28) + timedelta(days=4)).replace(day=1)
+    return periods
+
+def with_event_timestamp(event_data):
+    """Returns a copy of the event with the typed `starts_at` field derived from `date`.
+
+    Raises ValueError if `date` is not in EVENT_DATE_FORMAT.
+    """
+    event = dict(event_data)
+    event["starts_at"] = parse_event_date(event.get("date"))
+    if event["starts_at"] is None:
+        raise ValueError(f"Invalid event date {event.get('date')!r}, expected YYYY-MM-DD HH:MM")
+    return event
+
+# Event fields owned by joins; imports set them on new events only
+EVENT_JOIN_FIELDS = ("current_participants", "participant_names")
+
+# Defaults for fields an imported event leaves out
+EVENT_DEFAULTS = {"current_participants": 0, "max_participants": 20, "participant_names": [], "is_upcoming": True}
+
+def event_import_id(event):
+    """Deterministic document ID for an imported event: its own "id", else a hash of title and date.
+
+    Re-importing the same event therefore updates it instead of creating a duplicate.
+    """
+    if event.get("id"):
+        return str(event["id"])
+    source = f"{event.get('title_en', '').strip().lower()}|{event.get('date', '').strip()}"
+    return "evt_" + hashlib.sha1(source.encode("utf-8")).hexdigest()[:16]
+
+def parse_event_file(file_name, data):
+    """Parses uploaded events from JSON (a list, or {"events": [...]}) or CSV bytes.
+
+    CSV columns are event fields; `schedule` and `participant_names` hold JSON,
+    numeric and boolean columns are converted. Raises ValueError on malformed input.
+    """
+    text = data.decode("utf-8-sig")
+    if file_name.lower().endswith(".csv"):
+        events = []
+        for row in csv.DictReader(io.StringIO(text)):
+            event = {key.strip(): value.strip() for key, value in row.items() if key and value and value.strip()}
+            for field in ("current_participants", "max_participants", "duration_hours"):
+                if field in event:
+                    event[field] = float(event[field]) if "." in event[field] else int(event[field])
+            if "is_upcoming" in event:
+                event["is_upcoming"] = event["is_upcoming"].lower() in ("true", "1", "yes", "y")
+            for field in ("schedule", "participant_names"):
+                if field in event:
+                    event[field] = json.loads(event[field])
+            events.append(event)
+    else:
+        events = json.loads(text)
+        if isinstance(events, dict):
+            events = events.get("events", [])
+    if not isinstance(events, list) or not all(isinstance(event, dict) for event in events):
+        raise ValueError("Expected a list of event objects.")
+    missing = [i + 1 for i, event in enumerate(events) if not event.get("title_en") or not event.get("date")]
+    if missing:
+        raise ValueError(f"Events without title_en or date: {', '.join(map(str, missing[:10]))}")
+    invalid = [i + 1 for i, event in enumerate(events) if parse_event_date(event["date"]) is None]
+    if invalid:
+        raise ValueError(f"Events with a date not in YYYY-MM-DD HH:MM format: {', '.join(map(str, invalid[:10]))}")
+    return events
+
 # ==========================================
 # 2. FIREBASE DATABASE (Real Persistence)
 # ==========================================
-import firebase_admin
-from firebase_admin import credentials, firestore
-from google.cloud.firestore import Increment
+# firebase_admin and google.cloud.firestore take a few hundred ms to import, so they are
+# imported where they are used: the client is built by the background warmup (see
+# get_warmup), and the write transforms are imported by the methods that write them.
+
+# Shards per distributed counter; each write picks one at random so writes don't contend
+COUNTER_SHARDS = 10
+
+# Firestore rejects batches with more than 500 writes
+MAX_BATCH_WRITES = 500
+
+# Recent name -> user ID resolutions kept in memory
+NAME_CACHE_SIZE = 1024
+
+# Seconds a session reads its own writes from Firestore instead of the live mirror
+MIRROR_WRITE_GRACE_SECONDS = 2
+
+# Reviews shown per page of the reviews wall
+REVIEWS_PAGE_SIZE = 12
+
+# Seconds visits are counted in memory before their sums are written (or queued) in one batch
+VISIT_FLUSH_SECONDS = 10
+
+# Stands in for firestore.DELETE_FIELD in queued user updates, which are stored as JSON
+QUEUED_DELETE_FIELD = {"__nodex_delete_field__": True}
+
+# Seconds between background sweeps that move started events to past
+EVENT_SWEEP_SECONDS = 60
+
+def normalize_name(name):
+    """Case- and whitespace-insensitive form of a member name used for lookups."""
+    return " ".join((name or "").split()).casefold()
+
+def name_index_id(normalized):
+    """Document ID in the user_names index for a normalized name."""
+    return quote(normalized, safe="")
+
+def get_settings(section):
+    """Returns a section of .streamlit/secrets.toml as a dict (empty if missing)."""
+    try:
+        return dict(st.secrets.get(section, {}))
+    except FileNotFoundError:
+        return {}
 
 @st.cache_resource
 def get_db():
-    """Initializes Firebase and returns the Firestore client."""
+    """Initializes Firebase and returns the Firestore client.
+
+    Set `backend = "memory"` or `backend = "sqlite"` (with `sqlite_path`) under
+    [storage] in secrets to use a local backend instead of Firestore.
+    """
+    storage_settings = get_settings("storage")
+    if storage_settings.get("backend", "firestore") != "firestore":
+        return create_local_client(storage_settings)
+
     # Check if Firebase credentials are set in secrets
     if "firebase" not in st.secrets:
         return None
 
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+
     # Check if app is already initialized
     if not firebase_admin._apps:
         cred = credentials.Certificate(dict(st.secrets["firebase"]))
         firebase_admin.initialize_app(cred)
     
-    return firestore.client()
+    return CountingFirestore(firestore.client())
+
+@st.cache_resource
+def get_name_cache():
+    """Returns the name -> user ID cache shared by all sessions."""
+    return LRUCache(NAME_CACHE_SIZE)
+
+@st.cache_resource
+def get_read_cache():
+    """Returns the read cache shared by all sessions in this server process."""
+    return ReadCache()
+
+@st.cache_resource
+def get_datastore_meter():
+    """Returns the datastore meter shared by all sessions."""
+    return DatastoreMeter()
+
+@st.cache_resource
+def get_event_sweeper():
+    """Starts the background sweep that archives started events (None without a database)."""
+    db_client = get_db()
+    if db_client is None:
+        return None
+    writer = RealFirestore(db_client, cache=get_read_cache(), meter=get_datastore_meter(), breaker=get_circuit_breaker())
+    return PeriodicTask(writer.archive_started_events, EVENT_SWEEP_SECONDS, "nodex-event-sweep")
+
+def write_queue_path():
+    """Where queued writes are stored: `path` under [write_queue], else next to the data they belong to.
+
+    None for the memory backend: its data is lost when the process exits, so its queue
+    lives in a temporary directory that is removed with it.
+    """
+    path = get_settings("write_queue").get("path")
+    if path:
+        return path
+    storage_settings = get_settings("storage")
+    backend = storage_settings.get("backend", "firestore")
+    if backend == "sqlite":
+        return storage_settings.get("sqlite_path", "nodex.db") + ".queue"
+    if backend == "memory":
+        return None
+    return ".nodex_write_queue.db"
+
+@st.cache_resource
+def get_write_queue():
+    """Returns the write-behind queue shared by all sessions.
+
+    None without a database, or with `enabled = false` under [write_queue] (writes are
+    then applied synchronously).
+    """
+    db_client = get_db()
+    settings = get_settings("write_queue")
+    if db_client is None or not settings.get("enabled", True):
+        return None
+    writer = RealFirestore(db_client, cache=get_read_cache(), meter=get_datastore_meter(), breaker=get_circuit_breaker())
+
+    def apply_visits(visits):
+        counts = {}
+        for visit in visits:
+            for day, count in visit["counts"].items():
+                counts[day] = counts.get(day, 0) + count
+        writer.flush_visits(counts)
+
+    return WriteQueue(
+        write_queue_path(),
+        {"visit": apply_visits, "review": writer.add_reviews, "user_update": writer.apply_user_updates},
+        max_depth=int(settings.get("max_depth", WRITE_QUEUE_MAX_DEPTH)),
+    )
+
+@st.cache_resource
+def get_visit_buffer():
+    """Returns the visit counts shared by all sessions (None without a database).
+
+    Their sums go to the write queue every VISIT_FLUSH_SECONDS, or straight to the
+    sharded counters when the queue is disabled.
+    """
+    db_client = get_db()
+    if db_client is None:
+        return None
+    queue = get_write_queue()
+    if queue is None:
+        writer = RealFirestore(db_client, cache=get_read_cache(), meter=get_datastore_meter(), breaker=get_circuit_breaker())
+        return VisitBuffer(writer.flush_visits, VISIT_FLUSH_SECONDS)
+    return VisitBuffer(lambda counts: queue.enqueue("visit", {"counts": counts}), VISIT_FLUSH_SECONDS)
+
+@st.cache_resource
+def get_fetcher():
+    """Returns the parallel fetcher shared by all sessions."""
+    return ParallelFetcher()
+
+@st.cache_resource
+def get_circuit_breaker():
+    """Returns the circuit breaker shared by every datastore call in this process."""
+    return CircuitBreaker()
+
+@st.cache_resource
+def get_last_good_reads():
+    """Returns the last good read results shared by all sessions."""
+    return LastGoodReads()
+
+@st.cache_resource
+def get_render_profiler():
+    """Returns the render profiler configured from [profiling] in secrets."""
+    settings = get_settings("profiling")
+    return RenderProfiler(
+        enabled=bool(settings.get("enabled", False)),
+        slow_rerun_ms=float(settings.get("slow_rerun_ms", PROFILE_SLOW_RERUN_MS)),
+        cprofile=bool(settings.get("cprofile", False)),
+        trace_dir=settings.get("trace_dir", ".nodex_traces"),
+    )
+
+@st.cache_resource
+def get_snapshot_mirror():
+    """Returns the live mirror shared by all sessions, or None unless enabled in [storage]."""
+    db_client = get_db()
+    if db_client is None or not get_settings("storage").get("mirror", False):
+        return None
+    return SnapshotMirror(db_client)
 
 class RealFirestore:
-    def __init__(self, db_client):
-        self.db = db_client
+    def __init__(self, db_client, cache=None, name_cache=None, write_queue=None, meter=None, mirror=None, warmup=None,
+                 breaker=None, last_good=None, visit_buffer=None):
+        self._db = db_client
+        self.cache = cache if cache is not None else ReadCache()
+        self.name_cache = name_cache if name_cache is not None else LRUCache(NAME_CACHE_SIZE)
+        self._write_queue = write_queue
+        self.meter = meter
+        self._mirror = mirror
+        self._visit_buffer = visit_buffer
+        # Future from get_warmup(); the client and shared services come from it on first use
+        self._warmup = warmup
+        self._written_at = {}
+        # Without a breaker, calls run unguarded (no deadlines, retries or stale results)
+        self.breaker = breaker
+        self.last_good = last_good
+        # {method: saved_at} of the reads answered from last good results; reset by the UI each rerun
+        self.stale_reads = {}
+
+    def _await_warmup(self):
+        warmup = self._warmup
+        if warmup is not None:
+            services = warmup.result()
+            self._db = services["db_client"]
+            self._write_queue = services["write_queue"]
+            self._mirror = services["mirror"]
+            self._visit_buffer = services["visit_buffer"]
+            self._warmup = None
+
+    @property
+    def db(self):
+        """The datastore client (None without one); waits for the background warmup if it is still running."""
+        self._await_warmup()
+        return self._db
+
+    @property
+    def write_queue(self):
+        """Write-behind queue for reviews, visits and user updates (None: write synchronously)."""
+        self._await_warmup()
+        return self._write_queue
+
+    @property
+    def mirror(self):
+        self._await_warmup()
+        return self._mirror
+
+    @property
+    def visit_buffer(self):
+        """Visit counts not written yet; without a shared one, this client keeps its own."""
+        if self._visit_buffer is None and self.db:
+            self._visit_buffer = VisitBuffer(self.flush_visits, VISIT_FLUSH_SECONDS)
+        return self._visit_buffer
+
+    def op_counts(self, since=None):
+        """Backend operations made in the current context (None without a connected backend).
+
+        With `since`, returns the difference from an earlier op_counts() result.
+        Returns None rather than waiting while the client is still being built.
+        """
+        if self._warmup is not None and not self._warmup.done():
+            return None
+        if not hasattr(self.db, "op_counts"):
+            return None
+        counts = self.db.op_counts()
+        if since:
+            counts = {key: value - since.get(key, 0) for key, value in counts.items()}
+        return counts
+
+    def op_scope(self):
+        """Context manager in which op_counts() covers only the operations made inside it.
+
+        Does nothing without a counting backend, or while the client is still being built.
+        """
+        if self._warmup is not None and not self._warmup.done():
+            return contextlib.nullcontext()
+        if not hasattr(self.db, "op_scope"):
+            return contextlib.nullcontext()
+        return self.db.op_scope()
+
+    def _cached(self, key, loader, ttl=None):
+        """Serves a read through the shared cache (or straight from the live mirror)."""
+        if self._reader(key[0]) is not self.db:
+            return loader()
+        return self.cache.get_or_load(key, loader, ttl)
+
+    def _reader(self, collection):
+        """Client to read a collection from: the live mirror if it is usable, else Firestore.
+
+        Right after this session writes to a collection it reads Firestore directly,
+        so its own change shows even if the mirror has not received it yet.
+        """
+        if self.mirror is None or not self.mirror.is_live(collection):
+            return self.db
+        if time.monotonic() - self._written_at.get(collection, 0) < MIRROR_WRITE_GRACE_SECONDS:
+            return self.db
+        return self.mirror.client
+
+    def _invalidate(self, *namespaces):
+        """Drops cached reads after a write; namespaces match collection names."""
+        self.cache.invalidate(*namespaces)
+        for namespace in namespaces:
+            self._written_at[namespace] = time.monotonic()
 
     def collection(self, name):
         # Wrapper to allow stream() usage similar to previous code
@@ -252,228 +678,1315 @@ class RealFirestore:
             return data
         return doc # Already a dict (Mock case)
 
+    @metered
+    @resilient("read")
     def get_events(self, limit=None):
         """Fetches events as a list of dictionaries."""
         if not self.db: return []
         
-        # Fetch stream
-        docs = self.db.collection("events").stream()
-        
-        # Convert to list of dicts
-        events = [self._to_dict(doc) for doc in docs]
+        # Fetch stream (shared across sessions through the read cache)
+        events = self._cached(
+            ("events", "all"),
+            lambda: [self._to_dict(doc) for doc in self._reader("events").collection("events").stream()]
+        )
         
         # Apply limit if requested
         if limit:
             return events[:limit]
         return events
 
+    @metered
+    @resilient("read")
     def get_reviews(self):
         """Fetches reviews as a list of dictionaries."""
         if not self.db: return []
-        docs = self.db.collection("reviews").stream()
-        return [self._to_dict(doc) for doc in docs]
+        reviews = self._cached(
+            ("reviews", "all"),
+            lambda: [self._to_dict(doc) for doc in self._reader("reviews").collection("reviews").stream()]
+        )
+        stored = {review["id"] for review in reviews}
+        return reviews + [review for review in self._queued("review") if review["id"] not in stored]
 
+    @metered
+    @resilient("read")
+    def get_visible_reviews_page(self, limit=REVIEWS_PAGE_SIZE, after=None):
+        """Fetches one page of visible reviews, newest first.
+
+        `after` is the cursor returned with the previous page. Returns (reviews, cursor);
+        the cursor is None once the last page has been read.
+        """
+        if not self.db: return [], None
+        from firebase_admin import firestore
+
+        def load():
+            query = (self._reader("reviews").collection("reviews")
+                     .where("is_visible", "==", True)
+                     .order_by("created_at", direction=firestore.Query.DESCENDING)
+                     .order_by("__name__", direction=firestore.Query.DESCENDING)
+                     .limit(limit))
+            if after:
+                created_at, review_id = after
+                query = query.start_after({"created_at": created_at, "__name__": review_id})
+            return [self._to_dict(doc) for doc in query.stream()]
+
+        reviews = self._cached(("reviews", "visible", limit, after), load)
+        cursor = (reviews[-1].get("created_at"), reviews[-1]["id"]) if len(reviews) == limit else None
+        if after is None:
+            # Queued reviews are the newest: show them on top of the first page until they are stored
+            stored = {review["id"] for review in reviews}
+            queued = [review for review in reversed(self._queued("review"))
+                      if review["id"] not in stored and review.get("is_visible", True)]
+            reviews = queued + reviews
+        return reviews, cursor
+
+    def _queued(self, kind):
+        """Payloads of `kind` still waiting in the write queue, oldest first, so reads include them."""
+        return self.write_queue.pending(kind) if self.write_queue is not None else []
+
+    @metered
     def add_review(self, review_data):
-        """Add a new review to the database."""
+        """Add a new review and count it in its event's rating aggregate, in one transaction.
+
+        With a write queue the review is only queued (WriteQueueFull if it stays full);
+        reads include it until the background worker has stored it.
+        """
         if not self.db: return None
         review_data['created_at'] = datetime.now().strftime("%Y-%m-%d %H:%M")
         review_data['is_visible'] = True  # Reviews are visible by default
-        doc_ref = self.db.collection("reviews").add(review_data)
-        return doc_ref
+        review_ref = self.db.collection("reviews").document()
+        # Queued writes are accepted even while the circuit breaker is open
+        if self.write_queue is not None:
+            self.write_queue.enqueue("review", {**review_data, "id": review_ref.id})
+        else:
+            self.add_reviews([{**review_data, "id": review_ref.id}])
+        return review_ref
+
+    @metered
+    @resilient("write")
+    def add_reviews(self, reviews):
+        """Stores queued reviews (each with its document "id") and their ratings in one transaction.
+
+        Reviews that already exist are skipped, so a retried batch is never counted twice.
+        """
+        if not self.db or not reviews: return
+        refs = {review["id"]: self.db.collection("reviews").document(review["id"]) for review in reviews}
+
+        def attempt(transaction):
+            stored = {snapshot.id for snapshot in self.db.get_all(list(refs.values()), transaction=transaction)
+                      if snapshot.exists}
+            new = [review for review in reviews if review["id"] not in stored]
+            self._apply_rating_changes(transaction, *((None, review) for review in new))
+            for review in new:
+                transaction.set(refs[review["id"]], {k: v for k, v in review.items() if k != "id"})
 
+        self._run_transaction(attempt)
+        self._invalidate("reviews")
+
+    def _amend_queued_review(self, review_id, change):
+        """Applies change(review) to the review if it is still in the write queue; True if it was."""
+        if self.write_queue is None:
+            return False
+        return self.write_queue.amend("review", lambda review: change(review) if review["id"] == review_id else review) > 0
+
+    @metered
     def update_review(self, review_id, updates):
-        """Update specific fields of a review."""
+        """Update specific fields of a review, moving its rating in or out of the aggregate as needed.
+
+        A review still waiting in the write queue is changed there.
+        """
         if not self.db: return
-        self.db.collection("reviews").document(review_id).update(updates)
+        if self._amend_queued_review(review_id, lambda review: {**review, **updates}):
+            return
+        self._update_stored_review(review_id, updates)
+
+    @resilient("write")
+    def _update_stored_review(self, review_id, updates):
+        review_ref = self.db.collection("reviews").document(review_id)
 
+        def attempt(transaction):
+            snapshot = next(iter(self.db.get_all([review_ref], transaction=transaction)), None)
+            if snapshot is None or not snapshot.exists:
+                return
+            before = snapshot.to_dict()
+            self._apply_rating_changes(transaction, (before, {**before, **updates}))
+            transaction.update(review_ref, updates)
+
+        self._run_transaction(attempt)
+        self._invalidate("reviews")
+
+    @metered
     def delete_review(self, review_id):
-        """Delete a review from the database."""
+        """Delete a review and remove it from its event's rating aggregate.
+
+        A review still waiting in the write queue is dropped from it.
+        """
         if not self.db: return
-        self.db.collection("reviews").document(review_id).delete()
+        if self._amend_queued_review(review_id, lambda review: None):
+            return
+        self._delete_stored_review(review_id)
+
+    @resilient("write")
+    def _delete_stored_review(self, review_id):
+        review_ref = self.db.collection("reviews").document(review_id)
+
+        def attempt(transaction):
+            snapshot = next(iter(self.db.get_all([review_ref], transaction=transaction)), None)
+            if snapshot is None or not snapshot.exists:
+                return
+            self._apply_rating_changes(transaction, (snapshot.to_dict(), None))
+            transaction.delete(review_ref)
+
+        self._run_transaction(attempt)
+        self._invalidate("reviews")
+
+    @staticmethod
+    def _rating_contribution(review):
+        """(event_id, rating) a review adds to the aggregates, or None if it is hidden."""
+        if not review or not review.get("is_visible", True) or not review.get("event_id"):
+            return None
+        return review["event_id"], int(review.get("rating", 5))
+
+    @staticmethod
+    def _add_rating(aggregate, rating, sign):
+        histogram = aggregate.setdefault("histogram", {})
+        histogram[str(rating)] = histogram.get(str(rating), 0) + sign
+        if not histogram[str(rating)]:
+            del histogram[str(rating)]
+        aggregate["count"] = aggregate.get("count", 0) + sign
+        aggregate["sum"] = aggregate.get("sum", 0) + sign * rating
+        aggregate["average"] = round(aggregate["sum"] / aggregate["count"], 2) if aggregate["count"] else None
+
+    def _apply_rating_changes(self, transaction, *transitions):
+        """Updates event_ratings inside a transaction for reviews going from `before` to `after`.
+
+        Each transition is a (before, after) pair; either side may be None (review added
+        or deleted). Reads the affected aggregates before writing them, so it must run
+        before the transaction's other writes.
+        """
+        changes = []
+        for before, after in transitions:
+            old = self._rating_contribution(before)
+            new = self._rating_contribution(after)
+            if old != new:
+                changes += [(contribution, sign) for contribution, sign in ((old, -1), (new, 1)) if contribution]
+        if not changes:
+            return
+        refs = {
+            contribution[0]: self.db.collection("event_ratings").document(contribution[0])
+            for contribution, _ in changes
+        }
+        aggregates = {event_id: {"event_id": event_id, "count": 0, "sum": 0, "histogram": {}} for event_id in refs}
+        for snapshot in self.db.get_all(list(refs.values()), transaction=transaction):
+            if snapshot.exists:
+                aggregates[snapshot.id].update(snapshot.to_dict())
+        for (event_id, rating), sign in changes:
+            self._add_rating(aggregates[event_id], rating, sign)
+        for event_id, aggregate in aggregates.items():
+            transaction.set(refs[event_id], aggregate)
+
+    @metered
+    @resilient("read")
+    def get_event_ratings(self, event_ids):
+        """Rating aggregates for several events with one multi-document get.
+
+        Returns {event_id: {"count", "sum", "average", "histogram"}}; events without
+        visible reviews are left out.
+        """
+        if not self.db: return {}
+
+        keys = {event_id: ("reviews", "rating", event_id) for event_id in event_ids if event_id}
+        hits, generation = self.cache.get_many(list(keys.values()))
+        ratings = {event_id: hits[key] for event_id, key in keys.items() if key in hits}
 
+        missing = [event_id for event_id in keys if event_id not in ratings]
+        if missing:
+            refs = [self.db.collection("event_ratings").document(event_id) for event_id in missing]
+            loaded = {event_id: None for event_id in missing}
+            for doc in self.db.get_all(refs):
+                if doc.exists:
+                    loaded[doc.id] = doc.to_dict()
+            self.cache.put_many({keys[event_id]: rating for event_id, rating in loaded.items()}, generation)
+            ratings.update(copy.deepcopy(loaded))
+
+        for review in self._queued("review"):
+            contribution = self._rating_contribution(review)
+            if contribution and contribution[0] in keys:
+                event_id, rating = contribution
+                aggregate = ratings[event_id] = copy.deepcopy(ratings.get(event_id) or {})
+                self._add_rating(aggregate, rating, 1)
+
+        return {event_id: rating for event_id, rating in ratings.items() if rating and rating.get("count")}
+
+    @metered
+    @resilient("write")
+    def rebuild_rating_aggregates(self):
+        """Recomputes every event_ratings document from the reviews collection.
+
+        Returns the number of events with visible reviews.
+        """
+        if not self.db: return 0
+
+        aggregates = {}
+        for doc in self.db.collection("reviews").stream():
+            contribution = self._rating_contribution(doc.to_dict())
+            if contribution:
+                event_id, rating = contribution
+                aggregate = aggregates.setdefault(event_id, {"event_id": event_id, "count": 0, "sum": 0, "histogram": {}})
+                self._add_rating(aggregate, rating, 1)
+
+        writes = [
+            ("set", self.db.collection("event_ratings").document(event_id), aggregate)
+            for event_id, aggregate in aggregates.items()
+        ]
+        writes += [
+            ("delete", ref, None)
+            for ref in self.db.collection("event_ratings").list_documents()
+            if ref.id not in aggregates
+        ]
+        self._commit_writes(writes)
+
+        self._invalidate("reviews")
+        return len(aggregates)
+
+    @metered
+    @resilient("read")
+    def get_upcoming_events(self, limit=None):
+        """Fetches upcoming events that have not started yet, closest first.
+
+        Filtering, ordering and the limit run in Firestore (a range query on
+        starts_at), so started events drop out before the sweep archives them.
+        The result is cached no longer than the current minute.
+        """
+        if not self.db: return []
+        cutoff, fresh_for = event_start_cutoff()
+
+        def load():
+            query = (self._reader("events").collection("events")
+                     .where("is_upcoming", "==", True)
+                     .where("starts_at", ">", cutoff)
+                     .order_by("starts_at"))
+            if limit:
+                query = query.limit(limit)
+            return [self._to_dict(doc) for doc in query.stream()]
+
+        return self._cached(("events", "upcoming", limit), load, ttl=min(self.cache.ttl, fresh_for))
+
+    @metered
+    @resilient("read")
     def get_past_events(self):
-        """Fetches past events (is_upcoming=False) as a list of dictionaries."""
+        """Fetches past events as a list of dictionaries, most recent first.
+
+        Past means marked past (is_upcoming=False) or already started but not yet
+        archived by the sweep. The result is cached no longer than the current minute.
+        """
         if not self.db: return []
-        all_events = self.db.collection("events").stream()
-        events = [self._to_dict(doc) for doc in all_events]
-        # Filter for past events only
-        return [e for e in events if e.get('is_upcoming', True) == False]
+        from firebase_admin import firestore
+        cutoff, fresh_for = event_start_cutoff()
+
+        def load():
+            events = self._reader("events").collection("events")
+            archived = (events.where("is_upcoming", "==", False)
+                        .order_by("starts_at", direction=firestore.Query.DESCENDING))
+            started = (events.where("is_upcoming", "==", True)
+                       .where("starts_at", "<=", cutoff)
+                       .order_by("starts_at", direction=firestore.Query.DESCENDING))
+            past = [self._to_dict(doc) for doc in archived.stream()]
+            past += [self._to_dict(doc) for doc in started.stream()]
+            # Events stored without a readable date sort last rather than failing the page
+            return sorted(past, key=lambda e: (e.get("starts_at") is not None, e.get("starts_at") or datetime.min),
+                          reverse=True)
+
+        return self._cached(("events", "past"), load, ttl=min(self.cache.ttl, fresh_for))
+
+    @metered
+    @resilient("write")
+    def archive_started_events(self):
+        """Marks upcoming events whose start time has passed as past. Returns how many."""
+        if not self.db: return 0
+
+        cutoff, _ = event_start_cutoff()
+        started = (self.db.collection("events")
+                   .where("is_upcoming", "==", True)
+                   .where("starts_at", "<=", cutoff))
+        writes = [("merge", doc.reference, {"is_upcoming": False}) for doc in started.stream()]
+        if writes:
+            self._commit_writes(writes)
+            self._invalidate("events")
+        return len(writes)
 
     def log_visit(self):
         if not self.db: return
         
-        today = datetime.now().strftime("%Y-%m-%d")
-        # Store daily visits in a 'stats' collection, document 'visitors'
-        doc_ref = self.db.collection("stats").document("visitors")
-        
-        # Use set with merge=True to create if not exists, and atomic increment
-        try:
-            doc_ref.set({today: Increment(1)}, merge=True)
-        except Exception as e:
-            st.error(f"Error logging visit: {e}")
+        # Counted in memory; the visit buffer writes each day's sum in the background
+        self.visit_buffer.add(datetime.now().strftime("%Y-%m-%d"))
+
+    @metered
+    @resilient("write")
+    def flush_visits(self, counts):
+        """Writes {day: visits} increments to the sharded daily visit counters in one batch."""
+        if not self.db: return
+        from google.cloud.firestore import Increment
+        batch = self.db.batch()
+        for day, count in counts.items():
+            batch.set(self._counter_shard_ref(f"visits_daily_{day}"), {"count": Increment(count)}, merge=True)
+            self._add_series_increments(batch, "visits", day, count)
+        batch.commit()
+        self._invalidate("stats")
+
+    def _series_ref(self, metric, period, key):
+        return self.db.collection("stats_series").document(f"{metric}_{period}_{key}")
+
+    def _series_doc(self, metric, period, key, start, count):
+        return {"metric": metric, "period": period, "key": key, "start": start, "count": count}
+
+    def _add_series_increments(self, batch, metric, day, count):
+        """Adds `count` to the day, week and month documents of a time series."""
+        from google.cloud.firestore import Increment
+        day = date.fromisoformat(day)
+        for period in STATS_PERIODS:
+            key, start = period_key(period, day)
+            batch.set(self._series_ref(metric, period, key),
+                      self._series_doc(metric, period, key, start, Increment(count)), merge=True)
+
+    @metered
+    @resilient("read")
+    def get_stats_series(self, metric, period, first_day, last_day):
+        """Returns [{key, start, count}] for every period between two dates, zeros included.
+
+        One range query over the per-period documents, so a chart costs one read per point.
+        """
+        if not self.db: return []
+        periods = period_range(period, first_day, last_day)
+        if not periods:
+            return []
+
+        def load():
+            query = (self.db.collection("stats_series")
+                     .where("metric", "==", metric)
+                     .where("period", "==", period)
+                     .where("start", ">=", periods[0][1])
+                     .where("start", "<=", periods[-1][1])
+                     .order_by("start"))
+            return {doc.to_dict().get("key"): doc.to_dict().get("count", 0) for doc in query.stream()}
+
+        counts = self._cached(("stats", "series", metric, period, periods[0][0], periods[-1][0]), load)
+        return [{"key": key, "start": start, "count": counts.get(key, 0)} for key, start in periods]
+
+    @metered
+    @resilient("write")
+    def rebuild_series_rollups(self, metric):
+        """Recomputes a metric's weekly and monthly documents from its daily documents."""
+        if not self.db: return
+        totals = {"week": {}, "month": {}}
+        day_docs = (self.db.collection("stats_series")
+                    .where("metric", "==", metric)
+                    .where("period", "==", "day")
+                    .stream())
+        for doc in day_docs:
+            data = doc.to_dict()
+            day = date.fromisoformat(data["key"])
+            for period in totals:
+                key, start = period_key(period, day)
+                count = totals[period].get(key, (start, 0))[1]
+                totals[period][key] = (start, count + data.get("count", 0))
+
+        self._commit_writes([
+            ("set", self._series_ref(metric, period, key), self._series_doc(metric, period, key, start, count))
+            for period, rollups in totals.items()
+            for key, (start, count) in rollups.items()
+        ])
+        self._invalidate("stats")
 
+    @metered
+    @resilient("write")
+    def import_legacy_visits(self):
+        """Copies the per-day fields of the old stats/visitors document into the visits series.
+
+        Safe to re-run: each imported day is flagged and skipped afterwards.
+        Returns the number of days imported.
+        """
+        if not self.db: return 0
+        from google.cloud.firestore import Increment
+        legacy = self.db.collection("stats").document("visitors").get()
+        if not legacy.exists:
+            return 0
+
+        writes = []
+        for day_key, count in legacy.to_dict().items():
+            try:
+                key, start = period_key("day", date.fromisoformat(day_key))
+            except ValueError:
+                continue
+            ref = self._series_ref("visits", "day", key)
+            existing = ref.get()
+            if existing.exists and existing.to_dict().get("legacy_imported"):
+                continue
+            data = self._series_doc("visits", "day", key, start, Increment(count))
+            data["legacy_imported"] = True
+            writes.append(("merge", ref, data))
+
+        self._commit_writes(writes)
+        self.rebuild_series_rollups("visits")
+        return len(writes)
+
+    def _commit_writes(self, writes, workers=1, progress=None):
+        """Commits ("set" | "merge" | "update" | "delete", ref, data) writes in batches under the Firestore limit.
+
+        With `workers` > 1 the batches are committed in parallel; each batch is atomic,
+        but the batches are not atomic together. `progress(done, total)` is called on
+        the calling thread after each batch.
+        """
+        chunks = [writes[start:start + MAX_BATCH_WRITES] for start in range(0, len(writes), MAX_BATCH_WRITES)]
+
+        def commit(chunk):
+            batch = self.db.batch()
+            for op, ref, data in chunk:
+                if op == "set":
+                    batch.set(ref, data)
+                elif op == "merge":
+                    batch.set(ref, data, merge=True)
+                elif op == "update":
+                    batch.update(ref, data)
+                else:
+                    batch.delete(ref)
+            batch.commit()
+            return len(chunk)
+
+        done = 0
+        if workers > 1 and len(chunks) > 1:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="nodex-batch") as pool:
+                for committed in pool.map(commit, chunks):
+                    done += committed
+                    if progress:
+                        progress(done, len(writes))
+        else:
+            for chunk in chunks:
+                done += commit(chunk)
+                if progress:
+                    progress(done, len(writes))
+
+    @metered
+    @resilient("read")
     def get_visitor_count(self):
         if not self.db: return 0
         
         today = datetime.now().strftime("%Y-%m-%d")
-        doc = self.db.collection("stats").document("visitors").get()
-        if doc.exists:
-            return doc.to_dict().get(today, 0)
-        return 0
+        stored = self._cached(("stats", "visits_daily", today), lambda: self._read_counter(f"visits_daily_{today}"))
+        # Include visits still counted in memory or waiting in the write queue
+        pending = self.visit_buffer.pending(today)
+        pending += sum(visit["counts"].get(today, 0) for visit in self._queued("visit"))
+        return stored + pending
 
+    @metered
+    @resilient("write")
     def register_user(self, user_data):
         """Registers a user and stamps the registration date for daily stats."""
         if not self.db: return
+        from google.cloud.firestore import ArrayRemove, ArrayUnion, Increment
+        from google.api_core.exceptions import AlreadyExists
         
         # Ensure we don't mutate the original input
         user_record = dict(user_data)
         user_record.setdefault("created_at", datetime.now().strftime("%Y-%m-%d"))
         
-        # Use student ID as the document ID to prevent duplicates
-        self.db.collection("users").document(user_record["id"]).set(user_record)
+        # Use student ID as the document ID to prevent duplicates.
+        # create() fails if the ID exists, so the counters are only bumped for new members.
+        user_id = user_record["id"]
+        user_ref = self.db.collection("users").document(user_id)
+        name_key = normalize_name(user_record.get("name"))
+        batch = self.db.batch()
+        batch.create(user_ref, user_record)
+        batch.set(self._counter_shard_ref("users_total"), {"count": Increment(1)}, merge=True)
+        batch.set(self._counter_shard_ref(f"users_daily_{user_record['created_at']}"), {"count": Increment(1)}, merge=True)
+        batch.set(self._name_index_ref(name_key), {"user_ids": ArrayUnion([user_id])}, merge=True)
+        self._add_series_increments(batch, "registrations", user_record["created_at"], 1)
+        try:
+            batch.commit()
+        except AlreadyExists:
+            # Re-registering an existing student ID overwrites the profile without counting twice
+            old_doc = user_ref.get()
+            old_key = normalize_name(old_doc.to_dict().get("name")) if old_doc.exists else name_key
+            batch = self.db.batch()
+            batch.set(user_ref, user_record)
+            batch.set(self._name_index_ref(name_key), {"user_ids": ArrayUnion([user_id])}, merge=True)
+            if old_key != name_key:
+                batch.set(self._name_index_ref(old_key), {"user_ids": ArrayRemove([user_id])}, merge=True)
+                self.name_cache.pop(old_key)
+            batch.commit()
+        self._invalidate("stats")
+
+    def _counter_shard_ref(self, name, shard=None):
+        """Returns one shard of a distributed counter (a random one unless specified)."""
+        if shard is None:
+            shard = random.randrange(COUNTER_SHARDS)
+        return self.db.collection("counters").document(name).collection("shards").document(str(shard))
 
+    def _read_counter(self, name):
+        """Sums the shards of a distributed counter (at most COUNTER_SHARDS reads)."""
+        shards = self.db.collection("counters").document(name).collection("shards").stream()
+        return sum(doc.to_dict().get("count", 0) for doc in shards)
+
+    @metered
+    @resilient("read")
     def get_user_count(self):
         if not self.db: return 0
-        # Note: For large datasets, use aggregation queries. For now, this is fine.
-        return len(list(self.db.collection("users").stream()))
+        return self._cached(("stats", "users_total"), lambda: self._read_counter("users_total"))
 
+    @metered
+    @resilient("read")
     def get_today_user_registrations(self):
         """Counts how many users registered today."""
         if not self.db: return 0
         
         today = datetime.now().strftime("%Y-%m-%d")
-        users = self.db.collection("users").stream()
-        return sum(1 for user in users if self._to_dict(user).get("created_at") == today)
+        return self._cached(("stats", "users_daily", today), lambda: self._read_counter(f"users_daily_{today}"))
+
+    @metered
+    @resilient("write")
+    def reconcile_user_counters(self):
+        """Recomputes the member counters from the users collection.
+
+        One-time backfill for members registered before the counters existed, and a
+        repair tool if they ever drift. Streams the whole collection, so run it from admin only.
+        Returns a summary dict.
+        """
+        if not self.db: return None
+
+        totals = {"users_total": 0}
+        for doc in self.db.collection("users").stream():
+            totals["users_total"] += 1
+            created_at = doc.to_dict().get("created_at")
+            if created_at:
+                name = f"users_daily_{created_at}"
+                totals[name] = totals.get(name, 0) + 1
 
+        # Zero out daily counters for days that no longer have any members
+        for counter_ref in self.db.collection("counters").list_documents():
+            if counter_ref.id.startswith("users_daily_") and counter_ref.id not in totals:
+                totals[counter_ref.id] = 0
+
+        # Put the whole count on shard 0 and reset the others
+        writes = []
+        for name, count in totals.items():
+            for shard in range(COUNTER_SHARDS):
+                writes.append(("set", self._counter_shard_ref(name, shard), {"count": count if shard == 0 else 0}))
+
+        # The registrations time series gets the same per-day counts
+        for name, count in totals.items():
+            if name.startswith("users_daily_"):
+                try:
+                    key, start = period_key("day", date.fromisoformat(name[len("users_daily_"):]))
+                except ValueError:
+                    continue
+                writes.append(("set", self._series_ref("registrations", "day", key),
+                               self._series_doc("registrations", "day", key, start, count)))
+
+        self._commit_writes(writes)
+        self.rebuild_series_rollups("registrations")
+
+        self._invalidate("stats")
+        return {"users": totals["users_total"], "days": len(totals) - 1}
+
+    @metered
+    @resilient("write")
     def add_event(self, event_data):
+        """Adds an event; raises ValueError if its date cannot be parsed."""
         if not self.db: return
-        self.db.collection("events").add(event_data)
+        self.db.collection("events").add(with_event_timestamp(event_data))
+        self._invalidate("events")
 
+    @metered
+    @resilient("write")
     def delete_event(self, event_id):
         if not self.db: return
         self.db.collection("events").document(event_id).delete()
+        self._invalidate("events")
 
+    @metered
+    @resilient("write")
     def update_event(self, event_id, updates):
-        """Update specific fields of an event."""
+        """Update specific fields of an event; raises ValueError for an unparseable date."""
         if not self.db: return
+        if "date" in updates:
+            updates = with_event_timestamp(updates)
         self.db.collection("events").document(event_id).update(updates)
+        self._invalidate("events")
 
-    def seed_events(self):
-        if not self.db: return
-        
-        # First, delete ALL existing events to prevent duplicates
-        existing_events = self.db.collection("events").stream()
-        for doc in existing_events:
-            doc.reference.delete()
-        
-        # Then add fresh events
-        batch = self.db.batch()
-        for event in INITIAL_EVENTS:
-            doc_ref = self.db.collection("events").document()
-            batch.set(doc_ref, event)
-        batch.commit()
+    @metered
+    @resilient("write")
+    def seed_events(self, progress=None):
+        """Resets the events collection to INITIAL_EVENTS; safe to run again."""
+        return self.import_events(INITIAL_EVENTS, replace=True, progress=progress)
+
+    @metered
+    @resilient("write")
+    def import_events(self, events, replace=False, progress=None, workers=4):
+        """Upserts events under deterministic IDs in parallel batches.
+
+        New events are written in full (with defaults); existing ones keep their
+        participants and get every other field updated. With `replace`, events not in
+        the import are deleted. `progress(done, total)` is called after each batch.
+        Returns {"created", "updated", "deleted"} counts. Raises ValueError, before
+        writing anything, if an event's date cannot be parsed.
+        """
+        if not self.db: return {"created": 0, "updated": 0, "deleted": 0}
+
+        collection = self.db.collection("events")
+        existing = {ref.id for ref in collection.list_documents()}
+        imported = {event_import_id(event): event for event in events}
+
+        writes, summary = [], {"created": 0, "updated": 0, "deleted": 0}
+        for event_id, event in imported.items():
+            data = {key: value for key, value in event.items() if key != "id"}
+            if "date" in data:
+                data = with_event_timestamp(data)
+            if event_id in existing:
+                for field in EVENT_JOIN_FIELDS:
+                    data.pop(field, None)
+                writes.append(("merge", collection.document(event_id), data))
+                summary["updated"] += 1
+            else:
+                writes.append(("set", collection.document(event_id), {**EVENT_DEFAULTS, **data}))
+                summary["created"] += 1
+        if replace:
+            stale = sorted(existing - set(imported))
+            writes += [("delete", collection.document(event_id), None) for event_id in stale]
+            summary["deleted"] = len(stale)
+
+        self._commit_writes(writes, workers=workers, progress=progress)
+        self._invalidate("events")
+        return summary
+
+    @metered
+    @resilient("write")
+    def migrate_event_dates(self):
+        """Backfills the typed `starts_at` field from each event's `date` string.
+
+        Events without `starts_at` are invisible to the ordered upcoming/past queries,
+        so this must run once on data created before the field existed.
+        Returns (migrated, unparseable) counts.
+        """
+        if not self.db: return 0, 0
+
+        migrated, unparseable = 0, 0
+        batch, pending = self.db.batch(), 0
+        for doc in self.db.collection("events").stream():
+            data = doc.to_dict()
+            starts_at = parse_event_date(data.get("date"))
+            if starts_at is None:
+                unparseable += 1
+                continue
+            if data.get("starts_at") == starts_at:
+                continue
+            batch.update(doc.reference, {"starts_at": starts_at})
+            migrated += 1
+            pending += 1
+            if pending == MAX_BATCH_WRITES:
+                batch.commit()
+                batch, pending = self.db.batch(), 0
+        if pending:
+            batch.commit()
+
+        self._invalidate("events")
+        return migrated, unparseable
 
+    def _name_index_ref(self, normalized):
+        return self.db.collection("user_names").document(name_index_id(normalized))
+
+    @metered
+    @resilient("read")
+    def resolve_user_id(self, name):
+        """Resolves a member name to a user ID (None if unknown).
+
+        Matching ignores case and extra whitespace. When several members share a name,
+        the one who registered first wins. Costs one index document get, or nothing on
+        a cache hit.
+        """
+        if not self.db: return None
+        key = normalize_name(name)
+        if not key:
+            return None
+
+        user_id = self.name_cache.get(key)
+        if user_id:
+            return user_id
+
+        index_doc = self._name_index_ref(key).get()
+        if index_doc.exists:
+            user_ids = index_doc.to_dict().get("user_ids", [])
+            user_id = user_ids[0] if user_ids else None
+        else:
+            # Members registered before the index existed (until "Rebuild Name Index" runs)
+            matches = self.db.collection("users").where("name", "==", " ".join(name.split())).stream()
+            user_id = min((doc.id for doc in matches), default=None)
+
+        if user_id:
+            self.name_cache.put(key, user_id)
+        return user_id
+
+    @metered
+    @resilient("read")
     def get_user_by_name(self, name):
         """Find a user by their name. Returns user dict or None."""
         if not self.db: return None
-        users = self.db.collection("users").where("name", "==", name).stream()
-        for user in users:
-            return self._to_dict(user)
-        return None
+        user_id = self.resolve_user_id(name)
+        return self.get_user_by_id(user_id) if user_id else None
 
+    @metered
+    @resilient("write")
+    def rebuild_name_index(self):
+        """Rebuilds the user_names index from the users collection.
+
+        Duplicate names are ordered by registration date, then student ID.
+        Returns the number of distinct names indexed.
+        """
+        if not self.db: return 0
+
+        members = {}
+        for doc in self.db.collection("users").stream():
+            data = doc.to_dict()
+            key = normalize_name(data.get("name"))
+            if key:
+                members.setdefault(key, []).append((data.get("created_at") or "", doc.id))
+
+        writes = [
+            ("set", self._name_index_ref(key), {"user_ids": [user_id for _, user_id in sorted(entries)]})
+            for key, entries in members.items()
+        ]
+        indexed = {name_index_id(key) for key in members}
+        writes += [
+            ("delete", ref, None)
+            for ref in self.db.collection("user_names").list_documents()
+            if ref.id not in indexed
+        ]
+        self._commit_writes(writes)
+
+        self.name_cache.clear()
+        return len(members)
+
+    @metered
+    @resilient("read")
     def get_user_by_id(self, user_id):
         """Find a user by their ID. Returns user dict or None."""
         if not self.db: return None
         doc = self.db.collection("users").document(user_id).get()
-        if doc.exists:
-            return self._to_dict(doc)
-        return None
+        if not doc.exists:
+            return None
+        user = self._to_dict(doc)
+        # Apply this user's updates that are still waiting in the write queue
+        for queued in self._queued("user_update"):
+            if queued["user_id"] == user_id:
+                for field, value in queued["updates"].items():
+                    if value == QUEUED_DELETE_FIELD:
+                        user.pop(field, None)
+                    else:
+                        user[field] = value
+        return user
+
+    @metered
+    def update_user(self, user_id, updates):
+        """Update specific fields of a user (queued when a write queue is attached)."""
+        if not self.db: return
+        if self.write_queue is None:
+            self.apply_user_updates([{"user_id": user_id, "updates": updates}])
+            return
+        from google.cloud.firestore import DELETE_FIELD
+        self.write_queue.enqueue("user_update", {
+            "user_id": user_id,
+            "updates": {field: QUEUED_DELETE_FIELD if value is DELETE_FIELD else value for field, value in updates.items()},
+        })
+
+    @metered
+    @resilient("write")
+    def apply_user_updates(self, queued):
+        """Applies queued [{"user_id", "updates"}] in batches, merging each user's updates in order."""
+        if not self.db: return
+        from google.cloud.firestore import DELETE_FIELD
+        merged = {}
+        for entry in queued:
+            merged.setdefault(entry["user_id"], {}).update({
+                field: DELETE_FIELD if value == QUEUED_DELETE_FIELD else value
+                for field, value in entry["updates"].items()
+            })
+        self._commit_writes([
+            ("update", self.db.collection("users").document(user_id), updates)
+            for user_id, updates in merged.items()
+        ])
+
+    def _run_transaction(self, func):
+        """Runs func(transaction) in a Firestore transaction, retrying it on contention."""
+        if hasattr(self.db, "run_transaction"):
+            # Local backends run transactions themselves
+            return self.db.run_transaction(func)
+        from firebase_admin import firestore
+        return firestore.transactional(func)(self.db.transaction())
+
+    @metered
+    @resilient("write")
+    def join_event(self, user_id, event_id, event_title, user_name):
+        """Add an event to a user's joined_events list and update event participants.
+
+        Runs as a single transaction: both documents are read in one batched get, and
+        the capacity check and updates commit atomically, so concurrent joins retry
+        instead of overbooking the event.
+        """
+        if not self.db: return False
+        from google.cloud.firestore import ArrayUnion, Increment
+        
+        user_ref = self.db.collection("users").document(user_id)
+        event_ref = self.db.collection("events").document(event_id)
+        joined_entry = {
+            "event_id": event_id,
+            "event_title": event_title,
+            "joined_at": datetime.now().strftime("%Y-%m-%d %H:%M")
+        }
+
+        def attempt(transaction):
+            snapshots = {
+                snap.reference.path: snap
+                for snap in self.db.get_all([user_ref, event_ref], transaction=transaction)
+            }
+            user_doc = snapshots.get(user_ref.path)
+            event_doc = snapshots.get(event_ref.path)
+            if user_doc is None or not user_doc.exists:
+                return False
+            if event_doc is None or not event_doc.exists:
+                return False
+
+            # Check if already joined
+            joined_events = user_doc.to_dict().get("joined_events", [])
+            if any(e.get("event_id") == event_id for e in joined_events):
+                return "already_joined"
+
+            # Check if event is full
+            event_data = event_doc.to_dict()
+            current = event_data.get("current_participants", event_data.get("participants", 0))
+            max_p = event_data.get("max_participants", 20)
+            if current >= max_p:
+                return "event_full"
+
+            transaction.update(user_ref, {"joined_events": ArrayUnion([joined_entry])})
+            transaction.update(event_ref, {
+                "current_participants": Increment(1),
+                "participant_names": ArrayUnion([user_name])
+            })
+            return True
+
+        result = self._run_transaction(attempt)
+        if result is True:
+            self._invalidate("events")
+        return result
+
+    @metered
+    @resilient("read")
+    def get_user_events(self, user_id):
+        """Get list of events a user has joined."""
+        if not self.db: return []
+        
+        user_doc = self.db.collection("users").document(user_id).get()
+        if user_doc.exists:
+            return user_doc.to_dict().get("joined_events", [])
+        return []
+
+    @metered
+    @resilient("read")
+    def get_event_by_id(self, event_id):
+        """Get a single event by its ID."""
+        if not self.db: return None
+        return self.get_events_by_ids([event_id]).get(event_id)
+
+    @metered
+    @resilient("read")
+    def get_events_by_ids(self, event_ids):
+        """Fetches several events with one multi-document get.
+
+        Events already in the read cache are not fetched again.
+        Returns {event_id: event dict}; missing events are left out.
+        """
+        if not self.db: return {}
+
+        reader = self._reader("events")
+        if reader is not self.db:
+            refs = [reader.collection("events").document(event_id) for event_id in dict.fromkeys(event_ids) if event_id]
+            return {doc.id: self._to_dict(doc) for doc in reader.get_all(refs) if doc.exists}
+
+        keys = {event_id: ("events", "by_id", event_id) for event_id in event_ids if event_id}
+        hits, generation = self.cache.get_many(list(keys.values()))
+        events = {event_id: hits[key] for event_id, key in keys.items() if key in hits}
+
+        missing = [event_id for event_id in keys if event_id not in events]
+        if missing:
+            refs = [self.db.collection("events").document(event_id) for event_id in missing]
+            loaded = {event_id: None for event_id in missing}
+            for doc in self.db.get_all(refs):
+                if doc.exists:
+                    loaded[doc.id] = self._to_dict(doc)
+            self.cache.put_many({keys[event_id]: event for event_id, event in loaded.items()}, generation)
+            events.update(copy.deepcopy(loaded))
+
+        return {event_id: event for event_id, event in events.items() if event is not None}
+
+# Fallback for when secrets are missing (to prevent crash)
+class MockCollection:
+    def __init__(self, data): self.data = data
+    def stream(self): return self.data
+    def add(self, item): pass
+
+# ==========================================
+# 2.1 IMAGE PIPELINE (Profile Photos & Event Images)
+# ==========================================
+
+# Square thumbnail edge lengths (px) generated for every profile photo
+PROFILE_THUMBNAIL_SIZES = (64, 128, 256)
+PROFILE_DISPLAY_SIZE = 128
+
+class LocalBlobStore:
+    """Content-addressed blob store on local disk (default backend for images).
+
+    Any object with the same put/get/exists methods can be used instead,
+    e.g. a wrapper around Cloud Storage.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key):
+        # Fan out into sub-directories so no single directory grows too large
+        return os.path.join(self.root, key[:2], key)
+
+    def exists(self, key):
+        return os.path.exists(self._path(key))
+
+    def get(self, key):
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, data):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp file first so readers never see a partial image
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+def thumbnail_key(digest, size):
+    return f"{digest}_{size}.webp"
+
+def make_thumbnails(data, sizes=PROFILE_THUMBNAIL_SIZES):
+    """Decodes an uploaded image and returns {size: WebP bytes} square thumbnails."""
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as img:
+        img = ImageOps.exif_transpose(img)
+        img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+        thumbnails = {}
+        for size in sizes:
+            thumb = ImageOps.fit(img, (size, size), Image.LANCZOS)
+            out = io.BytesIO()
+            thumb.save(out, format="WEBP", quality=80, method=4)
+            thumbnails[size] = out.getvalue()
+    return thumbnails
+
+class ImagePipeline:
+    """Processes profile photos on background threads and stores them by content hash."""
+
+    def __init__(self, store, max_workers=2):
+        self.store = store
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="nodex-images")
+
+    def submit_profile_image(self, db, user_id, data):
+        """Queues an upload for processing; returns a Future resolving to its content hash.
+
+        The user document only receives a small {hash, sizes} reference once the
+        thumbnails are stored, and the legacy inline `profile_image` field is removed.
+        """
+        return self._executor.submit(self._process_profile_image, db, user_id, data)
+
+    def _process_profile_image(self, db, user_id, data):
+        from google.cloud.firestore import DELETE_FIELD
+        digest = hashlib.sha256(data).hexdigest()
+        # Identical uploads (same content hash) are decoded and stored only once
+        if not all(self.store.exists(thumbnail_key(digest, size)) for size in PROFILE_THUMBNAIL_SIZES):
+            for size, thumb in make_thumbnails(data).items():
+                self.store.put(thumbnail_key(digest, size), thumb)
+        db.update_user(user_id, {
+            "profile_image_ref": {"hash": digest, "sizes": list(PROFILE_THUMBNAIL_SIZES)},
+            "profile_image": DELETE_FIELD,
+        })
+        return digest
+
+    def get_thumbnail(self, image_ref, size=PROFILE_DISPLAY_SIZE):
+        """Returns the stored thumbnail bytes for a user's profile_image_ref (None if missing)."""
+        sizes = image_ref.get("sizes") or [size]
+        best = min(sizes, key=lambda s: (s < size, abs(s - size)))
+        return self.store.get(thumbnail_key(image_ref.get("hash", ""), best))
+
+@st.cache_resource
+def get_image_pipeline():
+    """Returns the image pipeline shared by all sessions."""
+    blob_dir = get_settings("storage").get("blob_dir", ".nodex_blobs")
+    return ImagePipeline(LocalBlobStore(blob_dir))
+
+# Event card thumbnails: width (px), disk cache cap and download limits
+EVENT_THUMBNAIL_WIDTH = 480
+EVENT_IMAGE_CACHE_MB = 100
+IMAGE_FETCH_TIMEOUT_SECONDS = 5
+IMAGE_MAX_DOWNLOAD_BYTES = 10 * 1024 * 1024
+
+# Seconds a page waits for missing thumbnails before rendering placeholders
+IMAGE_RENDER_WAIT_SECONDS = 2
+
+# Seconds before an image URL that failed to load is tried again
+IMAGE_RETRY_SECONDS = 600
+
+def make_width_thumbnail(data, width):
+    """Decodes an image and returns it as WebP, scaled down to at most `width` px wide."""
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as img:
+        img = ImageOps.exif_transpose(img)
+        img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+        if img.width > width:
+            img = img.resize((width, max(1, round(img.height * width / img.width))), Image.LANCZOS)
+        out = io.BytesIO()
+        img.save(out, format="WEBP", quality=80, method=4)
+    return out.getvalue()
+
+def fetch_image(url, timeout=IMAGE_FETCH_TIMEOUT_SECONDS):
+    """Downloads an http(s) image URL and returns its bytes."""
+    from urllib.request import Request, urlopen
+
+    if not url.lower().startswith(("http://", "https://")):
+        raise ValueError(f"Unsupported image URL: {url}")
+    with urlopen(Request(url, headers={"User-Agent": "NodeX image proxy"}), timeout=timeout) as response:
+        data = response.read(IMAGE_MAX_DOWNLOAD_BYTES + 1)
+    if len(data) > IMAGE_MAX_DOWNLOAD_BYTES:
+        raise ValueError(f"Image larger than {IMAGE_MAX_DOWNLOAD_BYTES} bytes: {url}")
+    return data
+
+class EventImageCache:
+    """Fetches event images once and keeps WebP thumbnails on disk, served from this process.
+
+    The cache directory is capped at `max_bytes`; the least recently used thumbnails
+    (by file mtime, refreshed on every hit) are evicted first. `fetch(url)` is
+    pluggable so a local stand-in can replace the network.
+    """
+
+    def __init__(self, root, max_bytes, width=EVENT_THUMBNAIL_WIDTH, fetch=fetch_image, max_workers=4):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.width = width
+        self._fetch = fetch
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._failures = {}
+        self._placeholder = None
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="nodex-event-images")
+        os.makedirs(root, exist_ok=True)
+        self._sizes = {
+            entry.name: entry.stat().st_size
+            for entry in os.scandir(root) if entry.is_file() and entry.name.endswith(".webp")
+        }
+
+    def _name(self, url):
+        return hashlib.sha256(f"{url}|{self.width}".encode("utf-8")).hexdigest() + ".webp"
+
+    def get(self, url):
+        """Returns the cached thumbnail for a URL, or None if it is not cached."""
+        path = os.path.join(self.root, self._name(url))
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        # Reading counts as a use for LRU eviction; the file may have been evicted since
+        with contextlib.suppress(OSError):
+            os.utime(path)
+        return data
+
+    def warm(self, urls):
+        """Starts loading every URL that is not cached yet; returns {url: Future}."""
+        futures = {}
+        for url in dict.fromkeys(u for u in urls if u):
+            if os.path.exists(os.path.join(self.root, self._name(url))):
+                continue
+            with self._lock:
+                failed_at = self._failures.get(url)
+                if failed_at is not None and time.monotonic() - failed_at < IMAGE_RETRY_SECONDS:
+                    continue
+                if url not in self._inflight:
+                    self._inflight[url] = self._executor.submit(self._load, url)
+                futures[url] = self._inflight[url]
+        return futures
+
+    def thumbnails(self, urls, timeout=IMAGE_RENDER_WAIT_SECONDS):
+        """Returns {url: thumbnail bytes or None}, loading missing ones in parallel.
+
+        Images still loading after `timeout` seconds are None this time and keep
+        loading in the background for the next render.
+        """
+        results = {url: self.get(url) for url in urls if url}
+        futures = self.warm([url for url, data in results.items() if data is None])
+        if futures:
+            done, _ = wait(futures.values(), timeout=timeout)
+            for url, future in futures.items():
+                if future in done:
+                    results[url] = future.result()
+        return results
+
+    def placeholder(self):
+        """A plain grey WebP used for events without a usable image."""
+        if self._placeholder is None:
+            from PIL import Image
+
+            out = io.BytesIO()
+            Image.new("RGB", (self.width, self.width * 2 // 3), (226, 232, 240)).save(out, format="WEBP")
+            self._placeholder = out.getvalue()
+        return self._placeholder
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._sizes), "bytes": sum(self._sizes.values()), "failed_urls": len(self._failures)}
+
+    def _load(self, url):
+        try:
+            thumbnail = make_width_thumbnail(self._fetch(url), self.width)
+        except Exception as e:
+            logger.warning("Could not load event image %s: %s", url, e)
+            with self._lock:
+                self._failures[url] = time.monotonic()
+                self._inflight.pop(url, None)
+            return None
+
+        name = self._name(url)
+        path = os.path.join(self.root, name)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(thumbnail)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._sizes[name] = len(thumbnail)
+            self._failures.pop(url, None)
+            self._inflight.pop(url, None)
+            self._evict()
+        return thumbnail
+
+    def _evict(self):
+        """Deletes least recently used thumbnails until the cache fits in max_bytes."""
+        total = sum(self._sizes.values())
+        if total <= self.max_bytes:
+            return
+        by_age = sorted(self._sizes, key=lambda name: self._mtime(name))
+        for name in by_age:
+            if total <= self.max_bytes:
+                break
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(self.root, name))
+            total -= self._sizes.pop(name)
+
+    def _mtime(self, name):
+        try:
+            return os.path.getmtime(os.path.join(self.root, name))
+        except FileNotFoundError:
+            return 0
+
+@st.cache_resource
+def get_event_image_cache():
+    """Returns the event image cache shared by all sessions, configured from [images] in secrets."""
+    settings = get_settings("images")
+    return EventImageCache(
+        settings.get("cache_dir", ".nodex_image_cache"),
+        max_bytes=int(float(settings.get("max_mb", EVENT_IMAGE_CACHE_MB)) * 1024 * 1024),
+        width=int(settings.get("width", EVENT_THUMBNAIL_WIDTH)),
+    )
+
+# ==========================================
+# 2.2 COLD START (Background Warmup & Startup Timings)
+# ==========================================
+# The first script run in a server process starts get_warmup(), which imports the
+# Firestore libraries and builds the client and the shared services around it in a
+# background thread. Sessions render their page chrome meanwhile and only wait for
+# the warmup on their first datastore call. StartupTimings records how long that
+# takes, plus each session's time to first paint, for the admin dashboard.
+
+# First-paint samples kept for the startup panel
+STARTUP_PAINT_HISTORY = 200
 
-    def update_user(self, user_id, updates):
-        """Update specific fields of a user."""
-        if not self.db: return
-        self.db.collection("users").document(user_id).update(updates)
+class StartupTimings:
+    """Process-wide cold-start measurements (milliseconds)."""
 
-    def join_event(self, user_id, event_id, event_title, user_name):
-        """Add an event to a user's joined_events list and update event participants."""
-        if not self.db: return False
-        
-        # Get user document
-        user_ref = self.db.collection("users").document(user_id)
-        user_doc = user_ref.get()
-        
-        if not user_doc.exists:
-            return False
-        
-        user_data = user_doc.to_dict()
-        joined_events = user_data.get("joined_events", [])
-        
-        # Check if already joined
-        if any(e.get("event_id") == event_id for e in joined_events):
-            return "already_joined"
-        
-        # Get event document to check capacity
-        event_ref = self.db.collection("events").document(event_id)
-        event_doc = event_ref.get()
-        
-        if not event_doc.exists:
-            return False
-        
-        event_data = event_doc.to_dict()
-        current = event_data.get("current_participants", event_data.get("participants", 0))
-        max_p = event_data.get("max_participants", 20)
-        
-        # Check if event is full
-        if current >= max_p:
-            return "event_full"
-        
-        # Add event to user's joined_events
-        joined_events.append({
-            "event_id": event_id,
-            "event_title": event_title,
-            "joined_at": datetime.now().strftime("%Y-%m-%d %H:%M")
-        })
-        user_ref.update({"joined_events": joined_events})
-        
-        # Update event: increment current_participants and add user name to participant_names
-        participant_names = event_data.get("participant_names", [])
-        participant_names.append(user_name)
-        
-        event_ref.update({
-            "current_participants": Increment(1),
-            "participant_names": participant_names
-        })
-        
-        return True
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.library_import_ms = None
+        self.client_ready_ms = None
+        self.first_paints = deque(maxlen=STARTUP_PAINT_HISTORY)
 
-    def get_user_events(self, user_id):
-        """Get list of events a user has joined."""
-        if not self.db: return []
-        
-        user_doc = self.db.collection("users").document(user_id).get()
-        if user_doc.exists:
-            return user_doc.to_dict().get("joined_events", [])
-        return []
+    def record_warmup(self, library_import_ms, client_ready_ms):
+        with self._lock:
+            self.library_import_ms = library_import_ms
+            self.client_ready_ms = client_ready_ms
 
-    def get_event_by_id(self, event_id):
-        """Get a single event by its ID."""
-        if not self.db: return None
-        
-        doc = self.db.collection("events").document(event_id).get()
-        if doc.exists:
-            return self._to_dict(doc)
-        return None
+    def record_first_paint(self, ms):
+        with self._lock:
+            self.first_paints.append(ms)
 
-# Fallback for when secrets are missing (to prevent crash)
-class MockCollection:
-    def __init__(self, data): self.data = data
-    def stream(self): return self.data
-    def add(self, item): pass
+    def snapshot(self):
+        with self._lock:
+            paints = sorted(self.first_paints)
+        return {
+            "library_import_ms": self.library_import_ms,
+            "client_ready_ms": self.client_ready_ms,
+            "sessions": len(paints),
+            "first_paint_p50_ms": paints[len(paints) // 2] if paints else None,
+            "first_paint_max_ms": paints[-1] if paints else None,
+        }
+
+@st.cache_resource
+def get_startup_timings():
+    """Returns the cold-start measurements shared by all sessions."""
+    return StartupTimings()
+
+@st.cache_resource
+def get_warmup():
+    """Starts building the datastore client and shared services in the background, once per process.
+
+    Returns a Future of {"db_client", "write_queue", "mirror", "visit_buffer"} for RealFirestore(warmup=...).
+    """
+    def warm():
+        started = time.perf_counter()
+        # Imported for their side effect of loading the modules: both backends use the Firestore
+        # write transforms, and Firestore needs the client library too
+        importlib.import_module("google.cloud.firestore")
+        if get_settings("storage").get("backend", "firestore") == "firestore":
+            importlib.import_module("firebase_admin.firestore")
+        imported = time.perf_counter()
+        services = {
+            "db_client": get_db(),
+            "write_queue": get_write_queue(),
+            "mirror": get_snapshot_mirror(),
+            "visit_buffer": get_visit_buffer(),
+        }
+        get_event_sweeper()
+        get_startup_timings().record_warmup((imported - started) * 1000, (time.perf_counter() - started) * 1000)
+        return services
+
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="nodex-warmup")
+    future = executor.submit(warm)
+    executor.shutdown(wait=False)
+    return future
 
 # ==========================================
 # 3. SETUP & STYLING
 # ==========================================
 
+# Builds the datastore client while the first page renders (once per process)
+get_warmup()
+
 st.set_page_config(
     page_title="NodeX - Connect & Exchange",
     page_icon="🔗",
@@ -481,88 +1994,47 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
-# Custom CSS for Modern UI and POSTECH Colors
-st.markdown(f"""
-    <style>
-    /* Global Font & Colors */
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;600;700&display=swap');
-    
-    html, body, [class*="css"] {{
-        font-family: 'Inter', sans-serif;
-        color: {SECONDARY_COLOR};
-    }}
-    
-    /* Primary Color Accents */
-    .stButton > button {{
-        background-color: {PRIMARY_COLOR};
-        color: white;
-        border-radius: 8px;
-        border: none;
-        font-weight: 600;
-        transition: all 0.3s ease;
-    }}
-    .stButton > button:hover {{
-        background-color: #A61955; /* Darker shade */
-        box-shadow: 0 4px 12px rgba(196, 0, 70, 0.2);
-    }}
-    
-    /* Navigation Bar Styling */
-    .nav-container {{
-        display: flex;
-        justify-content: space-between;
-        align-items: center;
-        padding: 1rem 0;
-        border-bottom: 1px solid #eee;
-        margin-bottom: 2rem;
-    }}
-    
-    .nav-logo {{
-        font-size: 1.5rem;
-        font-weight: 800;
-        color: {PRIMARY_COLOR};
-        text-decoration: none;
-    }}
-    
-    /* Cards */
-    .event-card {{
-        background-color: white;
-        border-radius: 12px;
-        padding: 1rem;
-        box-shadow: 0 4px 6px rgba(0,0,0,0.05);
-        transition: transform 0.2s;
-        border: 1px solid {ACCENT_COLOR};
-    }}
-    .event-card:hover {{
-        transform: translateY(-5px);
-        box-shadow: 0 8px 15px rgba(0,0,0,0.1);
-    }}
-    
-    /* Hero Section */
-    .hero-box {{
-        background: linear-gradient(135deg, {PRIMARY_COLOR} 0%, #8a0030 100%);
-        color: white;
-        padding: 4rem 2rem;
-        border-radius: 20px;
-        text-align: center;
-        margin-bottom: 3rem;
-    }}
-    
-    </style>
-""", unsafe_allow_html=True)
+# Trace this rerun when profiling is on; finished at the end of the script
+rerun_trace = get_render_profiler().begin(
+    st.session_state.get('page', 'home'),
+    st.session_state.get('session_id', 'new'),
+    force=st.session_state.get('profile_session', False),
+)
+
+# Custom CSS for Modern UI and POSTECH Colors. The stylesheet is a static file the
+# browser caches; each rerun only sends the link and the brand colours.
+with profile_span("theme_css"):
+    st.markdown(
+        f"<style>:root {{ --nodex-primary: {PRIMARY_COLOR}; --nodex-secondary: {SECONDARY_COLOR}; "
+        f"--nodex-accent: {ACCENT_COLOR}; }}</style>"
+        f"<link rel='stylesheet' href='{THEME_CSS_URL}'>",
+        unsafe_allow_html=True,
+    )
 
 # Initialize Session State
 if 'lang' not in st.session_state:
     st.session_state.lang = 'en'
 if 'page' not in st.session_state:
     st.session_state.page = 'home'
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
 
-# Initialize DB Connection
+# Initialize DB Connection (the client itself arrives from the background warmup)
 if 'db' not in st.session_state:
-    db_client = get_db()
-    st.session_state.db = RealFirestore(db_client)
-    
-    if db_client is None:
-        st.warning("⚠️ **Firebase Credentials Not Found!** The app is running in read-only mode. Please configure `.streamlit/secrets.toml` to enable database features.")
+    warmup = get_warmup()
+    if warmup.done() and warmup.exception() is not None:
+        # Retry a failed warmup (e.g. unreachable credentials) for this and later sessions
+        get_warmup.clear()
+        warmup = get_warmup()
+    st.session_state.db = RealFirestore(
+        None,
+        cache=get_read_cache(),
+        name_cache=get_name_cache(),
+        meter=get_datastore_meter(),
+        warmup=warmup,
+        breaker=get_circuit_breaker(),
+        last_good=get_last_good_reads(),
+    )
 
 # Helper to get text based on current language
 def get_text(key):
@@ -571,13 +2043,93 @@ def get_text(key):
 def toggle_language():
     st.session_state.lang = 'kr' if st.session_state.lang == 'en' else 'en'
 
+def flash(message, icon="✅"):
+    """Queues a toast for the next render, so it survives the st.rerun() that follows an action."""
+    st.session_state.setdefault('flash_messages', []).append((message, icon))
+
+def render_flash_messages():
+    """Shows and clears the queued flash messages."""
+    for message, icon in st.session_state.pop('flash_messages', []):
+        st.toast(message, icon=icon)
+
 def navigate_to(page_name):
     st.session_state.page = page_name
+    # Pages loaded into the reviews wall are re-read the next time it is opened
+    st.session_state.pop('review_wall', None)
+
+def load_more_reviews():
+    """Appends the next page of visible reviews to this session's reviews wall."""
+    wall = st.session_state.review_wall
+    reviews, cursor = st.session_state.db.get_visible_reviews_page(after=wall["cursor"])
+    wall["reviews"].extend(reviews)
+    wall["cursor"] = cursor
+
+def finish_rerun(ops_before, trace):
+    """Adds a rerun's backend operations to the session totals and closes its trace."""
+    # Running total of this session's backend operations; read by benchmark.py
+    rerun_ops = st.session_state.db.op_counts(since=ops_before)
+    if rerun_ops is not None:
+        totals = st.session_state.get('backend_ops') or {}
+        st.session_state.backend_ops = {key: totals.get(key, 0) + value for key, value in rerun_ops.items()}
+    get_render_profiler().end(trace)
+
+def in_fragment_rerun():
+    """True while a fragment reruns on its own, without the rest of the script."""
+    return not st.session_state.get('full_rerun', False)
+
+def rerun_fragment():
+    """Reruns just the current fragment (the whole app if it is running as part of a full rerun)."""
+    st.rerun(scope="fragment" if in_fragment_rerun() else "app")
+
+@contextlib.contextmanager
+def unavailable_notice():
+    """Shows a notice in place of the rest of a block when the datastore cannot answer it."""
+    try:
+        yield
+    except DatastoreUnavailable as e:
+        logger.warning("Datastore unavailable: %s", e)
+        st.error(get_text("db_unavailable"), icon="⚠️")
+
+def render_stale_notice(placeholder):
+    """Fills placeholder with a warning if this rerun showed saved results instead of live ones."""
+    stale_reads = st.session_state.db.stale_reads
+    if stale_reads:
+        placeholder.warning(get_text("db_stale").format(time=min(stale_reads.values()).strftime("%H:%M:%S")), icon="⚠️")
+
+def fragment(func):
+    """st.fragment that keeps metering, profiling and flash messages working in its own reruns.
+
+    Widgets inside the fragment rerun only the fragment. Those reruns skip the script's
+    setup and bookkeeping, so the wrapper does that part for them (metered as
+    "<page>#<fragment>").
+    """
+    @st.fragment
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not in_fragment_rerun():
+            with unavailable_notice():
+                return func(*args, **kwargs)
+            return None
+        page = f"{st.session_state.page}#{func.__name__}"
+        get_datastore_meter().begin_rerun(page, st.session_state.session_id)
+        ops_before = st.session_state.db.op_counts()
+        trace = get_render_profiler().begin(page, st.session_state.session_id, force=st.session_state.get('profile_session', False))
+        st.session_state.db.stale_reads.clear()
+        stale_notice = st.empty()
+        try:
+            render_flash_messages()
+            with unavailable_notice():
+                return func(*args, **kwargs)
+        finally:
+            render_stale_notice(stale_notice)
+            finish_rerun(ops_before, trace)
+    return wrapper
 
 # ==========================================
 # 4. UI COMPONENTS
 # ==========================================
 
+@profiled
 def render_navbar():
     # Top Navigation Bar
     col1, col2, col3 = st.columns([2, 6, 1])
@@ -602,6 +2154,7 @@ def render_navbar():
         # Language Toggle
         st.button(get_text("lang_toggle"), on_click=toggle_language, key="lang_btn")
 
+@profiled
 def render_home():
     # Hero Section
     st.markdown(f"""
@@ -618,19 +2171,31 @@ def render_home():
             navigate_to("register")
 
     st.markdown("---")
+
+    # Everything the page shows is fetched in parallel up front
+    db = st.session_state.db
+    data = get_fetcher().fetch(
+        {
+            "events": lambda: db.get_upcoming_events(limit=3),
+            "visitor_count": db.get_visitor_count,
+            "total_users": db.get_user_count,
+            "today_new_users": db.get_today_user_registrations,
+        },
+        defaults={"visitor_count": "–", "total_users": "–", "today_new_users": 0},
+    )
     
     # Quick Preview (Optional)
     st.subheader(get_text("event_header"))
-    render_events(limit=3)
+    render_events(limit=3, events=data["events"])
     
     # Dashboard / Stats Section
     st.markdown("---")
     st.markdown(f"### 📊 NodeX Dashboard")
     s1, s2 = st.columns(2)
 
-    visitor_count = st.session_state.db.get_visitor_count()
-    total_users = st.session_state.db.get_user_count()
-    today_new_users = st.session_state.db.get_today_user_registrations()
+    visitor_count = data["visitor_count"]
+    total_users = data["total_users"]
+    today_new_users = data["today_new_users"]
 
     with s1:
         st.metric(label=get_text("stats_visitors"), value=visitor_count)
@@ -641,141 +2206,193 @@ def render_home():
             delta=f"+{today_new_users}" if today_new_users else "0"
         )
 
-def render_events(limit=None):
-    # Use the robust data access method
-    all_events = st.session_state.db.get_events(limit=None)
-    
-    # Filter events: only show events where is_upcoming is True
-    events = [event for event in all_events if event.get('is_upcoming', False) == True]
-    
-    # Sort events by date (closest first)
-    def parse_date(event):
-        try:
-            return datetime.strptime(event.get('date', '2099-12-31 23:59'), "%Y-%m-%d %H:%M")
-        except (ValueError, TypeError):
-            return datetime.max
-    
-    events = sorted(events, key=parse_date)
-    
-    # Apply limit after filtering and sorting
-    if limit:
-        events = events[:limit]
+def render_staleness(collection):
+    """Notes when a listing comes from the live mirror while its listener is disconnected."""
+    mirror = st.session_state.db.mirror
+    if mirror is not None and mirror.is_live(collection) and mirror.staleness(collection) > MIRROR_STALE_SECONDS:
+        st.caption(f"⚠️ Live updates paused; this list may be up to {mirror.staleness(collection):.0f}s out of date.")
+
+@profiled
+def render_events(limit=None, events=None):
+    # Upcoming events, closest first; filtering, ordering and limit happen in Firestore
+    if events is None:
+        events = st.session_state.db.get_upcoming_events(limit=limit)
+    render_staleness("events")
     
     if not events:
         st.info("No upcoming events at the moment. Check back later!")
         return
         
+    # Card images come from our own thumbnail cache, fetched in parallel on first use
+    thumbnails = get_event_image_cache().thumbnails([event.get('image') for event in events])
+
     # Grid Layout for Events
     cols = st.columns(3)
     
     for idx, event in enumerate(events):
-        with cols[idx % 3]:
-            # Determine title based on language
-            title = event.get('title_en', 'Untitled') if st.session_state.lang == 'en' else event.get('title_kr', '제목 없음')
-            event_id = event.get('id', str(idx))
-            
-            # Card UI
-            image_url = event.get('image') or 'https://via.placeholder.com/300x200?text=No+Image'
-            try:
-                st.image(image_url, use_container_width=True)
-            except Exception:
-                st.image('https://via.placeholder.com/300x200?text=No+Image', use_container_width=True)
-            st.markdown(f"### {title}")
-            st.caption(f"📅 {event.get('date', 'TBD')} | 📍 {event.get('location', 'TBD')}")
-            
-            # Participants count: current/max format
-            current = event.get('current_participants', event.get('participants', 0))
-            max_p = event.get('max_participants', 20)
-            st.markdown(f"👥 **{current}/{max_p}** {get_text('participants')}")
-            
-            # Duration and Cost
-            duration = event.get('duration_hours', 3)
-            cost = duration * 1.5
-            st.markdown(f"⏱️ **{get_text('event_duration')}:** {duration} {get_text('event_hours')} | 💵 **{get_text('event_cost')}:** ${cost:.1f}")
+        with cols[idx % 3], profile_span(f"event_card:{event.get('id', idx)}"):
+            render_event_card(event.get('id', str(idx)), event, thumbnails.get(event.get('image')))
+            st.markdown("---")
+
+@fragment
+@profiled
+def render_event_card(event_id, event, thumbnail):
+    """One event card; typing a name or joining reruns just this card."""
+    if in_fragment_rerun():
+        # Re-read only this event (the listing passed in may be out of date by now)
+        event = st.session_state.db.get_event_by_id(event_id)
+        if not event:
+            st.info("This event is no longer available.")
+            return
+
+    # Determine title based on language
+    title = event.get('title_en', 'Untitled') if st.session_state.lang == 'en' else event.get('title_kr', '제목 없음')
+    
+    # Card UI
+    st.image(thumbnail or get_event_image_cache().placeholder(), use_container_width=True)
+    st.markdown(f"### {title}")
+    st.caption(f"📅 {event.get('date', 'TBD')} | 📍 {event.get('location', 'TBD')}")
+    
+    # Participants count: current/max format
+    current = event.get('current_participants', event.get('participants', 0))
+    max_p = event.get('max_participants', 20)
+    st.markdown(f"👥 **{current}/{max_p}** {get_text('participants')}")
+    
+    # Duration and Cost
+    duration = event.get('duration_hours', 3)
+    cost = duration * 1.5
+    st.markdown(f"⏱️ **{get_text('event_duration')}:** {duration} {get_text('event_hours')} | 💵 **{get_text('event_cost')}:** ${cost:.1f}")
+    
+    # Event Details Toggle (Schedule)
+    schedule = event.get('schedule', [])
+    if schedule:
+        with st.expander(f"📋 {get_text('event_details')}"):
+            st.markdown(f"**{get_text('event_schedule')}**")
+            for item in schedule:
+                activity = item.get('activity_en', '') if st.session_state.lang == 'en' else item.get('activity_kr', '')
+                st.markdown(f"- **{item.get('time', '')}** - {activity}")
+    
+    # Join Button with Name Verification
+    with st.expander(f"🎫 {get_text('event_join')}"):
+        # Check if event is full
+        if current >= max_p:
+            st.warning("🚫 This event is full!")
+        else:
+            join_name = st.text_input(
+                get_text("event_enter_name"), 
+                key=f"join_name_{event_id}"
+            )
             
-            # Event Details Toggle (Schedule)
-            schedule = event.get('schedule', [])
-            if schedule:
-                with st.expander(f"📋 {get_text('event_details')}"):
-                    st.markdown(f"**{get_text('event_schedule')}**")
-                    for item in schedule:
-                        activity = item.get('activity_en', '') if st.session_state.lang == 'en' else item.get('activity_kr', '')
-                        st.markdown(f"- **{item.get('time', '')}** - {activity}")
+            # Initialize session state for showing register button
+            show_register_key = f"show_register_{event_id}"
+            if show_register_key not in st.session_state:
+                st.session_state[show_register_key] = False
             
-            # Join Button with Name Verification
-            with st.expander(f"🎫 {get_text('event_join')}"):
-                # Check if event is full
-                if current >= max_p:
-                    st.warning("🚫 This event is full!")
-                else:
-                    join_name = st.text_input(
-                        get_text("event_enter_name"), 
-                        key=f"join_name_{event_id}"
-                    )
-                    
-                    # Initialize session state for showing register button
-                    show_register_key = f"show_register_{event_id}"
-                    if show_register_key not in st.session_state:
-                        st.session_state[show_register_key] = False
-                    
-                    # Join button
-                    if st.button(get_text("event_join"), key=f"join_btn_{event_id}", use_container_width=True):
-                        if join_name:
-                            # Check if user is registered
-                            user = st.session_state.db.get_user_by_name(join_name)
-                            if user:
-                                # Try to join the event
-                                result = st.session_state.db.join_event(user['id'], event_id, title, join_name)
-                                if result == "already_joined":
-                                    st.warning(get_text("event_already_joined"))
-                                elif result == "event_full":
-                                    st.error("This event is full!")
-                                elif result:
-                                    st.success(get_text("event_join_success"))
-                                    st.session_state[show_register_key] = False
-                                    time.sleep(1)
-                                    st.rerun()
-                                else:
-                                    st.error("Failed to join event.")
-                            else:
-                                # User not registered - show register button
-                                st.error(get_text("event_not_registered"))
-                                st.session_state[show_register_key] = True
+            # Join button
+            if st.button(get_text("event_join"), key=f"join_btn_{event_id}", use_container_width=True):
+                if join_name:
+                    # Check if user is registered
+                    user_id = st.session_state.db.resolve_user_id(join_name)
+                    if user_id:
+                        # Try to join the event
+                        result = st.session_state.db.join_event(user_id, event_id, title, join_name)
+                        if result == "already_joined":
+                            st.warning(get_text("event_already_joined"))
+                        elif result == "event_full":
+                            st.error("This event is full!")
+                        elif result:
+                            flash(get_text("event_join_success"))
+                            st.session_state[show_register_key] = False
+                            # Only this card shows the new participant count
+                            rerun_fragment()
                         else:
-                            st.warning(get_text("event_enter_name"))
-                    
-                    # Show Register button only if user is not registered
-                    if st.session_state[show_register_key]:
-                        if st.button("🔐 Register First", key=f"go_register_{event_id}", use_container_width=True):
-                            navigate_to("register")
-                            st.rerun()
+                            st.error("Failed to join event.")
+                    else:
+                        # User not registered - show register button
+                        st.error(get_text("event_not_registered"))
+                        st.session_state[show_register_key] = True
+                else:
+                    st.warning(get_text("event_enter_name"))
             
-            st.markdown("---")
+            # Show Register button only if user is not registered
+            if st.session_state[show_register_key]:
+                if st.button("🔐 Register First", key=f"go_register_{event_id}", use_container_width=True):
+                    navigate_to("register")
+                    st.rerun()
 
+@profiled
 def render_reviews():
     st.header(get_text("review_header"))
     
+    # Review Form
+    render_review_form()
+
+    # Display Reviews
+    st.markdown("---")
+    render_staleness("reviews")
+    # Visible reviews, newest first, one page at a time; "Load more" appends the next page
+    if 'review_wall' not in st.session_state:
+        reviews, cursor = st.session_state.db.get_visible_reviews_page()
+        st.session_state.review_wall = {"reviews": reviews, "cursor": cursor}
+    reviews = st.session_state.review_wall["reviews"]
+    
+    if not reviews:
+        st.info("No reviews yet. Be the first to write one!" if st.session_state.lang == 'en' else "아직 리뷰가 없습니다. 첫 리뷰를 작성해보세요!")
+        return
+    
+    # Grid layout for reviews
+    cols = st.columns(3)
+    for idx, review in enumerate(reviews):
+        with cols[idx % 3], profile_span("review_card"):
+            with st.container(border=True):
+                # Event title
+                st.caption(f"📅 {review.get('event_title', 'Unknown Event')}")
+                # Author
+                st.markdown(f"**{review.get('user', 'Anonymous')}**")
+                # Rating
+                st.markdown("⭐" * review.get('rating', 5))
+                # Comment
+                st.write(f"\"{review.get('comment', '')}\"")
+                # Date
+                st.caption(f"🕐 {review.get('created_at', 'N/A')}")
+
+    if st.session_state.review_wall["cursor"]:
+        st.button(
+            "Load more" if st.session_state.lang == 'en' else "더 보기",
+            key="reviews_load_more",
+            on_click=load_more_reviews,
+        )
+
+@fragment
+@profiled
+def render_review_form():
+    """The review form and the past events it offers, loaded and rerun on their own."""
     # Get past events for selection
     past_events = st.session_state.db.get_past_events()
     
-    # Review Form
     with st.expander(f"✍️ {get_text('review_placeholder')}", expanded=False):
         if not past_events:
             st.info("No past events available for review yet. Reviews can only be written for completed events.")
         else:
             with st.form("review_form"):
-                # Event selection
+                # Event selection, with each event's average rating so far
+                ratings = st.session_state.db.get_event_ratings([e.get('id') for e in past_events])
                 event_options = {
                     e.get('id'): f"{e.get('title_en', 'Untitled')} ({e.get('date', 'N/A')})" 
                     if st.session_state.lang == 'en' 
                     else f"{e.get('title_kr', '제목 없음')} ({e.get('date', 'N/A')})"
                     for e in past_events
                 }
+                event_labels = {
+                    event_id: f"{label} · ⭐ {ratings[event_id]['average']:.1f} ({ratings[event_id]['count']})"
+                    if event_id in ratings else label
+                    for event_id, label in event_options.items()
+                }
                 
                 selected_event_id = st.selectbox(
                     "Select Event" if st.session_state.lang == 'en' else "이벤트 선택",
                     options=list(event_options.keys()),
-                    format_func=lambda x: event_options.get(x, "Unknown")
+                    format_func=lambda x: event_labels.get(x, "Unknown")
                 )
                 
                 # Author name
@@ -807,40 +2424,19 @@ def render_reviews():
                             "rating": rating,
                             "comment": comment
                         }
-                        st.session_state.db.add_review(review_data)
-                        st.success("Review submitted successfully!" if st.session_state.lang == 'en' else "리뷰가 등록되었습니다!")
-                        time.sleep(1)
-                        st.rerun()
+                        try:
+                            st.session_state.db.add_review(review_data)
+                        except WriteQueueFull:
+                            st.warning("Too many reviews are being saved right now. Please try again in a moment." if st.session_state.lang == 'en' else "지금은 저장 중인 리뷰가 많습니다. 잠시 후 다시 시도해주세요.")
+                        else:
+                            st.session_state.pop('review_wall', None)
+                            flash("Review submitted successfully!" if st.session_state.lang == 'en' else "리뷰가 등록되었습니다!")
+                            # The wall outside this fragment gets the new review too
+                            st.rerun()
                     else:
                         st.warning("Please fill in your name and review." if st.session_state.lang == 'en' else "이름과 리뷰 내용을 입력해주세요.")
 
-    # Display Reviews
-    st.markdown("---")
-    all_reviews = st.session_state.db.get_reviews()
-    
-    # Filter only visible reviews for regular users
-    reviews = [r for r in all_reviews if r.get('is_visible', True)]
-    
-    if not reviews:
-        st.info("No reviews yet. Be the first to write one!" if st.session_state.lang == 'en' else "아직 리뷰가 없습니다. 첫 리뷰를 작성해보세요!")
-        return
-    
-    # Grid layout for reviews
-    cols = st.columns(3)
-    for idx, review in enumerate(reviews):
-        with cols[idx % 3]:
-            with st.container(border=True):
-                # Event title
-                st.caption(f"📅 {review.get('event_title', 'Unknown Event')}")
-                # Author
-                st.markdown(f"**{review.get('user', 'Anonymous')}**")
-                # Rating
-                st.markdown("⭐" * review.get('rating', 5))
-                # Comment
-                st.write(f"\"{review.get('comment', '')}\"")
-                # Date
-                st.caption(f"🕐 {review.get('created_at', 'N/A')}")
-
+@profiled
 def render_mypage():
     st.header(get_text("mypage_header"))
     
@@ -855,9 +2451,9 @@ def render_mypage():
             lookup_name = st.text_input("Name", key="mypage_lookup_name", label_visibility="collapsed")
             if st.button(get_text("mypage_view"), key="mypage_lookup_btn"):
                 if lookup_name:
-                    user = st.session_state.db.get_user_by_name(lookup_name)
-                    if user:
-                        st.session_state.mypage_user_id = user.get('id')
+                    user_id = st.session_state.db.resolve_user_id(lookup_name)
+                    if user_id:
+                        st.session_state.mypage_user_id = user_id
                         st.rerun()
                     else:
                         st.error(get_text("event_not_registered"))
@@ -874,13 +2470,31 @@ def render_mypage():
             return
         
         st.info(get_text("mypage_welcome"))
+
+        # The photo and the joined events both depend only on the user document: fetch them together
+        image_ref = user.get('profile_image_ref')
+        joined_events = user.get('joined_events', [])
+        db = st.session_state.db
+        data = get_fetcher().fetch(
+            {
+                "thumbnail": lambda: get_image_pipeline().get_thumbnail(image_ref) if image_ref else None,
+                # All joined events in one batch instead of one get per event
+                "events_by_id": lambda: db.get_events_by_ids(
+                    [event_info.get('event_id') for event_info in joined_events]
+                ) if joined_events else {},
+            },
+            defaults={"events_by_id": {}},
+        )
         
         col1, col2 = st.columns([1, 3])
         with col1:
             # Check if user has uploaded a profile image
+            thumbnail = data["thumbnail"]
             profile_image = user.get('profile_image')
-            if profile_image:
-                # Display uploaded image (base64 encoded)
+            if thumbnail:
+                st.image(thumbnail, width=120)
+            elif profile_image:
+                # Legacy photo stored inline in the user document (base64 encoded)
                 st.image(profile_image, width=120)
             else:
                 # Generate avatar based on user name (default)
@@ -895,30 +2509,15 @@ def render_mypage():
             
             # Profile image upload in small expander
             with st.expander("📷 Change Profile Photo" if st.session_state.lang == 'en' else "📷 프로필 사진 변경"):
-                uploaded_file = st.file_uploader(
-                    "Choose image" if st.session_state.lang == 'en' else "이미지 선택",
-                    type=['jpg', 'jpeg', 'png'],
-                    key="profile_upload",
-                    label_visibility="collapsed"
-                )
-                if uploaded_file is not None:
-                    # Convert to base64
-                    bytes_data = uploaded_file.getvalue()
-                    base64_image = f"data:image/{uploaded_file.type.split('/')[-1]};base64,{base64.b64encode(bytes_data).decode()}"
-                    
-                    # Save to database
-                    st.session_state.db.update_user(user.get('id'), {"profile_image": base64_image})
-                    st.success("✅ Photo updated!" if st.session_state.lang == 'en' else "✅ 사진이 업데이트되었습니다!")
-                    time.sleep(1)
-                    st.rerun()
+                render_photo_uploader(user.get('id'))
         
         st.markdown("---")
         
         # Display joined events - this now shows fresh data
         st.subheader(f"🎫 {get_text('mypage_joined_events')}")
         
-        joined_events = user.get('joined_events', [])
         if joined_events:
+            events_by_id = data["events_by_id"]
             for event_info in joined_events:
                 with st.container(border=True):
                     col_a, col_b = st.columns([3, 1])
@@ -926,14 +2525,11 @@ def render_mypage():
                         st.markdown(f"**{event_info.get('event_title', 'Unknown Event')}**")
                         st.caption(f"📅 Joined: {event_info.get('joined_at', 'N/A')}")
                     with col_b:
-                        # Fetch event details if needed
-                        event_id = event_info.get('event_id')
-                        if event_id:
-                            event_data = st.session_state.db.get_event_by_id(event_id)
-                            if event_data:
-                                duration = event_data.get('duration_hours', 3)
-                                cost = duration * 1.5
-                                st.markdown(f"💵 ${cost:.1f}")
+                        event_data = events_by_id.get(event_info.get('event_id'))
+                        if event_data:
+                            duration = event_data.get('duration_hours', 3)
+                            cost = duration * 1.5
+                            st.markdown(f"💵 ${cost:.1f}")
         else:
             st.info(get_text("mypage_no_events"))
         
@@ -942,6 +2538,43 @@ def render_mypage():
             st.session_state.mypage_user_id = None
             st.rerun()
 
+@fragment
+@profiled
+def render_photo_uploader(user_id):
+    """Profile photo upload; picking a file reruns only the uploader."""
+    uploaded_file = st.file_uploader(
+        "Choose image" if st.session_state.lang == 'en' else "이미지 선택",
+        type=['jpg', 'jpeg', 'png'],
+        key="profile_upload",
+        label_visibility="collapsed"
+    )
+    if uploaded_file is not None:
+        bytes_data = uploaded_file.getvalue()
+        upload_key = (user_id, hashlib.sha256(bytes_data).hexdigest())
+
+        # The uploader keeps its file across reruns (and logins); only process each file once per user
+        if st.session_state.get('profile_upload_key') != upload_key:
+            st.session_state.profile_upload_key = upload_key
+            st.session_state.profile_upload_future = get_image_pipeline().submit_profile_image(
+                st.session_state.db, user_id, bytes_data
+            )
+
+    # Processing runs in the background; its outcome is reported on a later rerun of this fragment
+    pending_upload = st.session_state.get('profile_upload_future')
+    if pending_upload is not None and st.session_state.profile_upload_key[0] == user_id:
+        if not pending_upload.done():
+            st.info("⏳ Processing photo..." if st.session_state.lang == 'en' else "⏳ 사진 처리 중...")
+            # Clicking reruns this fragment, which reports the result once it is ready
+            st.button("Check again" if st.session_state.lang == 'en' else "다시 확인", key="profile_upload_check")
+        elif pending_upload.exception() is not None:
+            st.error("Could not process this image." if st.session_state.lang == 'en' else "이미지를 처리할 수 없습니다.")
+        else:
+            del st.session_state.profile_upload_future
+            flash("Photo updated!" if st.session_state.lang == 'en' else "사진이 업데이트되었습니다!")
+            # The photo itself is drawn outside this fragment
+            st.rerun()
+
+@profiled
 def render_register():
     st.header(get_text("reg_title"))
     st.write(get_text("reg_desc"))
@@ -956,8 +2589,7 @@ def render_register():
             if name and student_id:
                 new_user = {"name": name, "id": student_id, "email": email}
                 st.session_state.db.register_user(new_user)
-                st.success(f"{get_text('reg_success')} {name}!")
-                time.sleep(1)
+                flash(f"{get_text('reg_success')} {name}!")
                 navigate_to("home")
                 st.rerun()
             else:
@@ -965,18 +2597,136 @@ def render_register():
 
 
 
+@profiled
 def render_admin():
     st.header("⚙️ Admin Dashboard")
     
+    # Each section is a fragment: its widgets rerun only that section
+    render_admin_database()
+    st.divider()
+    render_admin_add_event()
+    st.divider()
+
+    # Sections 3-5 read independent data: fetch it in parallel, after section 1-2 actions ran.
+    # A section rerunning on its own reloads just its own part.
+    db = st.session_state.db
+    data = get_fetcher().fetch(
+        {
+            "events": db.get_events,
+            "reviews": db.get_reviews,
+            **trend_loaders(st.session_state.get('trend_period', STATS_PERIODS[0])),
+        },
+        defaults={"events": [], "reviews": [], "visits": [], "registrations": []},
+    )
+    render_admin_events(data["events"])
+    st.divider()
+    render_admin_reviews(data["reviews"])
+    st.divider()
+    render_admin_trends({"visits": data["visits"], "registrations": data["registrations"]})
+    st.divider()
+    render_admin_cache()
+    st.divider()
+    render_admin_metering()
+    st.divider()
+    render_admin_profiling()
+    st.divider()
+    render_admin_mirror()
+    st.divider()
+    render_admin_write_queue()
+    st.divider()
+    render_admin_breaker()
+
+def trend_loaders(period):
+    """Loaders for the visit and registration series charted for a trend period."""
+    db = st.session_state.db
+    span_days = {"day": 30, "week": 7 * 12, "month": 365}[period]
+    last_day = datetime.now().date()
+    first_day = last_day - timedelta(days=span_days - 1)
+    return {
+        "visits": lambda: db.get_stats_series("visits", period, first_day, last_day),
+        "registrations": lambda: db.get_stats_series("registrations", period, first_day, last_day),
+    }
+
+@fragment
+@profiled
+def render_admin_database():
+    """Seeding, imports and maintenance jobs.
+
+    Every job here changes data other sections show, so each one ends with a full rerun.
+    """
     st.subheader("1. Database Management")
     if st.button("Initialize/Seed Event Data"):
-        st.session_state.db.seed_events()
-        st.success("Database seeded with initial events!")
-        time.sleep(1)
+        bar = st.progress(0.0, text="Seeding events...")
+        st.session_state.db.seed_events(progress=lambda done, total: bar.progress(done / total, text=f"{done}/{total} writes"))
+        get_event_image_cache().warm([event.get("image") for event in INITIAL_EVENTS])
+        flash("Database seeded with initial events!")
         st.rerun()
 
-    st.divider()
-    
+    with st.expander("Import Events (JSON or CSV)"):
+        st.caption("Events are matched by their `id` column, or by title_en and date, so importing a file again updates instead of duplicating.")
+        upload = st.file_uploader("Events file", type=["json", "csv"], key="event_import_file")
+        replace = st.checkbox("Delete events that are not in the file", key="event_import_replace")
+        if upload is not None and st.button("Import", key="event_import_btn"):
+            try:
+                events = parse_event_file(upload.name, upload.getvalue())
+            except (ValueError, csv.Error) as e:
+                st.error(f"Could not read {upload.name}: {e}")
+            else:
+                bar = st.progress(0.0, text=f"Importing {len(events)} events...")
+                started = time.perf_counter()
+                summary = st.session_state.db.import_events(
+                    events,
+                    replace=replace,
+                    progress=lambda done, total: bar.progress(done / total, text=f"{done}/{total} writes"),
+                )
+                get_event_image_cache().warm([event.get("image") for event in events])
+                flash(
+                    f"Imported {len(events)} events in {time.perf_counter() - started:.1f}s: "
+                    f"{summary['created']} created, {summary['updated']} updated, {summary['deleted']} deleted."
+                )
+                st.rerun()
+
+    if st.button("Rebuild Member Counters"):
+        summary = st.session_state.db.reconcile_user_counters()
+        if summary:
+            flash(f"Member counters rebuilt: {summary['users']} members across {summary['days']} days.")
+            st.rerun()
+
+    if st.button("Rebuild Name Index"):
+        indexed = st.session_state.db.rebuild_name_index()
+        flash(f"Name index rebuilt for {indexed} distinct names.")
+        st.rerun()
+
+    if st.button("Import Legacy Visit History"):
+        imported = st.session_state.db.import_legacy_visits()
+        flash(f"Imported {imported} days of visit history.")
+        st.rerun()
+
+    if st.button("Archive Started Events"):
+        archived = st.session_state.db.archive_started_events()
+        flash(f"Moved {archived} started events to past.")
+        st.rerun()
+    sweeper = get_event_sweeper()
+    if sweeper is not None and sweeper.last_run:
+        st.caption(f"Started events are archived automatically every {sweeper.interval}s "
+                   f"(last sweep {sweeper.last_run:%H:%M:%S}, {sweeper.last_result or 0} archived).")
+
+    if st.button("Rebuild Rating Aggregates"):
+        rated = st.session_state.db.rebuild_rating_aggregates()
+        flash(f"Rating aggregates rebuilt for {rated} events.")
+        st.rerun()
+
+    if st.button("Migrate Event Dates"):
+        migrated, unparseable = st.session_state.db.migrate_event_dates()
+        flash(f"Added typed start times to {migrated} events.")
+        if unparseable:
+            flash(f"{unparseable} events have a date that is not in YYYY-MM-DD HH:MM format and stay hidden from listings.", icon="⚠️")
+        st.rerun()
+
+@fragment
+@profiled
+def render_admin_add_event():
+    """Form for adding one event."""
     st.subheader("2. Add New Event")
     with st.form("add_event_form"):
         c1, c2 = st.columns(2)
@@ -999,6 +2749,9 @@ def render_admin():
         schedule_json = st.text_area("Schedule", value="[]", height=100)
         
         if st.form_submit_button("Add Event"):
+            if parse_event_date(date) is None:
+                st.error("Invalid date. Use the format YYYY-MM-DD HH:MM, e.g. 2024-05-20 19:00.")
+                return
             try:
                 schedule = json.loads(schedule_json)
             except json.JSONDecodeError:
@@ -1017,14 +2770,17 @@ def render_admin():
                 "schedule": schedule
             }
             st.session_state.db.add_event(new_event)
-            st.success("Event added!")
-            time.sleep(1)
+            get_event_image_cache().warm([new_event.get("image")])
+            flash("Event added!")
             st.rerun()
-            
-    st.divider()
-    
+
+@fragment
+@profiled
+def render_admin_events(events):
+    """Every event, with visibility toggles and delete."""
     st.subheader("3. Manage Events")
-    events = st.session_state.db.get_events()
+    if in_fragment_rerun():
+        events = st.session_state.db.get_events()
     for e_data in events:
         is_upcoming = e_data.get('is_upcoming', False)
         status_icon = "✅" if is_upcoming else "❌"
@@ -1037,27 +2793,27 @@ def render_admin():
                 if is_upcoming:
                     if st.button("🚫 Mark as Past", key=f"hide_{e_data.get('id')}"):
                         st.session_state.db.update_event(e_data.get('id'), {"is_upcoming": False})
-                        st.warning("Event marked as past (hidden from users).")
-                        time.sleep(1)
-                        st.rerun()
+                        flash("Event marked as past (hidden from users).", icon="🚫")
+                        rerun_fragment()
                 else:
                     if st.button("✅ Mark as Upcoming", key=f"show_{e_data.get('id')}"):
                         st.session_state.db.update_event(e_data.get('id'), {"is_upcoming": True})
-                        st.success("Event marked as upcoming (visible to users).")
-                        time.sleep(1)
-                        st.rerun()
+                        flash("Event marked as upcoming (visible to users).")
+                        rerun_fragment()
             
             with col_b:
                 if st.button("🗑️ Delete Event", key=f"del_{e_data.get('id')}"):
                     st.session_state.db.delete_event(e_data.get('id'))
-                    st.error("Event deleted.")
-                    time.sleep(1)
-                    st.rerun()
+                    flash("Event deleted.", icon="🗑️")
+                    rerun_fragment()
 
-    st.divider()
-    
+@fragment
+@profiled
+def render_admin_reviews(reviews):
+    """Every review, with visibility toggles and delete."""
     st.subheader("4. Manage Reviews")
-    reviews = st.session_state.db.get_reviews()
+    if in_fragment_rerun():
+        reviews = st.session_state.db.get_reviews()
     
     if not reviews:
         st.info("No reviews yet.")
@@ -1079,28 +2835,282 @@ def render_admin():
                     if is_visible:
                         if st.button("🚫 Hide Review", key=f"hide_review_{review_id}"):
                             st.session_state.db.update_review(review_id, {"is_visible": False})
-                            st.warning("Review hidden from users.")
-                            time.sleep(1)
-                            st.rerun()
+                            flash("Review hidden from users.", icon="🚫")
+                            rerun_fragment()
                     else:
                         if st.button("👁️ Show Review", key=f"show_review_{review_id}"):
                             st.session_state.db.update_review(review_id, {"is_visible": True})
-                            st.success("Review is now visible.")
-                            time.sleep(1)
-                            st.rerun()
+                            flash("Review is now visible.")
+                            rerun_fragment()
                 
                 with col_r2:
                     if st.button("🗑️ Delete Review", key=f"del_review_{review_id}"):
                         st.session_state.db.delete_review(review_id)
-                        st.error("Review deleted.")
-                        time.sleep(1)
-                        st.rerun()
+                        flash("Review deleted.", icon="🗑️")
+                        rerun_fragment()
+
+@fragment
+@profiled
+def render_admin_trends(series):
+    """Visitor and new-member charts for the chosen period."""
+    st.subheader("5. Trends")
+    # Changing the period reruns this section, which reads the radio's new value up front
+    if in_fragment_rerun():
+        series = get_fetcher().fetch(
+            trend_loaders(st.session_state.get('trend_period', STATS_PERIODS[0])),
+            defaults={"visits": [], "registrations": []},
+        )
+    st.radio("Period", STATS_PERIODS, horizontal=True, key="trend_period",
+             format_func=lambda p: {"day": "Daily", "week": "Weekly", "month": "Monthly"}[p])
+    visits = series["visits"]
+    registrations = series["registrations"]
+    if visits:
+        st.line_chart(
+            {
+                "Visitors": {p["key"]: p["count"] for p in visits},
+                "New Members": {p["key"]: p["count"] for p in registrations},
+            }
+        )
+    else:
+        st.info("No stats available.")
+
+@fragment
+@profiled
+def render_admin_cache():
+    """Read cache and thumbnail cache statistics."""
+    st.subheader("6. Read Cache")
+    cache_stats = st.session_state.db.cache.stats()
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Hits", cache_stats["hits"])
+    m2.metric("Misses", cache_stats["misses"])
+    m3.metric("Hit Rate", f"{cache_stats['hit_rate']:.0%}")
+    m4.metric("Cached Entries", cache_stats["entries"])
+    st.caption(f"Shared by all sessions · TTL {st.session_state.db.cache.ttl}s · {cache_stats['invalidations']} invalidations")
+    image_stats = get_event_image_cache().stats()
+    st.caption(f"Event thumbnails: {image_stats['entries']} cached, {image_stats['bytes'] / 1024 / 1024:.1f} of "
+               f"{get_event_image_cache().max_bytes / 1024 / 1024:.0f} MB · {image_stats['failed_urls']} unreachable URLs")
+    if st.button("🧹 Clear Cache", key="clear_read_cache"):
+        st.session_state.db.cache.clear()
+        rerun_fragment()
+
+@fragment
+@profiled
+def render_admin_metering():
+    """Datastore call, latency and cost statistics."""
+    st.subheader("7. Datastore Metering")
+    meter = get_datastore_meter()
+    methods, pages = meter.snapshot()
+    if methods:
+        rows = []
+        for name, stats in methods.items():
+            p95 = histogram_percentile(stats["histogram"], 95)
+            rows.append({
+                "Method": name,
+                "Calls": stats["calls"],
+                "Total ms": round(stats["seconds"] * 1000, 1),
+                "Mean ms": round(stats["seconds"] * 1000 / stats["calls"], 2),
+                "p95 ms": f"≤{p95}" if p95 else f">{LATENCY_BUCKETS_MS[-1]}",
+                "Docs Read": stats["reads"],
+                "Docs Written": stats["writes"],
+            })
+        by_time, by_reads = st.columns(2)
+        with by_time:
+            st.caption("Top methods by total time")
+            st.dataframe(sorted(rows, key=lambda r: r["Total ms"], reverse=True)[:10], hide_index=True)
+        with by_reads:
+            st.caption("Top methods by documents read")
+            st.dataframe(sorted(rows, key=lambda r: r["Docs Read"], reverse=True)[:10], hide_index=True)
+
+        method = st.selectbox("Latency histogram", sorted(methods), key="meter_method")
+        labels = [f"≤{bound}ms" for bound in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+        st.bar_chart({"Calls": dict(zip(labels, methods[method]["histogram"]))})
+
+        st.caption("Cost per page view (estimated from Firestore list prices)")
+        st.dataframe(
+            [
+                {
+                    "Page": page,
+                    "Views": stats["views"],
+                    "Reads / View": round(stats["reads"] / stats["views"], 1) if stats["views"] else None,
+                    "Writes / View": round(stats["writes"] / stats["views"], 1) if stats["views"] else None,
+                    "ms / View": round(stats["seconds"] * 1000 / stats["views"], 1) if stats["views"] else None,
+                    "USD / 1k Views": round(1000 * estimate_cost(stats["reads"], stats["writes"]) / stats["views"], 4) if stats["views"] else None,
+                }
+                for page, stats in sorted(pages.items())
+            ],
+            hide_index=True,
+        )
+
+        st.caption(f"Top sessions by documents read (of the last {meter.max_sessions} active)")
+        st.dataframe(
+            [
+                {
+                    "Session": session_id[:8],
+                    "Last Page": stats["page"],
+                    "Views": stats["views"],
+                    "Calls": stats["calls"],
+                    "Docs Read": stats["reads"],
+                    "Docs Written": stats["writes"],
+                    "USD": round(estimate_cost(stats["reads"], stats["writes"]), 4),
+                }
+                for session_id, stats in meter.top_sessions()
+            ],
+            hide_index=True,
+        )
+    else:
+        st.info("No datastore calls recorded yet.")
+    if st.button("Reset Metering", key="reset_meter"):
+        meter.reset()
+        rerun_fragment()
+
+@fragment
+@profiled
+def render_admin_profiling():
+    """Rerun tracing controls and captured traces."""
+    st.subheader("8. Render Profiling")
+    profiler = get_render_profiler()
+    # Stored outside the widget key so it survives pages where the toggle is not rendered
+    st.session_state.profile_session = st.toggle(
+        "Profile my reruns",
+        value=st.session_state.get('profile_session', False),
+        help="Trace every rerun of this session, regardless of the slow-rerun threshold.",
+    )
+    mode = "on for all sessions" if profiler.enabled else "off (enable under [profiling] in secrets)"
+    st.caption(f"Profiling {mode} · slow reruns ≥ {profiler.slow_rerun_ms:.0f} ms are captured to {profiler.trace_dir}/"
+               + (" with cProfile" if profiler.cprofile else ""))
+    startup = get_startup_timings().snapshot()
+    if startup["client_ready_ms"] is not None:
+        paint = (f"first paint p50 {startup['first_paint_p50_ms']:.0f} ms, max {startup['first_paint_max_ms']:.0f} ms "
+                 f"over {startup['sessions']} sessions") if startup["sessions"] else "no first paints recorded yet"
+        st.caption(f"Cold start: Firestore libraries imported in {startup['library_import_ms']:.0f} ms and the datastore "
+                   f"client ready {startup['client_ready_ms']:.0f} ms into the warmup · {paint}")
+    captured = list(profiler.captured)
+    if captured:
+        st.dataframe(
+            [
+                {
+                    "Started": item["trace"].started_at.strftime("%H:%M:%S"),
+                    "Page": item["trace"].page,
+                    "ms": round(item["trace"].duration_ms, 1),
+                    "Slowest Spans": ", ".join(
+                        f"{span['name']} {span['dur'] / 1000:.0f}ms" for span in item["trace"].slowest_spans(3)
+                    ),
+                }
+                for item in captured
+            ],
+            hide_index=True,
+        )
+        latest = captured[0]
+        st.download_button(
+            "Download Latest Trace (Chrome trace JSON)",
+            data=json.dumps(latest["trace"].chrome_trace()),
+            file_name=os.path.basename(latest["path"]),
+            mime="application/json",
+            key="download_trace",
+        )
+    else:
+        st.info("No reruns captured yet.")
+
+@fragment
+@profiled
+def render_admin_mirror():
+    """Live mirror listener status."""
+    st.subheader("9. Live Mirror")
+    mirror = get_snapshot_mirror()
+    if mirror is None:
+        st.info("Live mirror is off. Set `mirror = true` under [storage] in secrets to serve listings from snapshot listeners.")
+    else:
+        st.dataframe(
+            [
+                {
+                    "Collection": name,
+                    "State": status["state"],
+                    "Documents": status["documents"],
+                    "Stale (s)": round(status["stale_seconds"], 1),
+                    "Last Change": status["last_change"].strftime("%H:%M:%S") if status["last_change"] else None,
+                    "Reconnects": status["reconnects"],
+                }
+                for name, status in mirror.status().items()
+            ],
+            hide_index=True,
+        )
+
+@fragment
+@profiled
+def render_admin_write_queue():
+    """Write-behind queue depth, lag and retry statistics."""
+    st.subheader("10. Write Queue")
+    queue = st.session_state.db.write_queue
+    if queue is None:
+        st.info("Write queue is off; reviews and photo updates are written synchronously, visits in periodic batches.")
+        return
+    stats = queue.stats()
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Queued", f"{stats['depth']} / {stats['max_depth']}")
+    m2.metric("Oldest (s)", f"{stats['lag_seconds']:.1f}")
+    m3.metric("Applied", stats["applied"])
+    m4.metric("Retries", stats["retries"])
+    last_lag = stats["last_apply_lag_seconds"]
+    st.caption(
+        f"{queue.path} · {stats['batches']} batches"
+        + (f" · last batch applied {last_lag:.1f}s after enqueue" if last_lag is not None else "")
+        + f" · {stats['rejected']} rejected while full · "
+        + (", ".join(f"{count} {kind}" for kind, count in stats["by_kind"].items()) or "nothing queued")
+    )
+    if stats["dead"]:
+        st.warning(f"{stats['dead']} writes failed {WRITE_QUEUE_MAX_ATTEMPTS} times and are parked. Last error: {stats['last_error']}")
+        if st.button("🔁 Retry Parked Writes", key="write_queue_retry"):
+            flash(f"Requeued {queue.retry_dead()} writes")
+            rerun_fragment()
+    elif stats["last_error"]:
+        st.caption(f"Last error: {stats['last_error']}")
+
+@fragment
+@profiled
+def render_admin_breaker():
+    """Circuit breaker state, datastore call failures and (local backends) fault injection."""
+    st.subheader("11. Circuit Breaker")
+    breaker = get_circuit_breaker()
+    status = breaker.status()
+    state_labels = {CircuitBreaker.CLOSED: "🟢 Closed", CircuitBreaker.HALF_OPEN: "🟡 Half-open", CircuitBreaker.OPEN: "🔴 Open"}
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("State", state_labels[status["state"]])
+    m2.metric("Trips", status["trips"])
+    m3.metric("Failed Calls", status["failures"], delta=f"{status['consecutive_failures']} in a row", delta_color="off")
+    m4.metric("Stale Reads Served", status["stale_served"])
+    details = [
+        f"Trips after {breaker.threshold} failures in a row, tries again after {breaker.reset_seconds}s",
+        f"reads time out after {DATASTORE_READ_DEADLINE_SECONDS}s, writes wait for their answer",
+        f"{status['timeouts']} timeouts · {status['retries']} read retries · {status['rejected']} calls refused while open",
+    ]
+    if status["trial_in"] is not None:
+        details.append(f"trial call in {status['trial_in']:.0f}s")
+    if status["last_trip"]:
+        details.append(f"last trip {status['last_trip'].strftime('%H:%M:%S')}")
+    st.caption(" · ".join(details))
+    if status["last_error"]:
+        st.caption(f"Last error: {status['last_error']}")
+    if status["state"] != CircuitBreaker.CLOSED and st.button("🔌 Close Breaker", key="breaker_reset"):
+        breaker.reset()
+        flash("Circuit breaker closed")
+        rerun_fragment()
+
+    # Local backends can fail on purpose, to try all of the above out
+    faults = getattr(st.session_state.db.db, "faults", None)
+    if faults is not None:
+        with st.expander("Fault injection (local backend)"):
+            faults.error_rate = st.slider("Failing round trips", 0.0, 1.0, float(faults.error_rate), 0.05, key="fault_error_rate")
+            faults.slow_rate = st.slider("Slow round trips", 0.0, 1.0, float(faults.slow_rate), 0.05, key="fault_slow_rate")
+            faults.slow_ms = st.number_input("Slow round trip delay (ms)", 0, 60000, int(faults.slow_ms), 500, key="fault_slow_ms")
+            st.caption(f"Injected so far: {faults.injected_errors} errors, {faults.injected_delays} delays")
 
 # ==========================================
 # 5. MAIN APP EXECUTION
 # ==========================================
 
 def main():
+    render_flash_messages()
+
     # Admin Login Sidebar
     with st.sidebar:
         st.header("Admin Access")
@@ -1118,36 +3128,58 @@ def main():
                 navigate_to("home")
                 st.rerun()
 
-    # Visitor Tracking Logic
-    if 'has_visited' not in st.session_state:
-        st.session_state.db.log_visit()
-        st.session_state.has_visited = True
-
     render_navbar()
+
+    # The page chrome is out; everything below may wait for the datastore client
+    if 'first_paint_ms' not in st.session_state:
+        st.session_state.first_paint_ms = (time.perf_counter() - RUN_STARTED) * 1000
+        get_startup_timings().record_first_paint(st.session_state.first_paint_ms)
+
+    # Filled in at the end if anything below was served from saved results
+    stale_notice = st.empty()
+    st.session_state.db.stale_reads.clear()
+
+    with unavailable_notice():
+        # Visitor Tracking Logic
+        if 'has_visited' not in st.session_state:
+            if st.session_state.db.db is None:
+                st.warning("⚠️ **Firebase Credentials Not Found!** The app is running in read-only mode. Please configure `.streamlit/secrets.toml` to enable database features.")
+            st.session_state.db.log_visit()
+            st.session_state.has_visited = True
     
-    st.markdown("<div style='margin-top: 20px;'></div>", unsafe_allow_html=True)
+        st.markdown("<div style='margin-top: 20px;'></div>", unsafe_allow_html=True)
     
-    if st.session_state.page == 'home':
-        render_home()
-    elif st.session_state.page == 'events':
-        st.header(get_text("event_header"))
-        render_events()
-    elif st.session_state.page == 'reviews':
-        render_reviews()
-    elif st.session_state.page == 'mypage':
-        render_mypage()
-    elif st.session_state.page == 'register':
-        render_register()
-    elif st.session_state.page == 'admin':
-        if st.session_state.get('is_admin', False):
-            render_admin()
-        else:
-            st.error("Access Denied")
-            navigate_to("home")
+        if st.session_state.page == 'home':
+            render_home()
+        elif st.session_state.page == 'events':
+            st.header(get_text("event_header"))
+            render_events()
+        elif st.session_state.page == 'reviews':
+            render_reviews()
+        elif st.session_state.page == 'mypage':
+            render_mypage()
+        elif st.session_state.page == 'register':
+            render_register()
+        elif st.session_state.page == 'admin':
+            if st.session_state.get('is_admin', False):
+                render_admin()
+            else:
+                st.error("Access Denied")
+                navigate_to("home")
         
+    render_stale_notice(stale_notice)
+
     # Footer
     st.markdown("---")
     st.markdown(f"<div style='text-align: center; color: #888;'>{get_text('footer')}</div>", unsafe_allow_html=True)
 
 if __name__ == "__main__":
-    main()
+    get_datastore_meter().begin_rerun(st.session_state.page, st.session_state.session_id)
+    ops_before = st.session_state.db.op_counts()
+    # Fragments check this to tell a full rerun from one of their own
+    st.session_state.full_rerun = True
+    try:
+        main()
+    finally:
+        st.session_state.full_rerun = False
+        finish_rerun(ops_before, rerun_trace)
@@ -0,0 +1,457 @@
+"""Concurrent-session load test for the NodeX app.
+
+Drives simulated student sessions through the real app.py with Streamlit's AppTest.
+Each session walks the same journey: open home, register, browse events, join one,
+read reviews, write one, then log into My Page. Every step is one or more reruns, and
+each rerun is timed. The app runs against a local backend (memory or SQLite) with
+optional injected latency per backend round trip. Results (throughput, p50/p95/p99
+rerun latency, backend operations per rerun) go to a JSON file for later comparison.
+
+Usage:
+    python benchmark.py --sessions 20 --latency-ms 30
+    python benchmark.py --backend sqlite --workers 4 --sessions 40
+    python benchmark.py --baseline bench_results/<earlier run>.json
+    python benchmark.py --cold-start 5 --backend sqlite
+    python benchmark.py --fault-rate 0.2 --slow-rate 0.05 --slow-ms 5000
+
+Development and benchmark dependencies are in requirements-dev.txt.
+
+AppTest swaps process-global Streamlit state on every run, so sessions inside one
+process run interleaved rather than in parallel. Real concurrency comes from
+--workers, which needs the SQLite backend so that all processes share one database.
+
+--cold-start N measures startup instead: N times, app.py is imported in a fresh
+interpreter (import time), then a fresh `streamlit run` server is started and two
+sessions connect over its websocket, timing the first visible element (the navbar)
+and the end of the first run. The first session is the process's cold start.
+
+--fault-rate / --slow-rate make that share of backend round trips fail or take
+--slow-ms longer while the sessions run (not during setup), to see how deadlines,
+retries and the circuit breaker hold up. Reruns that showed the "database is not
+responding" notice are counted as degraded.
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import multiprocessing
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+SCENARIOS = ("home", "register", "events", "join", "reviews", "review", "mypage")
+
+
+def new_session(config):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_PATH, default_timeout=config["timeout"])
+    at.secrets["storage"] = {
+        "backend": config["backend"],
+        "sqlite_path": config["sqlite_path"],
+        "latency_ms": config["latency_ms"],
+    }
+    return at
+
+
+def session_ops(at):
+    """Backend operations this session has made so far (including script reruns)."""
+    if "backend_ops" in at.session_state:
+        return dict(at.session_state["backend_ops"])
+    return {"reads": 0, "writes": 0, "calls": 0}
+
+
+def timed_run(at, samples, scenario, action=None):
+    """Runs one rerun (optionally triggered by a widget action) and records a sample."""
+    before = session_ops(at)
+    start = time.perf_counter()
+    (action() if action else at).run()
+    elapsed = time.perf_counter() - start
+    after = session_ops(at)
+    samples.append({
+        "scenario": scenario,
+        "seconds": elapsed,
+        "reads": after["reads"] - before["reads"] if after else None,
+        "writes": after["writes"] - before["writes"] if after else None,
+        "calls": after["calls"] - before["calls"] if after else None,
+        "error": bool(at.exception),
+        "degraded": any("database is not responding" in element.value for element in [*at.error, *at.warning]),
+    })
+
+
+def setup_data(config):
+    """Seeds events and moves all but the first into the coming weeks.
+
+    Events become past once they start, so the seed dates are shifted to keep events
+    open for joining; the one left in the past gives the review form something to review.
+    """
+    at = new_session(config)
+    at.session_state["is_admin"] = True
+    at.session_state["page"] = "admin"
+    at.run()
+    next(b for b in at.button if b.label == "Initialize/Seed Event Data").click().run()
+    db = at.session_state["db"]
+    events = sorted(db.get_events(), key=lambda event: event["date"])
+    first_day = datetime.now() + timedelta(days=7)
+    db.import_events([
+        {"id": event["id"], "date": (first_day + timedelta(days=i)).strftime("%Y-%m-%d 19:00"), "is_upcoming": True}
+        for i, event in enumerate(events[1:])
+    ])
+
+
+def run_journey(at, name, student_id, event_index, config, samples):
+    timed_run(at, samples, "home")
+
+    at.session_state["page"] = "register"
+    at.run()
+    at.text_input[0].input(name)
+    at.text_input[1].input(student_id)
+    at.text_input[2].input(f"{student_id}@example.com")
+    timed_run(at, samples, "register", lambda: next(b for b in at.button if b.label == "Sign Up").click())
+
+    for _ in range(config["iterations"]):
+        at.session_state["page"] = "events"
+        timed_run(at, samples, "events")
+
+    name_inputs = [t for t in at.text_input if (t.key or "").startswith("join_name_")]
+    if name_inputs:
+        target = name_inputs[event_index % len(name_inputs)]
+        event_id = target.key[len("join_name_"):]
+        target.input(name)
+        timed_run(at, samples, "join", lambda: at.button(key=f"join_btn_{event_id}").click())
+
+    for _ in range(config["iterations"]):
+        at.session_state["page"] = "reviews"
+        timed_run(at, samples, "reviews")
+
+    review_name = [t for t in at.text_input if t.label == "Your Name"]
+    if review_name:
+        review_name[0].input(name)
+        at.text_area[0].input(f"Benchmark review from {name}")
+        timed_run(at, samples, "review", lambda: next(b for b in at.button if b.label == "Submit Review").click())
+
+    at.session_state["page"] = "mypage"
+    at.session_state["mypage_user_id"] = None
+    at.run()
+    at.text_input(key="mypage_lookup_name").input(name)
+    timed_run(at, samples, "mypage", lambda: at.button(key="mypage_lookup_btn").click())
+    for _ in range(config["iterations"] - 1):
+        timed_run(at, samples, "mypage")
+
+
+def check_capacity(config):
+    """Reads every event from the admin page and lists those with more participants than seats."""
+    at = new_session(config)
+    at.session_state["is_admin"] = True
+    at.session_state["page"] = "admin"
+    at.run()
+    overbooked = []
+    for element in at.json:
+        event = json.loads(element.value)
+        if not isinstance(event, dict) or "max_participants" not in event:
+            continue
+        if event.get("current_participants", 0) > event["max_participants"]:
+            overbooked.append({
+                "id": event.get("id"),
+                "current_participants": event.get("current_participants"),
+                "max_participants": event["max_participants"],
+            })
+    return overbooked
+
+
+def set_faults(config, error_rate, slow_rate, slow_ms):
+    """Sets the fault injection of the backend client that every session in this process shares."""
+    at = new_session(config)
+    at.run()
+    faults = at.session_state["db"].db.faults
+    faults.error_rate, faults.slow_rate, faults.slow_ms = error_rate, slow_rate, slow_ms
+
+
+def run_worker(config, worker_index, session_count):
+    """Runs session_count journeys, interleaved step by step, and returns the samples."""
+    samples = []
+    run_id = config["run_id"]
+    faulty = config["fault_rate"] or config["slow_rate"]
+    if faulty:
+        set_faults(config, config["fault_rate"], config["slow_rate"], config["slow_ms"])
+    try:
+        for i in range(session_count):
+            at = new_session(config)
+            run_journey(
+                at,
+                name=f"Bench {run_id} {worker_index}-{i}",
+                student_id=f"bench-{run_id}-{worker_index}-{i}",
+                event_index=0 if config["hot_event"] else worker_index + i,
+                config=config,
+                samples=samples,
+            )
+    finally:
+        if faulty:
+            set_faults(config, 0, 0, 0)
+    return samples
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def summarize(samples, wall_seconds):
+    scenarios = {}
+    for scenario in SCENARIOS:
+        rows = [s for s in samples if s["scenario"] == scenario]
+        if not rows:
+            continue
+        latencies = [s["seconds"] * 1000 for s in rows]
+        reads = [s["reads"] for s in rows if s["reads"] is not None]
+        writes = [s["writes"] for s in rows if s["writes"] is not None]
+        calls = [s["calls"] for s in rows if s["calls"] is not None]
+        scenarios[scenario] = {
+            "reruns": len(rows),
+            "errors": sum(s["error"] for s in rows),
+            "mean_ms": statistics.fmean(latencies),
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99),
+            "reads_per_rerun": statistics.fmean(reads) if reads else None,
+            "writes_per_rerun": statistics.fmean(writes) if writes else None,
+            "round_trips_per_rerun": statistics.fmean(calls) if calls else None,
+        }
+    return {
+        "reruns": len(samples),
+        "errors": sum(s["error"] for s in samples),
+        "degraded": sum(s.get("degraded", False) for s in samples),
+        "wall_seconds": wall_seconds,
+        "throughput_reruns_per_s": len(samples) / wall_seconds if wall_seconds else None,
+        "scenarios": scenarios,
+    }
+
+
+def write_secrets(config, directory):
+    """Writes a secrets.toml selecting the configured backend, for processes started in directory."""
+    os.makedirs(os.path.join(directory, ".streamlit"), exist_ok=True)
+    with open(os.path.join(directory, ".streamlit", "secrets.toml"), "w") as f:
+        f.write(f'[storage]\nbackend = "{config["backend"]}"\n'
+                f'sqlite_path = {json.dumps(config["sqlite_path"])}\nlatency_ms = {config["latency_ms"]}\n')
+
+
+def measure_import(directory):
+    """Seconds a fresh interpreter takes to import app.py (Streamlit itself already imported)."""
+    code = (
+        "import importlib.util, sys, time, streamlit\n"
+        # As `streamlit run` does, so app.py can import the nodex package next to it
+        f"sys.path.insert(0, {os.path.dirname(APP_PATH)!r})\n"
+        "start = time.perf_counter()\n"
+        f"spec = importlib.util.spec_from_file_location('nodex_app', {APP_PATH!r})\n"
+        "spec.loader.exec_module(importlib.util.module_from_spec(spec))\n"
+        "print(time.perf_counter() - start)\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=directory, capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+async def time_first_page(port, timeout):
+    """Opens one session over the websocket; returns seconds to the navbar and to the end of the run."""
+    import websockets
+    from streamlit.proto.BackMsg_pb2 import BackMsg
+    from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+    async with websockets.connect(f"ws://127.0.0.1:{port}/_stcore/stream", subprotocols=["streamlit"], max_size=None) as ws:
+        request = BackMsg()
+        request.rerun_script.query_string = ""
+        start = time.perf_counter()
+        await ws.send(request.SerializeToString())
+        first_paint = None
+        while True:
+            msg = ForwardMsg()
+            msg.ParseFromString(await asyncio.wait_for(ws.recv(), timeout))
+            kind = msg.WhichOneof("type")
+            if first_paint is None and kind == "delta" and "nav-logo" in str(msg.delta.new_element.markdown.body):
+                first_paint = time.perf_counter() - start
+            if kind == "script_finished":
+                return first_paint, time.perf_counter() - start
+
+
+def measure_server_start(directory, timeout):
+    """Starts a fresh server and times its first two sessions; returns a dict of seconds."""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    command = [sys.executable, "-m", "streamlit", "run", APP_PATH, "--server.headless", "true",
+               "--server.port", str(port), "--server.enableStaticServing", "true",
+               "--browser.gatherUsageStats", "false"]
+    start = time.perf_counter()
+    server = subprocess.Popen(command, cwd=directory, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1)
+                break
+            except OSError:
+                if time.perf_counter() - start > timeout:
+                    raise
+                time.sleep(0.05)
+        server_ready = time.perf_counter() - start
+        cold_paint, cold_run = asyncio.run(time_first_page(port, timeout))
+        warm_paint, warm_run = asyncio.run(time_first_page(port, timeout))
+    finally:
+        server.terminate()
+        server.wait()
+    return {"server_ready": server_ready, "cold_first_paint": cold_paint, "cold_first_run": cold_run,
+            "warm_first_paint": warm_paint, "warm_first_run": warm_run}
+
+
+def run_cold_start(config, trials):
+    """Repeats the import and server start measurements; returns the median of each in ms."""
+    samples = []
+    with tempfile.TemporaryDirectory() as directory:
+        write_secrets(config, directory)
+        for _ in range(trials):
+            sample = {"import": measure_import(directory)}
+            sample.update(measure_server_start(directory, config["timeout"]))
+            samples.append(sample)
+    summary = {
+        f"{key}_ms": statistics.median(s[key] for s in samples) * 1000 if all(s[key] is not None for s in samples) else None
+        for key in samples[0]
+    }
+    return summary, samples
+
+
+def print_cold_start(summary, baseline=None):
+    print(f"{'measure':<20}{'median ms':>12}")
+    for key, value in summary.items():
+        line = f"{key[:-3]:<20}{value:>12.1f}" if value is not None else f"{key[:-3]:<20}{'n/a':>12}"
+        old = (baseline or {}).get(key)
+        if old and value is not None:
+            line += f"   {100 * (value / old - 1):+.0f}% vs baseline"
+        print(line)
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(APP_PATH), text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(summary, baseline=None):
+    print(f"{summary['reruns']} reruns in {summary['wall_seconds']:.1f}s "
+          f"({summary['throughput_reruns_per_s']:.1f} reruns/s), {summary['errors']} errors, "
+          f"{summary.get('degraded', 0)} degraded, "
+          f"{len(summary['overbooked_events'])} overbooked events")
+    header = f"{'scenario':<10}{'reruns':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'reads':>8}{'writes':>8}"
+    print(header)
+    for scenario, stats in summary["scenarios"].items():
+        line = (f"{scenario:<10}{stats['reruns']:>8}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}"
+                f"{stats['p99_ms']:>10.1f}{stats['reads_per_rerun'] or 0:>8.1f}{stats['writes_per_rerun'] or 0:>8.1f}")
+        old = (baseline or {}).get("scenarios", {}).get(scenario)
+        if old and old.get("p50_ms"):
+            line += f"   p50 {100 * (stats['p50_ms'] / old['p50_ms'] - 1):+.0f}% vs baseline"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=10, help="simulated sessions in total")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes (SQLite backend only)")
+    parser.add_argument("--iterations", type=int, default=3, help="reruns per read-only page")
+    parser.add_argument("--backend", choices=("memory", "sqlite"), default="memory")
+    parser.add_argument("--sqlite-path", default="bench.db")
+    parser.add_argument("--latency-ms", type=float, default=0, help="injected latency per backend round trip")
+    parser.add_argument("--fault-rate", type=float, default=0, help="share of backend round trips that fail")
+    parser.add_argument("--slow-rate", type=float, default=0, help="share of backend round trips that are slowed down")
+    parser.add_argument("--slow-ms", type=float, default=5000, help="delay added to a slowed round trip")
+    parser.add_argument("--hot-event", action="store_true",
+                        help="every session joins the same event (join-rush / overbooking check)")
+    parser.add_argument("--timeout", type=float, default=60, help="seconds allowed per rerun")
+    parser.add_argument("--output", help="results file (default bench_results/<timestamp>.json)")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--cold-start", type=int, metavar="N",
+                        help="measure import time and time to first paint over N fresh server starts instead")
+    args = parser.parse_args()
+
+    if args.backend == "memory" and args.workers > 1:
+        parser.error("--workers > 1 needs --backend sqlite (the memory backend lives in one process)")
+    if args.cold_start:
+        if importlib.util.find_spec("websockets") is None:
+            parser.error("--cold-start needs the websockets package: pip install -r requirements-dev.txt")
+
+    config = {
+        "run_id": uuid.uuid4().hex[:6],
+        "backend": args.backend,
+        "sqlite_path": os.path.abspath(args.sqlite_path),
+        "latency_ms": args.latency_ms,
+        "fault_rate": args.fault_rate,
+        "slow_rate": args.slow_rate,
+        "slow_ms": args.slow_ms,
+        "iterations": max(1, args.iterations),
+        "timeout": args.timeout,
+        "hot_event": args.hot_event,
+    }
+    per_worker = [args.sessions // args.workers + (i < args.sessions % args.workers) for i in range(args.workers)]
+
+    if args.cold_start:
+        summary, samples = run_cold_start(config, args.cold_start)
+    else:
+        if args.workers == 1:
+            setup_data(config)
+            start = time.perf_counter()
+            samples = run_worker(config, 0, args.sessions)
+            wall_seconds = time.perf_counter() - start
+            overbooked = check_capacity(config)
+        else:
+            # AppTest runs app.py as __main__, which breaks pickling this module's functions
+            # afterwards, so every task (setup and the final check too) gets a fresh spawned
+            # process. All of them share the SQLite file.
+            samples = []
+            spawn = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=args.workers, mp_context=spawn, max_tasks_per_child=1) as pool:
+                pool.submit(setup_data, config).result()
+                start = time.perf_counter()
+                futures = [pool.submit(run_worker, config, i, n) for i, n in enumerate(per_worker) if n]
+                for future in futures:
+                    samples.extend(future.result())
+                wall_seconds = time.perf_counter() - start
+                overbooked = pool.submit(check_capacity, config).result()
+
+        summary = summarize(samples, wall_seconds)
+        summary["overbooked_events"] = overbooked
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f).get("summary")
+    if args.cold_start:
+        print_cold_start(summary, baseline)
+    else:
+        print_report(summary, baseline)
+
+    output = args.output or os.path.join("bench_results", datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "git_revision": git_revision(),
+            "config": {**config, "sessions": args.sessions, "workers": args.workers},
+            "summary": summary,
+            "samples": samples,
+        }, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
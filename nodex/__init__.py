@@ -0,0 +1,2 @@
+"""Datastore plumbing behind app.py: local backends, read caches, metering, profiling,
+deadlines and the circuit breaker, the write-behind queue and the live mirror."""
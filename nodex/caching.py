@@ -0,0 +1,119 @@
+"""Read caches shared by every session's RealFirestore."""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+# Seconds a cached read stays fresh before it is fetched again
+CACHE_TTL_SECONDS = 30
+
+class ReadCache:
+    """Process-wide TTL cache shared by every session's RealFirestore.
+
+    Keys are tuples whose first element is a namespace ("events", "reviews", ...),
+    so a write can drop every entry it affects with a single invalidate() call.
+    """
+
+    def __init__(self, ttl=CACHE_TTL_SECONDS):
+        self.ttl = ttl
+        self._entries = {}
+        self._generations = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get_or_load(self, key, loader, ttl=None):
+        """Returns the cached value for key, calling loader() on a miss."""
+        hits, generation = self.get_many([key])
+        if key in hits:
+            return hits[key]
+
+        value = loader()
+        self.put_many({key: value}, generation, ttl)
+        return copy.deepcopy(value)
+
+    def get_many(self, keys):
+        """Looks up several keys at once.
+
+        Returns ({key: value} for fresh entries, generation token). Pass the token to
+        put_many() with the values loaded for the misses.
+        """
+        now = time.monotonic()
+        hits = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry and entry[0] > now:
+                    self.hits += 1
+                    hits[key] = copy.deepcopy(entry[1])
+                else:
+                    self.misses += 1
+            generation = {key[0]: self._generations.get(key[0], 0) for key in keys}
+        return hits, generation
+
+    def put_many(self, values, generation, ttl=None):
+        """Stores loaded values unless their namespace was invalidated since get_many()."""
+        expires = time.monotonic() + (ttl or self.ttl)
+        with self._lock:
+            for key, value in values.items():
+                # Skip storing if a write invalidated the namespace while we were loading
+                if self._generations.get(key[0], 0) == generation.get(key[0]):
+                    self._entries[key] = (expires, value)
+
+    def invalidate(self, *namespaces):
+        """Drops every entry belonging to the given namespaces."""
+        with self._lock:
+            for namespace in namespaces:
+                self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            stale = [key for key in self._entries if key[0] in namespaces]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            for namespace in {key[0] for key in self._entries}:
+                self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self._entries),
+                "invalidations": self.invalidations,
+            }
+
+class LRUCache:
+    """Small thread-safe least-recently-used map."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
@@ -0,0 +1,820 @@
+"""In-memory and SQLite backends behind the Firestore client API.
+
+LocalFirestore implements the subset of the Firestore client API that RealFirestore
+uses (collections, documents, queries, batches, transactions, get_all), so the app,
+load tests and demos run without live Firebase. The storage engine is pluggable:
+MemoryEngine keeps documents in a thread-safe dict, SqliteEngine persists them
+in a WAL-mode SQLite file. Both share the write and query logic below, so
+increments, array transforms, batches and transactions behave identically.
+"""
+import contextlib
+import copy
+import functools
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+from nodex.metering import OpCounter
+
+logger = logging.getLogger("nodex")
+
+# Auto-generated document IDs, same shape as Firestore's
+AUTO_ID_CHARS = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+
+# Fields the SQLite engine indexes, per query they serve
+SQLITE_INDEXED_FIELDS = (
+    ("is_upcoming", "starts_at"),
+    ("name",),
+    ("is_visible", "created_at"),
+    ("metric", "period", "start"),
+)
+
+# Prefix marking encoded timestamps in SQLite JSON (keeps them ordered as text)
+SQLITE_TIMESTAMP_TAG = "__ts__:"
+
+def _auto_id():
+    return "".join(random.choice(AUTO_ID_CHARS) for _ in range(20))
+
+def _split_path(path):
+    """Splits 'a/b/c/d' into ('a/b/c', 'd')."""
+    collection, _, doc_id = path.rpartition("/")
+    return collection, doc_id
+
+def _normalize_value(value):
+    """Deep-copies a stored value, converting datetimes to timezone-aware UTC."""
+    if isinstance(value, datetime):
+        return value.astimezone(timezone.utc) if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    if isinstance(value, dict):
+        return {k: _normalize_value(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize_value(v) for v in value]
+    return copy.deepcopy(value)
+
+def _type_rank(value):
+    """Firestore's cross-type ordering: null < bool < number < timestamp < string < bytes < array < map."""
+    if value is None: return 0
+    if isinstance(value, bool): return 1
+    if isinstance(value, (int, float)): return 2
+    if isinstance(value, datetime): return 3
+    if isinstance(value, str): return 4
+    if isinstance(value, bytes): return 5
+    if isinstance(value, list): return 6
+    return 7
+
+def _compare_values(a, b):
+    rank_a, rank_b = _type_rank(a), _type_rank(b)
+    if rank_a != rank_b:
+        return -1 if rank_a < rank_b else 1
+    if rank_a == 0:
+        return 0
+    if rank_a == 7:
+        a, b = sorted(a.items()), sorted(b.items())
+        for (key_a, value_a), (key_b, value_b) in zip(a, b):
+            if key_a != key_b:
+                return -1 if key_a < key_b else 1
+            result = _compare_values(value_a, value_b)
+            if result:
+                return result
+        return (len(a) > len(b)) - (len(a) < len(b))
+    if rank_a == 6:
+        for x, y in zip(a, b):
+            result = _compare_values(x, y)
+            if result:
+                return result
+        return (len(a) > len(b)) - (len(a) < len(b))
+    return (a > b) - (a < b)
+
+_MISSING = object()
+
+def _get_field(data, field_path):
+    value = data
+    for part in field_path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+def _resolve_transform(current, value):
+    """Applies a write value (plain or Firestore transform) to a field's current value."""
+    from google.cloud.firestore import DELETE_FIELD, SERVER_TIMESTAMP, ArrayRemove, ArrayUnion, Increment
+    from google.cloud.firestore_v1.transforms import Maximum, Minimum
+    if isinstance(value, Increment):
+        base = current if isinstance(current, (int, float)) and not isinstance(current, bool) else 0
+        return base + value.value
+    if isinstance(value, Maximum):
+        return value.value if not isinstance(current, (int, float)) else max(current, value.value)
+    if isinstance(value, Minimum):
+        return value.value if not isinstance(current, (int, float)) else min(current, value.value)
+    if isinstance(value, ArrayUnion):
+        result = list(current) if isinstance(current, list) else []
+        for item in value.values:
+            item = _normalize_value(item)
+            if item not in result:
+                result.append(item)
+        return result
+    if isinstance(value, ArrayRemove):
+        removed = [_normalize_value(item) for item in value.values]
+        return [item for item in current if item not in removed] if isinstance(current, list) else []
+    if value is SERVER_TIMESTAMP:
+        return datetime.now(timezone.utc)
+    if isinstance(value, dict):
+        return {k: v for k, v in ((k, _resolve_transform(_MISSING, v)) for k, v in value.items()) if v is not _MISSING}
+    if value is DELETE_FIELD:
+        return _MISSING
+    return _normalize_value(value)
+
+def _merge_into(target, updates):
+    """Deep-merges set(..., merge=True) data into target in place."""
+    for key, value in updates.items():
+        current = target.get(key, _MISSING)
+        if isinstance(value, dict) and not isinstance(current, dict):
+            current = _MISSING
+        if isinstance(value, dict) and current is not _MISSING:
+            _merge_into(current, value)
+            continue
+        resolved = _resolve_transform(current, value)
+        if resolved is _MISSING:
+            target.pop(key, None)
+        else:
+            target[key] = resolved
+
+def _update_into(target, updates):
+    """Applies update() data (dotted field paths, maps replaced wholesale) to target in place."""
+    for field_path, value in updates.items():
+        parts = field_path.split(".")
+        parent = target
+        for part in parts[:-1]:
+            if not isinstance(parent.get(part), dict):
+                parent[part] = {}
+            parent = parent[part]
+        resolved = _resolve_transform(parent.get(parts[-1], _MISSING), value)
+        if resolved is _MISSING:
+            parent.pop(parts[-1], None)
+        else:
+            parent[parts[-1]] = resolved
+
+def _apply_write(current, write):
+    """Returns a document's data after one write (None when deleted)."""
+    from google.api_core.exceptions import AlreadyExists, NotFound
+    op, path, data, merge = write
+    if op == "delete":
+        return None
+    if op == "create" and current is not None:
+        raise AlreadyExists(f"Document already exists: {path}")
+    if op == "update":
+        if current is None:
+            raise NotFound(f"No document to update: {path}")
+        result = copy.deepcopy(current)
+        _update_into(result, data)
+        return result
+    if op == "set" and merge and current is not None:
+        result = copy.deepcopy(current)
+        _merge_into(result, data)
+        return result
+    result = {}
+    _merge_into(result, data)
+    return result
+
+def _matches(data, field, op, value):
+    actual = _get_field(data, field)
+    if actual is _MISSING:
+        return False
+    if op == "==":
+        return _compare_values(actual, value) == 0 and _type_rank(actual) == _type_rank(value)
+    if op == "!=":
+        return actual is not None and _compare_values(actual, value) != 0
+    if op == "in":
+        return any(_compare_values(actual, v) == 0 for v in value)
+    if op == "not-in":
+        return actual is not None and all(_compare_values(actual, v) != 0 for v in value)
+    if op == "array_contains":
+        return isinstance(actual, list) and any(_compare_values(item, value) == 0 for item in actual)
+    if op == "array_contains_any":
+        return isinstance(actual, list) and any(_compare_values(item, v) == 0 for item in actual for v in value)
+    # Range filters only match values of the same type, as in Firestore
+    if _type_rank(actual) != _type_rank(value):
+        return False
+    result = _compare_values(actual, value)
+    return {"<": result < 0, "<=": result <= 0, ">": result > 0, ">=": result >= 0}[op]
+
+def _effective_orders(filters, orders):
+    """Order-bys plus Firestore's implicit ordering on an inequality-filtered field."""
+    orders = list(orders)
+    if not orders:
+        for field, op, _ in filters:
+            if op in ("<", "<=", ">", ">=", "!=", "not-in"):
+                orders.append((field, "ASCENDING"))
+                break
+    return orders
+
+def _split_name_order(filters, orders):
+    """Effective field order-bys and the direction of the document-path tie-break.
+
+    Ties follow the last order-by unless the query orders on "__name__" explicitly.
+    """
+    orders = _effective_orders(filters, orders)
+    field_orders = [(field, direction) for field, direction in orders if field != "__name__"]
+    name_direction = field_orders[-1][1] if field_orders else "ASCENDING"
+    for field, direction in orders:
+        if field == "__name__":
+            name_direction = direction
+    return field_orders, name_direction
+
+def _run_query(docs, filters, orders, limit, cursor):
+    """Filters, orders and pages [(path, data)] exactly like Firestore would."""
+    orders, name_direction = _split_name_order(filters, orders)
+    rows = [
+        (path, data) for path, data in docs
+        if all(_matches(data, f, op, v) for f, op, v in filters)
+        and all(_get_field(data, field) is not _MISSING for field, _ in orders)
+    ]
+
+    def compare_fields(data_a, data_b):
+        for field, direction in orders:
+            result = _compare_values(_get_field(data_a, field), _get_field(data_b, field))
+            if result:
+                return -result if direction == "DESCENDING" else result
+        return 0
+
+    def compare(row_a, row_b):
+        result = compare_fields(row_a[1], row_b[1])
+        if result:
+            return result
+        result = (row_a[0] > row_b[0]) - (row_a[0] < row_b[0])
+        return -result if name_direction == "DESCENDING" else result
+
+    rows.sort(key=functools.cmp_to_key(compare))
+
+    if cursor is not None:
+        cursor_path, cursor_data = cursor
+        if cursor_path is None:
+            # Plain field values: skip every document with those values
+            rows = [row for row in rows if compare_fields(row[1], cursor_data) > 0]
+        else:
+            rows = [row for row in rows if compare(row, (cursor_path, cursor_data)) > 0]
+    if limit is not None:
+        rows = rows[:limit]
+    return rows
+
+class MemoryEngine:
+    """Thread-safe in-process document storage."""
+
+    def __init__(self):
+        self._collections = {}
+        self._lock = threading.RLock()
+        self._version = 0
+
+    def atomic(self):
+        """Context manager that serializes a transaction against every other write."""
+        return self._lock
+
+    def version(self):
+        """Changes whenever data is written (polled by snapshot listeners)."""
+        return self._version
+
+    def get_many(self, paths):
+        with self._lock:
+            found = {}
+            for path in paths:
+                collection, doc_id = _split_path(path)
+                data = self._collections.get(collection, {}).get(doc_id)
+                if data is not None:
+                    found[path] = copy.deepcopy(data)
+            return found
+
+    def query(self, collection, filters, orders, limit, cursor):
+        with self._lock:
+            docs = [(f"{collection}/{doc_id}", data) for doc_id, data in self._collections.get(collection, {}).items()]
+            return [(path, copy.deepcopy(data)) for path, data in _run_query(docs, filters, orders, limit, cursor)]
+
+    def list_ids(self, collection):
+        """IDs of documents in a collection, including ones that only hold subcollections."""
+        prefix = f"{collection}/"
+        with self._lock:
+            ids = set(self._collections.get(collection, {}))
+            for path in self._collections:
+                if path.startswith(prefix):
+                    ids.add(path[len(prefix):].split("/", 1)[0])
+            return sorted(ids)
+
+    def apply(self, writes):
+        """Applies writes atomically: all of them, or none if one fails."""
+        with self._lock:
+            current = self.get_many([write[1] for write in writes])
+            for write in writes:
+                current[write[1]] = _apply_write(current.get(write[1]), write)
+            for path, data in current.items():
+                collection, doc_id = _split_path(path)
+                if data is None:
+                    self._collections.get(collection, {}).pop(doc_id, None)
+                else:
+                    self._collections.setdefault(collection, {})[doc_id] = data
+            self._version += 1
+
+class SqliteEngine:
+    """Document storage in a SQLite file (WAL mode, expression indexes on queried fields)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.RLock()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "path TEXT PRIMARY KEY, collection TEXT NOT NULL, doc_id TEXT NOT NULL, data TEXT NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_documents_collection ON documents(collection, doc_id)")
+        for fields in SQLITE_INDEXED_FIELDS:
+            columns = ", ".join(f"json_extract(data, '{self._json_path(f)}')" for f in fields)
+            conn.execute(f"CREATE INDEX IF NOT EXISTS ix_documents_{'_'.join(fields)} ON documents(collection, {columns})")
+
+    def version(self):
+        """Changes whenever another connection commits (polled by snapshot listeners).
+
+        SQLite's data_version ignores the polling connection's own commits, so only
+        call this from a thread that does not write, such as a listener thread.
+        """
+        return self._conn().execute("PRAGMA data_version").fetchone()[0]
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.depth = 0
+        return conn
+
+    @staticmethod
+    def _json_path(field_path):
+        return "$." + ".".join(
+            part if part.isidentifier() else '"' + part.replace('"', '""') + '"'
+            for part in field_path.split(".")
+        )
+
+    @staticmethod
+    def _encode(value):
+        if isinstance(value, datetime):
+            return SQLITE_TIMESTAMP_TAG + value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+        if isinstance(value, dict):
+            return {k: SqliteEngine._encode(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [SqliteEngine._encode(v) for v in value]
+        return value
+
+    @staticmethod
+    def _decode(value):
+        if isinstance(value, str) and value.startswith(SQLITE_TIMESTAMP_TAG):
+            return datetime.strptime(value[len(SQLITE_TIMESTAMP_TAG):], "%Y-%m-%dT%H:%M:%S.%fZ").replace(tzinfo=timezone.utc)
+        if isinstance(value, dict):
+            return {k: SqliteEngine._decode(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [SqliteEngine._decode(v) for v in value]
+        return value
+
+    @contextlib.contextmanager
+    def atomic(self):
+        """Runs the block in one IMMEDIATE transaction (reentrant within a thread)."""
+        with self._lock:
+            conn = self._conn()
+            if self._local.depth == 0:
+                conn.execute("BEGIN IMMEDIATE")
+            self._local.depth += 1
+            try:
+                yield
+            except BaseException:
+                self._local.depth -= 1
+                if self._local.depth == 0:
+                    conn.execute("ROLLBACK")
+                raise
+            self._local.depth -= 1
+            if self._local.depth == 0:
+                conn.execute("COMMIT")
+
+    def get_many(self, paths):
+        paths = list(paths)
+        if not paths:
+            return {}
+        placeholders = ", ".join("?" for _ in paths)
+        rows = self._conn().execute(f"SELECT path, data FROM documents WHERE path IN ({placeholders})", paths)
+        return {path: self._decode(json.loads(data)) for path, data in rows}
+
+    def _type_guard(self, json_path, value):
+        """SQL condition restricting a field to the Firestore type of value."""
+        kind = f"json_type(data, '{json_path}')"
+        if isinstance(value, bool):
+            return f"{kind} IN ('true', 'false')"
+        if isinstance(value, (int, float)):
+            return f"{kind} IN ('integer', 'real')"
+        tagged = f"substr(json_extract(data, '{json_path}'), 1, {len(SQLITE_TIMESTAMP_TAG)}) = '{SQLITE_TIMESTAMP_TAG}'"
+        if isinstance(value, datetime):
+            return f"{kind} = 'text' AND {tagged}"
+        return f"{kind} = 'text' AND NOT {tagged}"
+
+    def query(self, collection, filters, orders, limit, cursor):
+        where, params, pushed = ["collection = ?"], [collection], 0
+        for field, op, value in filters:
+            # Simple comparisons run in SQL (and can use the indexes); everything is re-checked below
+            if op in ("==", "<", "<=", ">", ">=") and isinstance(value, (bool, int, float, str, datetime)):
+                json_path = self._json_path(field)
+                sql_op = "=" if op == "==" else op
+                where.append(f"json_extract(data, '{json_path}') {sql_op} ? AND {self._type_guard(json_path, value)}")
+                params.append(self._encode(value))
+                pushed += 1
+
+        order_sql = []
+        effective_orders, name_direction = _split_name_order(filters, orders)
+        for field, direction in effective_orders:
+            json_path = self._json_path(field)
+            sql_direction = "DESC" if direction == "DESCENDING" else "ASC"
+            where.append(f"json_type(data, '{json_path}') IS NOT NULL")
+            rank = (
+                f"CASE json_type(data, '{json_path}') WHEN 'null' THEN 0 WHEN 'true' THEN 1 WHEN 'false' THEN 1 "
+                f"WHEN 'integer' THEN 2 WHEN 'real' THEN 2 WHEN 'text' THEN "
+                f"(CASE WHEN substr(json_extract(data, '{json_path}'), 1, {len(SQLITE_TIMESTAMP_TAG)}) = '{SQLITE_TIMESTAMP_TAG}' THEN 3 ELSE 4 END) "
+                f"WHEN 'array' THEN 6 ELSE 7 END"
+            )
+            order_sql.append(f"{rank} {sql_direction}, json_extract(data, '{json_path}') {sql_direction}")
+        order_sql.append(f"path {'DESC' if name_direction == 'DESCENDING' else 'ASC'}")
+
+        sql = f"SELECT path, data FROM documents WHERE {' AND '.join(where)} ORDER BY {', '.join(order_sql)}"
+        if limit is not None and cursor is None and pushed == len(filters):
+            sql += f" LIMIT {int(limit)}"
+        rows = [(path, self._decode(json.loads(data))) for path, data in self._conn().execute(sql, params)]
+        return _run_query(rows, filters, orders, limit, cursor)
+
+    def list_ids(self, collection):
+        prefix = f"{collection}/"
+        rows = self._conn().execute(
+            "SELECT path FROM documents WHERE substr(path, 1, ?) = ?", (len(prefix), prefix)
+        )
+        return sorted({path[len(prefix):].split("/", 1)[0] for (path,) in rows})
+
+    def apply(self, writes):
+        with self.atomic():
+            current = self.get_many([write[1] for write in writes])
+            for write in writes:
+                current[write[1]] = _apply_write(current.get(write[1]), write)
+            conn = self._conn()
+            for path, data in current.items():
+                if data is None:
+                    conn.execute("DELETE FROM documents WHERE path = ?", (path,))
+                else:
+                    collection, doc_id = _split_path(path)
+                    conn.execute(
+                        "INSERT OR REPLACE INTO documents (path, collection, doc_id, data) VALUES (?, ?, ?, ?)",
+                        (path, collection, doc_id, json.dumps(self._encode(data))),
+                    )
+
+class LocalDocumentSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data)
+
+    def get(self, field_path):
+        value = _get_field(self._data or {}, field_path)
+        if value is _MISSING:
+            raise KeyError(field_path)
+        return copy.deepcopy(value)
+
+class LocalDocumentReference:
+    def __init__(self, client, path):
+        self._client = client
+        self.path = path
+        self.id = _split_path(path)[1]
+
+    def __eq__(self, other):
+        return isinstance(other, LocalDocumentReference) and other.path == self.path
+
+    def __hash__(self):
+        return hash(self.path)
+
+    @property
+    def parent(self):
+        return LocalCollectionReference(self._client, _split_path(self.path)[0])
+
+    def collection(self, name):
+        return LocalCollectionReference(self._client, f"{self.path}/{name}")
+
+    def get(self, transaction=None):
+        return next(iter(self._client.get_all([self], transaction=transaction)))
+
+    def create(self, document_data):
+        self._client._commit([("create", self.path, document_data, False)])
+
+    def set(self, document_data, merge=False):
+        self._client._commit([("set", self.path, document_data, merge)])
+
+    def update(self, field_updates):
+        self._client._commit([("update", self.path, field_updates, False)])
+
+    def delete(self):
+        self._client._commit([("delete", self.path, None, False)])
+
+class LocalQuery:
+    ASCENDING = "ASCENDING"
+    DESCENDING = "DESCENDING"
+
+    def __init__(self, client, collection_path, filters=(), orders=(), limit=None, cursor=None):
+        self._client = client
+        self._path = collection_path
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit
+        self._cursor = cursor
+
+    def _copy(self, **changes):
+        state = dict(filters=self._filters, orders=self._orders, limit=self._limit, cursor=self._cursor)
+        state.update(changes)
+        return LocalQuery(self._client, self._path, **state)
+
+    def where(self, field_path=None, op_string=None, value=None, *, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path, direction=ASCENDING):
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def start_after(self, document_fields_or_snapshot):
+        if isinstance(document_fields_or_snapshot, LocalDocumentSnapshot):
+            cursor = (document_fields_or_snapshot.reference.path, document_fields_or_snapshot.to_dict())
+        else:
+            fields = dict(document_fields_or_snapshot)
+            name = fields.pop("__name__", None)
+            if isinstance(name, LocalDocumentReference):
+                name = name.path
+            elif name is not None:
+                name = f"{self._path}/{name}"
+            cursor = (name, fields)
+        return self._copy(cursor=cursor)
+
+    def stream(self, transaction=None):
+        filters = [(field, op, _normalize_value(value)) for field, op, value in self._filters]
+        rows = self._client._query(self._path, filters, self._orders, self._limit, self._cursor)
+        for path, data in rows:
+            yield LocalDocumentSnapshot(LocalDocumentReference(self._client, path), data)
+
+    def get(self, transaction=None):
+        return list(self.stream(transaction=transaction))
+
+class LocalCollectionReference(LocalQuery):
+    def __init__(self, client, path):
+        super().__init__(client, path)
+        self.id = _split_path(path)[1]
+
+    def document(self, document_id=None):
+        return LocalDocumentReference(self._client, f"{self._path}/{document_id or _auto_id()}")
+
+    def add(self, document_data, document_id=None):
+        ref = self.document(document_id)
+        ref.create(document_data)
+        return datetime.now(timezone.utc), ref
+
+    def list_documents(self, page_size=None):
+        self._client._round_trip()
+        for doc_id in self._client._engine.list_ids(self._path):
+            yield LocalDocumentReference(self._client, f"{self._path}/{doc_id}")
+
+    def on_snapshot(self, callback):
+        """Calls callback(docs, changes, read_time) with the collection now and after every change."""
+        return LocalWatch(self._client, self._path, callback)
+
+class LocalWriteBatch:
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def create(self, reference, document_data):
+        self._writes.append(("create", reference.path, document_data, False))
+
+    def set(self, reference, document_data, merge=False):
+        self._writes.append(("set", reference.path, document_data, merge))
+
+    def update(self, reference, field_updates):
+        self._writes.append(("update", reference.path, field_updates, False))
+
+    def delete(self, reference):
+        self._writes.append(("delete", reference.path, None, False))
+
+    def commit(self):
+        writes, self._writes = self._writes, []
+        self._client._commit(writes)
+        return writes
+
+class LocalTransaction(LocalWriteBatch):
+    """Buffers writes and applies them atomically when run_transaction() returns."""
+
+    def get(self, ref_or_query):
+        if isinstance(ref_or_query, LocalDocumentReference):
+            return iter(self._client.get_all([ref_or_query], transaction=self))
+        return ref_or_query.stream(transaction=self)
+
+class FaultInjector:
+    """Makes a local backend misbehave on purpose, to exercise deadlines, retries and the circuit breaker.
+
+    Before each round trip, `slow_rate` of them are delayed by `slow_ms` and then
+    `error_rate` of them fail with ServiceUnavailable, as an overloaded Firestore would.
+    The rates can be changed while the app runs (admin dashboard).
+    """
+
+    def __init__(self, error_rate=0.0, slow_rate=0.0, slow_ms=0):
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_ms = slow_ms
+        self.injected_errors = 0
+        self.injected_delays = 0
+
+    def before_round_trip(self):
+        if self.slow_rate and random.random() < self.slow_rate:
+            self.injected_delays += 1
+            time.sleep(self.slow_ms / 1000)
+        if self.error_rate and random.random() < self.error_rate:
+            self.injected_errors += 1
+            from google.api_core.exceptions import ServiceUnavailable
+            raise ServiceUnavailable("Injected fault")
+
+class LocalFirestore:
+    """Firestore-compatible client over a local storage engine.
+
+    `latency_ms` is slept before every round trip to emulate network latency, and
+    each thread's document reads, writes and round trips are counted for benchmarks.
+    `faults` (a FaultInjector) can make round trips slow or fail.
+    """
+
+    def __init__(self, engine, latency_ms=0, faults=None):
+        self._engine = engine
+        self.latency = latency_ms / 1000
+        self.faults = faults
+        self._ops = OpCounter()
+        self._watches = set()
+
+    def _round_trip(self, reads=0, writes=0):
+        if self.faults is not None:
+            self.faults.before_round_trip()
+        if self.latency:
+            time.sleep(self.latency)
+        self._ops.add(1, reads, writes)
+
+    def op_counts(self):
+        """Round trips, document reads and document writes made in the current context."""
+        return self._ops.snapshot()
+
+    def op_scope(self):
+        """Context manager in which op_counts() covers only the operations made inside it."""
+        return self._ops.scope()
+
+    def collection(self, path):
+        return LocalCollectionReference(self, path)
+
+    def document(self, path):
+        return LocalDocumentReference(self, path)
+
+    def batch(self):
+        return LocalWriteBatch(self)
+
+    def transaction(self):
+        return LocalTransaction(self)
+
+    def get_all(self, references, field_paths=None, transaction=None):
+        references = list(references)
+        self._round_trip(reads=len(references))
+        found = self._engine.get_many([ref.path for ref in references])
+        for ref in references:
+            yield LocalDocumentSnapshot(ref, found.get(ref.path))
+
+    def run_transaction(self, func):
+        """Runs func(transaction) while holding the engine's write lock, then commits its writes.
+
+        Holding the lock makes the transaction serializable, the same guarantee
+        Firestore gives by aborting and retrying conflicting transactions.
+        """
+        with self._engine.atomic():
+            transaction = self.transaction()
+            result = func(transaction)
+            transaction.commit()
+        return result
+
+    def _query(self, collection, filters, orders, limit, cursor):
+        rows = self._engine.query(collection, filters, orders, limit, cursor)
+        # Firestore bills at least one read per query, even when nothing matches
+        self._round_trip(reads=max(len(rows), 1))
+        return rows
+
+    def _commit(self, writes):
+        if writes:
+            self._round_trip(writes=len(writes))
+            self._engine.apply(writes)
+            # Listeners in this process hear about the change right away instead of at their next poll
+            for watch in list(self._watches):
+                watch.notify()
+
+class LocalChangeType:
+    """Stand-in for google.cloud.firestore_v1.watch.ChangeType (only .name is used)."""
+
+    def __init__(self, name):
+        self.name = name
+
+LOCAL_CHANGE_TYPES = {name: LocalChangeType(name) for name in ("ADDED", "MODIFIED", "REMOVED")}
+
+class LocalDocumentChange:
+    def __init__(self, type_name, document):
+        self.type = LOCAL_CHANGE_TYPES[type_name]
+        self.document = document
+
+# Seconds between checks for writes made by other processes (SQLite backend)
+LOCAL_WATCH_POLL_SECONDS = 0.5
+
+class LocalWatch:
+    """on_snapshot listener for a local collection.
+
+    A daemon thread re-reads the collection whenever the engine's version changes
+    (commits in this process also wake it at once) and reports the difference to
+    the callback, like Firestore's watch stream.
+    """
+
+    def __init__(self, client, collection, callback):
+        self._client = client
+        self._collection = collection
+        self._callback = callback
+        self._known = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"nodex-watch-{collection}", daemon=True)
+        client._watches.add(self)
+        self._thread.start()
+
+    @property
+    def is_active(self):
+        return self._thread.is_alive() and not self._stop.is_set()
+
+    def notify(self):
+        self._wake.set()
+
+    def unsubscribe(self):
+        self._stop.set()
+        self._wake.set()
+        self._client._watches.discard(self)
+
+    def _run(self):
+        version, first = None, True
+        while not self._stop.is_set():
+            try:
+                current_version = self._client._engine.version()
+                if first or current_version != version:
+                    version = current_version
+                    self._push(first)
+                    first = False
+            except Exception:
+                logger.exception("Snapshot listener on %s failed", self._collection)
+                self.unsubscribe()
+                return
+            self._wake.wait(LOCAL_WATCH_POLL_SECONDS)
+            self._wake.clear()
+
+    def _push(self, first):
+        rows = dict(self._client._engine.query(self._collection, (), (), None, None))
+        def snapshot(path, data):
+            return LocalDocumentSnapshot(LocalDocumentReference(self._client, path), data)
+
+        changes = [
+            LocalDocumentChange("ADDED" if path not in self._known else "MODIFIED", snapshot(path, data))
+            for path, data in rows.items() if self._known.get(path) != data
+        ]
+        changes += [
+            LocalDocumentChange("REMOVED", snapshot(path, data))
+            for path, data in self._known.items() if path not in rows
+        ]
+        self._known = rows
+        if changes or first:
+            docs = [snapshot(path, data) for path, data in rows.items()]
+            self._callback(docs, changes, datetime.now(timezone.utc))
+
+def create_local_client(settings):
+    """Builds a LocalFirestore from the [storage] settings (backend = "memory" | "sqlite").
+
+    `fault_rate`, `slow_rate` and `slow_ms` set up its FaultInjector (all off by default).
+    """
+    latency_ms = float(settings.get("latency_ms", 0))
+    faults = FaultInjector(
+        float(settings.get("fault_rate", 0)), float(settings.get("slow_rate", 0)), float(settings.get("slow_ms", 0))
+    )
+    if settings.get("backend") == "sqlite":
+        return LocalFirestore(SqliteEngine(settings.get("sqlite_path", "nodex.db")), latency_ms=latency_ms, faults=faults)
+    return LocalFirestore(MemoryEngine(), latency_ms=latency_ms, faults=faults)
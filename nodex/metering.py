@@ -0,0 +1,288 @@
+"""Counting of datastore operations and their latency, cost and attribution."""
+import contextlib
+import contextvars
+import copy
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+from nodex.profiling import profile_span
+
+# Upper bounds (ms) of the datastore latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Firestore list prices in USD per 100,000 document operations, for cost estimates
+FIRESTORE_PRICE_PER_100K = {"reads": 0.06, "writes": 0.18}
+
+# Sessions whose totals are kept; the least recently active one is dropped first
+METER_SESSIONS = 200
+
+class OpCounter:
+    """Backend round trips, document reads and document writes per execution context.
+
+    Every thread starts with its own counts; tasks run by the parallel fetcher share
+    the counts of the rerun that submitted them. Inside scope() a block gets counts of
+    its own, which its operations are added to as well as to the enclosing ones.
+    """
+
+    def __init__(self):
+        # Innermost counts first, then the counts of each enclosing scope
+        self._counts = contextvars.ContextVar(f"nodex_ops_{id(self)}", default=None)
+        self._lock = threading.Lock()
+
+    def _chain(self):
+        chain = self._counts.get()
+        if chain is None:
+            chain = ({"calls": 0, "reads": 0, "writes": 0},)
+            self._counts.set(chain)
+        return chain
+
+    def add(self, calls=0, reads=0, writes=0):
+        chain = self._chain()
+        with self._lock:
+            for counts in chain:
+                counts["calls"] += calls
+                counts["reads"] += reads
+                counts["writes"] += writes
+
+    def snapshot(self):
+        counts = self._chain()[0]
+        with self._lock:
+            return dict(counts)
+
+    @contextlib.contextmanager
+    def scope(self):
+        """Counts the block's operations apart from those of concurrent tasks sharing the enclosing counts."""
+        token = self._counts.set(({"calls": 0, "reads": 0, "writes": 0},) + self._chain())
+        try:
+            yield
+        finally:
+            self._counts.reset(token)
+
+class DatastoreMeter:
+    """Process-wide call, document and latency statistics for RealFirestore methods.
+
+    Each rerun registers its page and session with begin_rerun(); calls made in that
+    rerun's context are attributed to them. Calls from background threads count as
+    "background" and belong to no session. Totals are kept for the `max_sessions`
+    most recently active sessions.
+    """
+
+    def __init__(self, max_sessions=METER_SESSIONS):
+        self._lock = threading.Lock()
+        self._context = contextvars.ContextVar("nodex_meter_page", default=("background", None))
+        self.max_sessions = max_sessions
+        self.methods = {}
+        self.pages = {}
+        self.sessions = OrderedDict()
+
+    def begin_rerun(self, page, session_id):
+        self._context.set((page, session_id))
+        with self._lock:
+            self._page_stats(page)["views"] += 1
+            session = self._session_stats(session_id)
+            session["views"] += 1
+            session["page"] = page
+
+    def current_page(self):
+        return self._context.get()[0]
+
+    @staticmethod
+    def _totals():
+        return {"views": 0, "calls": 0, "seconds": 0.0, "reads": 0, "writes": 0}
+
+    def _page_stats(self, page):
+        return self.pages.setdefault(page, self._totals())
+
+    def _session_stats(self, session_id):
+        session = self.sessions.get(session_id)
+        if session is None:
+            session = self.sessions[session_id] = {**self._totals(), "page": None}
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+        self.sessions.move_to_end(session_id)
+        return session
+
+    def record(self, method, seconds, reads, writes):
+        bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS_MS) if seconds * 1000 <= bound), len(LATENCY_BUCKETS_MS))
+        with self._lock:
+            stats = self.methods.setdefault(method, {
+                "calls": 0, "seconds": 0.0, "reads": 0, "writes": 0,
+                "histogram": [0] * (len(LATENCY_BUCKETS_MS) + 1),
+            })
+            stats["calls"] += 1
+            stats["seconds"] += seconds
+            stats["reads"] += reads
+            stats["writes"] += writes
+            stats["histogram"][bucket] += 1
+
+            page_name, session_id = self._context.get()
+            totals = [self._page_stats(page_name)]
+            if session_id is not None:
+                totals.append(self._session_stats(session_id))
+            for stats in totals:
+                stats["calls"] += 1
+                stats["seconds"] += seconds
+                stats["reads"] += reads
+                stats["writes"] += writes
+
+    def snapshot(self):
+        with self._lock:
+            return copy.deepcopy(self.methods), copy.deepcopy(self.pages)
+
+    def top_sessions(self, count=10, key="reads"):
+        """[(session_id, totals)] of the tracked sessions with the highest `key` total."""
+        with self._lock:
+            ranked = sorted(self.sessions.items(), key=lambda item: item[1][key], reverse=True)[:count]
+            return [(session_id, dict(stats)) for session_id, stats in ranked]
+
+    def reset(self):
+        with self._lock:
+            self.methods.clear()
+            self.pages.clear()
+            self.sessions.clear()
+
+def estimate_cost(reads, writes):
+    """Estimated Firestore bill in USD for a number of document reads and writes."""
+    return (reads * FIRESTORE_PRICE_PER_100K["reads"] + writes * FIRESTORE_PRICE_PER_100K["writes"]) / 100_000
+
+def histogram_percentile(histogram, pct):
+    """Upper bound (ms) of the bucket holding the given percentile (None if open-ended)."""
+    total = sum(histogram)
+    if not total:
+        return 0
+    running = 0
+    for i, count in enumerate(histogram):
+        running += count
+        if running >= total * pct / 100:
+            break
+    return LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else None
+
+_metering_active = contextvars.ContextVar("nodex_metering_active", default=None)
+
+def metered(method):
+    """Records latency and document reads/writes of a RealFirestore method in self.meter.
+
+    Only the outermost metered call in a context is recorded, so methods that call
+    other methods are not double counted. Each call counts its operations in its own
+    scope, so calls running in parallel for the same rerun are not counted together.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        meter = self.meter
+        if meter is None or _metering_active.get():
+            return method(self, *args, **kwargs)
+        with self.op_scope():
+            before = self.op_counts() or {}
+            start = time.perf_counter()
+            token = _metering_active.set(True)
+            try:
+                with profile_span(method.__name__, "datastore"):
+                    return method(self, *args, **kwargs)
+            finally:
+                _metering_active.reset(token)
+                after = self.op_counts() or {}
+                meter.record(
+                    method.__name__,
+                    time.perf_counter() - start,
+                    after.get("reads", 0) - before.get("reads", 0),
+                    after.get("writes", 0) - before.get("writes", 0),
+                )
+    return wrapper
+
+class CountingFirestore:
+    """Wraps a google-cloud-firestore client (or any object it returns) to count operations.
+
+    Counts round trips, document reads and document writes per context, the same
+    numbers LocalFirestore reports, so metering works identically on every backend.
+    Arguments are unwrapped before they reach the real client.
+    """
+
+    # Methods that are one round trip on a document or collection reference
+    _DIRECT_WRITES = ("set", "update", "delete", "create", "add")
+
+    def __init__(self, target, ops=None, kind="client"):
+        self._target = target
+        self._ops = ops if ops is not None else OpCounter()
+        self._kind = kind
+
+    def _count(self, calls=0, reads=0, writes=0):
+        self._ops.add(calls, reads, writes)
+
+    def op_counts(self):
+        return self._ops.snapshot()
+
+    def op_scope(self):
+        return self._ops.scope()
+
+    @staticmethod
+    def _unwrap(value):
+        if isinstance(value, CountingFirestore):
+            return value._target
+        if isinstance(value, (list, tuple)):
+            return [CountingFirestore._unwrap(v) for v in value]
+        return value
+
+    def _wrap(self, value, kind="ref"):
+        module = type(value).__module__ or ""
+        if module.startswith("google.cloud.firestore") and hasattr(value, "__dict__") and not hasattr(value, "to_dict"):
+            return CountingFirestore(value, self._ops, kind)
+        return value
+
+    def run_transaction(self, func):
+        """Runs func(transaction) in a retrying Firestore transaction with counted writes."""
+        from firebase_admin import firestore
+
+        def attempt(transaction):
+            return func(CountingFirestore(transaction, self._ops, "txn"))
+        return firestore.transactional(attempt)(self._target.transaction())
+
+    def _counted_stream(self, snapshots, min_reads=1):
+        # Counted as each document arrives: callers may stop reading before the end
+        count = 0
+        for snapshot in snapshots:
+            count += 1
+            self._count(reads=1)
+            yield snapshot
+        if count < min_reads:
+            self._count(reads=min_reads - count)
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr) or name.startswith("__"):
+            return attr
+
+        def call(*args, **kwargs):
+            args = [self._unwrap(a) for a in args]
+            kwargs = {k: self._unwrap(v) for k, v in kwargs.items()}
+            result = attr(*args, **kwargs)
+
+            if name in ("stream", "get_all") or (name == "get" and self._kind == "txn"):
+                self._count(calls=0 if self._kind == "txn" else 1)
+                return self._counted_stream(result, min_reads=1 if name == "stream" else 0)
+            if name == "get":
+                if isinstance(result, list):
+                    self._count(calls=1, reads=max(len(result), 1))
+                else:
+                    self._count(calls=1, reads=1)
+                return result
+            if name in self._DIRECT_WRITES:
+                if self._kind in ("batch", "txn"):
+                    self._count(writes=1)
+                else:
+                    self._count(calls=1, writes=1)
+                return result
+            if name == "commit" and self._kind == "batch":
+                self._count(calls=1)
+                return result
+            if name == "list_documents":
+                self._count(calls=1)
+                return result
+            if name == "batch":
+                return self._wrap(result, "batch")
+            if name == "transaction":
+                return self._wrap(result, "txn")
+            return self._wrap(result)
+
+        return call
@@ -0,0 +1,141 @@
+"""Live in-process replica of Firestore collections, fed by snapshot listeners.
+
+With `mirror = true` under [storage] in secrets, the server process subscribes once
+to the events and reviews collections with on_snapshot and keeps a replica in a
+MemoryEngine. RealFirestore then answers listing queries from the replica through
+a LocalFirestore, so they cost no Firestore reads and reflect changes within
+moments. Firestore only bills the initial snapshot and each changed document.
+"""
+import contextlib
+import logging
+import threading
+import time
+from datetime import datetime
+
+from nodex.local_backend import LocalFirestore, MemoryEngine
+
+logger = logging.getLogger("nodex")
+
+# Collections replicated by the mirror
+MIRRORED_COLLECTIONS = ("events", "reviews")
+
+# Seconds between listener health checks, and the cap on the reconnect backoff
+MIRROR_CHECK_SECONDS = 5
+MIRROR_MAX_BACKOFF_SECONDS = 60
+
+# A disconnected mirror is flagged stale after this many seconds, and bypassed after the second
+MIRROR_STALE_SECONDS = 10
+MIRROR_MAX_STALE_SECONDS = 300
+
+class SnapshotMirror:
+    """Thread-safe in-process replica of whole collections, fed by snapshot listeners.
+
+    A supervisor thread re-subscribes dead listeners with exponential backoff; the
+    first snapshot after a (re)subscribe replaces the collection, later ones apply
+    their changes.
+    """
+
+    def __init__(self, source, collections=MIRRORED_COLLECTIONS, check_interval=MIRROR_CHECK_SECONDS):
+        self._source = source
+        self.engine = MemoryEngine()
+        self.client = LocalFirestore(self.engine)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._state = {
+            name: {
+                "watch": None, "synced": False, "initial": True, "documents": 0, "reconnects": 0,
+                "failures": 0, "retry_at": 0.0, "disconnected_at": time.monotonic(), "last_change": None,
+            }
+            for name in collections
+        }
+        self._stop = threading.Event()
+        for name in collections:
+            self._subscribe(name)
+        self._thread = threading.Thread(target=self._supervise, name="nodex-mirror", daemon=True)
+        self._thread.start()
+
+    def is_live(self, collection):
+        """True if reads of this collection may be served from the mirror."""
+        state = self._state.get(collection)
+        if state is None or not state["synced"]:
+            return False
+        disconnected_at = state["disconnected_at"]
+        return disconnected_at is None or time.monotonic() - disconnected_at < MIRROR_MAX_STALE_SECONDS
+
+    def staleness(self, collection):
+        """Seconds the collection's listener has been disconnected (0 while connected)."""
+        disconnected_at = self._state[collection]["disconnected_at"]
+        return 0 if disconnected_at is None else time.monotonic() - disconnected_at
+
+    def status(self):
+        with self._lock:
+            return {
+                name: {
+                    "state": "live" if state["disconnected_at"] is None
+                             else ("reconnecting" if state["synced"] else "connecting"),
+                    "documents": state["documents"],
+                    "stale_seconds": self.staleness(name),
+                    "last_change": state["last_change"],
+                    "reconnects": state["reconnects"],
+                }
+                for name, state in self._state.items()
+            }
+
+    def stop(self):
+        self._stop.set()
+        for state in self._state.values():
+            if state["watch"] is not None:
+                with contextlib.suppress(Exception):
+                    state["watch"].unsubscribe()
+
+    def _subscribe(self, name):
+        state = self._state[name]
+        with self._lock:
+            state["initial"] = True
+        try:
+            state["watch"] = self._source.collection(name).on_snapshot(
+                lambda docs, changes, read_time: self._on_snapshot(name, docs, changes)
+            )
+        except Exception:
+            logger.exception("Subscribing to %s failed", name)
+            state["watch"] = None
+
+    def _on_snapshot(self, name, docs, changes):
+        state = self._state[name]
+        with self._lock:
+            if state["initial"]:
+                # Full resync: replace whatever the mirror held before
+                current = {doc.id for doc in docs}
+                writes = [("delete", f"{name}/{doc_id}", None, False)
+                          for doc_id in self.engine.list_ids(name) if doc_id not in current]
+                writes += [("set", f"{name}/{doc.id}", doc.to_dict(), False) for doc in docs]
+            else:
+                writes = [
+                    ("delete", f"{name}/{change.document.id}", None, False) if change.type.name == "REMOVED"
+                    else ("set", f"{name}/{change.document.id}", change.document.to_dict(), False)
+                    for change in changes
+                ]
+            self.engine.apply(writes)
+            if state["disconnected_at"] is not None and state["synced"]:
+                state["reconnects"] += 1
+            state.update(initial=False, synced=True, disconnected_at=None, failures=0,
+                         documents=len(docs), last_change=datetime.now())
+
+    def _supervise(self):
+        while not self._stop.wait(self.check_interval):
+            for name, state in self._state.items():
+                watch = state["watch"]
+                if watch is not None and getattr(watch, "is_active", True):
+                    continue
+                with self._lock:
+                    if state["disconnected_at"] is None:
+                        logger.warning("Snapshot listener on %s stopped; reconnecting", name)
+                        state["disconnected_at"] = time.monotonic()
+                    if time.monotonic() < state["retry_at"]:
+                        continue
+                    state["failures"] += 1
+                    state["retry_at"] = time.monotonic() + min(MIRROR_MAX_BACKOFF_SECONDS, 2 ** state["failures"])
+                if watch is not None:
+                    with contextlib.suppress(Exception):
+                        watch.unsubscribe()
+                self._subscribe(name)
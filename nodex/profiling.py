@@ -0,0 +1,163 @@
+"""Opt-in render profiling with Chrome trace export.
+
+With [profiling] enabled = true in secrets (or the
+"Profile my reruns" toggle in admin), every render_* function, event/review card
+and datastore call is recorded as a span. Reruns slower than slow_rerun_ms are
+written to trace_dir as Chrome trace JSON (open in chrome://tracing, Perfetto or
+speedscope), plus a cProfile .prof file when cprofile = true. Only one rerun at a
+time is run under cProfile (Python 3.12+ allows a single active profiler); reruns
+that overlap it get spans only.
+"""
+import cProfile
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+logger = logging.getLogger("nodex")
+
+# Reruns at least this slow are captured automatically
+PROFILE_SLOW_RERUN_MS = 1000
+
+# Captured reruns kept in memory for the admin dashboard
+PROFILE_HISTORY = 20
+
+_current_trace = contextvars.ContextVar("nodex_profiling_trace", default=None)
+
+# Held by the rerun whose cProfile.Profile is enabled
+_cprofile_slot = threading.Lock()
+
+class RerunTrace:
+    """Timed spans of one rerun."""
+
+    def __init__(self, page, session_id, cprofile=False, force=False):
+        self.page = page
+        self.session_id = session_id
+        self.force = force
+        self.started_at = datetime.now()
+        self.duration_ms = None
+        self.events = []
+        self.profile = cProfile.Profile() if cprofile else None
+        self._origin = time.perf_counter()
+
+    def start(self):
+        _current_trace.set(self)
+        if self.profile is None:
+            return
+        if not _cprofile_slot.acquire(blocking=False):
+            self.profile = None
+            return
+        try:
+            self.profile.enable()
+        except ValueError:
+            # Another profiler (e.g. a debugger's) is active
+            _cprofile_slot.release()
+            self.profile = None
+
+    def finish(self):
+        if self.profile:
+            self.profile.disable()
+            _cprofile_slot.release()
+        self.duration_ms = (time.perf_counter() - self._origin) * 1000
+        _current_trace.set(None)
+
+    @contextlib.contextmanager
+    def span(self, name, category):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.events.append({
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": round((start - self._origin) * 1e6, 1),
+                "dur": round((time.perf_counter() - start) * 1e6, 1),
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+            })
+
+    def chrome_trace(self):
+        """The rerun in Chrome trace event format (also readable by speedscope)."""
+        return {
+            "traceEvents": [{
+                "name": f"rerun:{self.page}",
+                "cat": "rerun",
+                "ph": "X",
+                "ts": 0,
+                "dur": round(self.duration_ms * 1000, 1),
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+            }] + self.events,
+            "displayTimeUnit": "ms",
+            "otherData": {
+                "page": self.page,
+                "session_id": self.session_id,
+                "started_at": self.started_at.isoformat(timespec="seconds"),
+            },
+        }
+
+    def slowest_spans(self, count=5):
+        return sorted(self.events, key=lambda e: e["dur"], reverse=True)[:count]
+
+def profile_span(name, category="render"):
+    """Times a block as a span of the current rerun's trace (no-op when not profiling)."""
+    trace = _current_trace.get()
+    if trace is None:
+        return contextlib.nullcontext()
+    return trace.span(name, category)
+
+def profiled(func):
+    """Times each call of a render function as a span."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with profile_span(func.__name__):
+            return func(*args, **kwargs)
+    return wrapper
+
+class RenderProfiler:
+    """Starts rerun traces and keeps and writes the ones worth keeping."""
+
+    def __init__(self, enabled=False, slow_rerun_ms=PROFILE_SLOW_RERUN_MS, cprofile=False, trace_dir=".nodex_traces"):
+        self.enabled = enabled
+        self.slow_rerun_ms = slow_rerun_ms
+        self.cprofile = cprofile
+        self.trace_dir = trace_dir
+        self.captured = deque(maxlen=PROFILE_HISTORY)
+        self._lock = threading.Lock()
+
+    def begin(self, page, session_id, force=False):
+        """Starts tracing this rerun if profiling is on (or forced for the session)."""
+        if not (self.enabled or force):
+            return None
+        trace = RerunTrace(page, session_id, cprofile=self.cprofile, force=force)
+        trace.start()
+        return trace
+
+    def end(self, trace):
+        """Finishes a trace and captures it if it was forced or slow."""
+        if trace is None:
+            return
+        trace.finish()
+        if trace.force or trace.duration_ms >= self.slow_rerun_ms:
+            self._capture(trace)
+
+    def _capture(self, trace):
+        os.makedirs(self.trace_dir, exist_ok=True)
+        stem = os.path.join(self.trace_dir, f"{trace.started_at:%Y%m%d-%H%M%S}-{trace.page}-{trace.session_id[:8]}")
+        with open(stem + ".trace.json", "w") as f:
+            json.dump(trace.chrome_trace(), f)
+        if trace.profile:
+            trace.profile.dump_stats(stem + ".prof")
+        if trace.duration_ms >= self.slow_rerun_ms:
+            logger.warning("Slow rerun of %s: %.0f ms, trace written to %s.trace.json", trace.page, trace.duration_ms, stem)
+        # Drop the profiler so the kept trace holds only plain data
+        trace.profile = None
+        with self._lock:
+            self.captured.appendleft({"trace": trace, "path": stem + ".trace.json"})
@@ -0,0 +1,331 @@
+"""Deadlines, retries and a circuit breaker for datastore calls, and parallel reads with deadlines."""
+import contextvars
+import copy
+import functools
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import datetime
+
+from nodex.caching import LRUCache
+
+logger = logging.getLogger("nodex")
+
+# Seconds a page waits for each of its parallel reads before rendering without it
+FETCH_DEADLINE_SECONDS = 5
+
+# Seconds a datastore read may take, retries included, before it gives up
+DATASTORE_READ_DEADLINE_SECONDS = 3
+
+# Extra attempts for a read that failed with a transient error
+DATASTORE_READ_RETRIES = 2
+
+# Cap (seconds) of the random delay before the first read retry, doubled for each later one
+DATASTORE_RETRY_BASE_SECONDS = 0.1
+
+# Threads running datastore calls under a deadline; a call that misses it keeps its thread until it returns.
+# Once all are busy, new calls fail at once instead of queueing behind the stuck ones.
+DATASTORE_CALL_WORKERS = 64
+
+# Consecutive failed datastore calls that trip the circuit breaker
+BREAKER_FAILURE_THRESHOLD = 5
+
+# Seconds a tripped breaker fails calls fast before it lets one trial call through
+BREAKER_RESET_SECONDS = 30
+
+# Reads whose last good result is kept to serve, marked stale, while the datastore is unavailable
+LAST_GOOD_READS = 512
+
+# Seconds before a read's saved last good result is replaced by a newer one
+LAST_GOOD_REFRESH_SECONDS = 10
+
+class ParallelFetcher:
+    """Runs a page's independent reads concurrently, each with its own deadline.
+
+    Tasks run in a copy of the caller's context, so datastore metering, profiling
+    spans and backend op counts are attributed to the rerun that asked for them.
+    """
+
+    def __init__(self, max_workers=16):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="nodex-fetch")
+
+    def fetch(self, needs, deadlines=None, defaults=None, deadline=FETCH_DEADLINE_SECONDS):
+        """Calls every function in {name: func} in parallel and returns {name: result}.
+
+        A need that raises or is still running after its deadline (seconds from now,
+        `deadlines[name]` or `deadline`) gets `defaults.get(name)`; a late call keeps
+        running in the background and its result is discarded.
+        """
+        deadlines, defaults = deadlines or {}, defaults or {}
+        started = time.monotonic()
+        futures = {
+            name: self._executor.submit(contextvars.copy_context().run, func)
+            for name, func in needs.items()
+        }
+        results = {}
+        for name in sorted(futures, key=lambda n: deadlines.get(n, deadline)):
+            remaining = started + deadlines.get(name, deadline) - time.monotonic()
+            try:
+                results[name] = futures[name].result(timeout=max(0, remaining))
+            except FutureTimeoutError:
+                logger.warning("Fetching %s missed its %.1fs deadline", name, deadlines.get(name, deadline))
+                results[name] = defaults.get(name)
+            except Exception:
+                logger.exception("Fetching %s failed", name)
+                results[name] = defaults.get(name)
+        return results
+
+class DatastoreUnavailable(Exception):
+    """Raised when a datastore call fails with a transient error, misses its deadline or
+    is refused by the open circuit breaker (and, for a read, no last good result is saved)."""
+
+class DatastoreTimeout(DatastoreUnavailable):
+    """Raised when a datastore call misses its deadline."""
+
+class BreakerOpen(DatastoreUnavailable):
+    """Raised without calling the datastore while the circuit breaker is open."""
+
+def is_transient(error):
+    """True for failures of the datastore itself (timeouts, unavailable or overloaded service),
+    which are worth retrying and count against the circuit breaker."""
+    if isinstance(error, (DatastoreTimeout, TimeoutError, ConnectionError)):
+        return True
+    from google.api_core import exceptions
+    return isinstance(error, (
+        exceptions.ServiceUnavailable, exceptions.DeadlineExceeded, exceptions.InternalServerError,
+        exceptions.TooManyRequests, exceptions.ResourceExhausted, exceptions.Aborted, exceptions.RetryError,
+    ))
+
+# Worker threads for datastore calls with a deadline, and a count of the free ones
+_call_executor = ThreadPoolExecutor(max_workers=DATASTORE_CALL_WORKERS, thread_name_prefix="nodex-datastore")
+_call_slots = threading.BoundedSemaphore(DATASTORE_CALL_WORKERS)
+
+def run_with_deadline(func, seconds):
+    """Returns func() or raises DatastoreTimeout once `seconds` have passed (None: wait as long as it takes).
+
+    func runs on a worker thread in a copy of the caller's context; a call that misses
+    its deadline keeps running in the background and its result is discarded. When every
+    worker is still busy with such calls, DatastoreTimeout is raised without queueing.
+    """
+    if seconds is None:
+        return func()
+    if not _call_slots.acquire(blocking=False):
+        raise DatastoreTimeout(f"All {DATASTORE_CALL_WORKERS} datastore workers are busy")
+    try:
+        future = _call_executor.submit(contextvars.copy_context().run, func)
+    except BaseException:
+        _call_slots.release()
+        raise
+    future.add_done_callback(lambda _: _call_slots.release())
+    try:
+        return future.result(timeout=max(0, seconds))
+    except FutureTimeoutError:
+        future.cancel()
+        raise DatastoreTimeout(f"No response within {seconds:.1f}s") from None
+
+class CircuitBreaker:
+    """Stops calling the datastore after repeated failures so a slow or failing backend
+    cannot hold every page hostage.
+
+    Closed, it lets every call through and counts consecutive transient failures. After
+    `threshold` of them it trips (open) and refuses calls with BreakerOpen for
+    `reset_seconds`; then one trial call is let through (half-open), and its outcome
+    closes the breaker or trips it again. A call answered without a round trip (from a
+    cache or the mirror) says nothing about the datastore and changes no state.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+    def __init__(self, threshold=BREAKER_FAILURE_THRESHOLD, reset_seconds=BREAKER_RESET_SECONDS):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self.trips = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.retries = 0
+        self.rejected = 0
+        self.stale_served = 0
+        self.last_error = None
+        self.last_trip = None
+
+    def call(self, func, deadline=None, retries=0, contacted=None):
+        """Calls func() under the breaker with a deadline (seconds for all attempts together).
+
+        Transient failures are retried up to `retries` times after a random ("full
+        jitter") delay that doubles its cap each time, as long as the deadline allows.
+        Other errors are passed through and count as an answer from the datastore.
+        `contacted()`, if given, tells whether the last attempt reached the datastore.
+        """
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            self._admit()
+            remaining = None if deadline is None else deadline - (time.monotonic() - started)
+            try:
+                result = run_with_deadline(func, remaining)
+            except Exception as e:
+                if not is_transient(e):
+                    self._record_success(contacted is None or contacted())
+                    raise
+                self._record_failure(e)
+                delay = random.uniform(0, DATASTORE_RETRY_BASE_SECONDS * 2 ** attempt)
+                if attempt >= retries or (deadline is not None and time.monotonic() - started + delay >= deadline):
+                    raise
+                attempt += 1
+                with self._lock:
+                    self.retries += 1
+                time.sleep(delay)
+            else:
+                self._record_success(contacted is None or contacted())
+                return result
+
+    def _admit(self):
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = self.HALF_OPEN
+            if self.state == self.CLOSED or (self.state == self.HALF_OPEN and not self._trial_running):
+                self._trial_running = self.state == self.HALF_OPEN
+                return
+            self.rejected += 1
+        raise BreakerOpen(f"Datastore calls are paused after repeated failures (last: {self.last_error})")
+
+    def _record_success(self, contacted=True):
+        with self._lock:
+            if not contacted:
+                # Frees the half-open trial for a call that does reach the datastore
+                self._trial_running = False
+                return
+            self.consecutive_failures = 0
+            self._trial_running = False
+            self.state = self.CLOSED
+
+    def _record_failure(self, error):
+        with self._lock:
+            self.failures += 1
+            self.timeouts += isinstance(error, DatastoreTimeout)
+            self.consecutive_failures += 1
+            self.last_error = f"{type(error).__name__}: {error}"
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.consecutive_failures >= self.threshold):
+                if self.state == self.CLOSED:
+                    logger.warning("Circuit breaker tripped after %d failures: %s", self.consecutive_failures, self.last_error)
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self.last_trip = datetime.now()
+                self.trips += 1
+            self._trial_running = False
+
+    def record_stale(self):
+        with self._lock:
+            self.stale_served += 1
+
+    def reset(self):
+        """Closes the breaker by hand (admin)."""
+        self._record_success()
+
+    def status(self):
+        with self._lock:
+            reopens_in = None
+            if self.state == self.OPEN:
+                reopens_in = max(0, self.reset_seconds - (time.monotonic() - self.opened_at))
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "trips": self.trips,
+                "last_trip": self.last_trip,
+                "trial_in": reopens_in,
+                "failures": self.failures,
+                "timeouts": self.timeouts,
+                "retries": self.retries,
+                "rejected": self.rejected,
+                "stale_served": self.stale_served,
+                "last_error": self.last_error,
+            }
+
+class LastGoodReads:
+    """Last successful result of each read, served (marked stale) while the datastore is unavailable.
+
+    A read's saved copy is replaced at most every `refresh_seconds`, so keeping it
+    costs one deep copy per read and interval rather than one per call.
+    """
+
+    def __init__(self, maxsize=LAST_GOOD_READS, refresh_seconds=LAST_GOOD_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._entries = LRUCache(maxsize)
+
+    def put(self, key, value):
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[0] >= self.refresh_seconds:
+            self._entries.put(key, (time.monotonic(), datetime.now(), copy.deepcopy(value)))
+
+    def get(self, key):
+        """Returns (saved_at, copy of the result) or None."""
+        entry = self._entries.get(key)
+        return (entry[1], copy.deepcopy(entry[2])) if entry else None
+
+_guard_active = contextvars.ContextVar("nodex_guard_active", default=None)
+
+def resilient(kind, deadline=DATASTORE_READ_DEADLINE_SECONDS):
+    """Runs a RealFirestore method under self.breaker.
+
+    "read" methods must be idempotent: they run with a deadline (seconds; None for
+    none), are retried on transient errors, and when they still fail (or the breaker
+    is open) return their last good result from self.last_good and note its age in
+    self.stale_reads. "write" methods are not retried, fail fast while the breaker is
+    open and run on the caller's thread without a deadline: an abandoned write could
+    still commit after its caller was told it failed. Both raise DatastoreUnavailable
+    when nothing can be returned. Calls nested in a guarded call run under its guard.
+    """
+    if kind == "write":
+        deadline = None
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            breaker = self.breaker
+            if breaker is None or _guard_active.get():
+                return method(self, *args, **kwargs)
+            # Waiting for the client to be built is not the datastore being slow
+            self._await_warmup()
+
+            round_trips = {}
+
+            def call():
+                token = _guard_active.set(True)
+                with self.op_scope():
+                    before = self.op_counts()
+                    try:
+                        return method(self, *args, **kwargs)
+                    finally:
+                        after = self.op_counts()
+                        # Unknown (no counting backend) is taken as contacted
+                        round_trips["made"] = not before or not after or after["calls"] > before["calls"]
+                        _guard_active.reset(token)
+
+            key = (method.__name__, repr(args), repr(sorted(kwargs.items())))
+            try:
+                result = breaker.call(call, deadline, DATASTORE_READ_RETRIES if kind == "read" else 0,
+                                      contacted=lambda: round_trips.get("made", True))
+            except Exception as e:
+                if not isinstance(e, DatastoreUnavailable) and not is_transient(e):
+                    raise
+                saved = self.last_good.get(key) if kind == "read" and self.last_good is not None else None
+                if saved is None:
+                    if isinstance(e, DatastoreUnavailable):
+                        raise
+                    raise DatastoreUnavailable(f"{type(e).__name__}: {e}") from e
+                breaker.record_stale()
+                saved_at, result = saved
+                self.stale_reads[method.__name__] = saved_at
+                return result
+            if kind == "read" and self.last_good is not None:
+                self.last_good.put(key, result)
+            return result
+        return wrapper
+    return decorator
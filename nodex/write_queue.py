@@ -0,0 +1,363 @@
+"""Durable write-behind queue, in-memory visit counts and periodic background tasks."""
+import atexit
+import contextlib
+import json
+import logging
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from nodex.resilience import BreakerOpen
+
+logger = logging.getLogger("nodex")
+
+# Queued writes held on disk before enqueueing blocks (backpressure)
+WRITE_QUEUE_MAX_DEPTH = 5000
+
+# Seconds an enqueue waits for room in a full write queue before giving up
+WRITE_QUEUE_ENQUEUE_TIMEOUT = 2
+
+# Queued writes applied per drain; with their rating aggregates, queued reviews stay
+# under Firestore's 500-write limit for one transaction
+WRITE_QUEUE_DRAIN_SIZE = 200
+
+# Retry delay (seconds) after a queued write fails, doubled per attempt up to the cap
+WRITE_QUEUE_RETRY_BASE_SECONDS = 1
+WRITE_QUEUE_RETRY_MAX_SECONDS = 300
+
+# Failed attempts after which a queued write is parked as dead instead of retried
+WRITE_QUEUE_MAX_ATTEMPTS = 10
+
+# Seconds drained writes stay claimed by one process; a crashed drain is retried after this
+WRITE_QUEUE_LEASE_SECONDS = 60
+
+class WriteQueueFull(Exception):
+    """Raised when a write cannot be queued because the write-behind queue stayed full."""
+
+class WriteQueue:
+    """Durable write-behind queue: writes are stored in a local SQLite file and applied
+    to the datastore in coalesced batches by a background worker.
+
+    `appliers` maps each kind of write to fn(payloads), which applies a list of queued
+    payloads at once (coalescing them as it likes) and must be safe to call again with
+    the same payloads after a failure. A failed group is retried with exponential
+    backoff and parked as dead after WRITE_QUEUE_MAX_ATTEMPTS. Queued writes survive
+    restarts, and a drain claims its writes with a lease so processes sharing the file
+    never apply the same write twice.
+
+    Without a `path`, the queue lives in a temporary directory that close() removes
+    (for backends whose data does not outlive the process either).
+    """
+
+    def __init__(self, path, appliers, max_depth=WRITE_QUEUE_MAX_DEPTH, drain_size=WRITE_QUEUE_DRAIN_SIZE):
+        self._temp_dir = None
+        if path is None:
+            self._temp_dir = tempfile.mkdtemp(prefix="nodex-queue-")
+            path = os.path.join(self._temp_dir, "writes.db")
+        self.path = path
+        self.appliers = appliers
+        self.max_depth = max_depth
+        self.drain_size = drain_size
+        # One connection shared by all threads; its queries are short, so a lock beats a connection per thread
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        # Held while this process's drain claims and applies writes, so amend() never races an apply
+        self._applying = threading.Lock()
+        self._drained = threading.Condition()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self.applied = 0
+        self.batches = 0
+        self.retries = 0
+        self.rejected = 0
+        self.last_apply_lag = None
+        self.last_error = None
+        conn = self._conn
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Every enqueue is on disk before the UI confirms it
+        conn.execute("PRAGMA synchronous=FULL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS writes ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, payload TEXT NOT NULL, "
+            "enqueued_at REAL NOT NULL, next_attempt_at REAL NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+            "dead INTEGER NOT NULL DEFAULT 0, last_error TEXT)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_writes_due ON writes(dead, next_attempt_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_writes_kind ON writes(kind, dead)")
+        self._thread = threading.Thread(target=self._run, name="nodex-write-queue", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def enqueue(self, kind, payload, delay=0, timeout=WRITE_QUEUE_ENQUEUE_TIMEOUT):
+        """Stores a write to be applied in the background, at the earliest `delay` seconds from now.
+
+        When the queue holds `max_depth` writes, waits up to `timeout` seconds for the
+        worker to make room and then raises WriteQueueFull.
+        """
+        if kind not in self.appliers:
+            raise ValueError(f"No applier for queued {kind!r} writes")
+        data = json.dumps(payload)
+        deadline = time.monotonic() + timeout
+        while True:
+            now = time.time()
+            with self._transaction() as conn:
+                (depth,) = conn.execute("SELECT COUNT(*) FROM writes WHERE dead = 0").fetchone()
+                if depth < self.max_depth:
+                    conn.execute(
+                        "INSERT INTO writes (kind, payload, enqueued_at, next_attempt_at) VALUES (?, ?, ?, ?)",
+                        (kind, data, now, now + delay),
+                    )
+                    break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                with self._stats_lock:
+                    self.rejected += 1
+                raise WriteQueueFull(f"{depth} writes are waiting to be applied")
+            self._wake.set()
+            with self._drained:
+                self._drained.wait(min(remaining, 0.05))
+        self._wake.set()
+
+    def pending(self, kind):
+        """Payloads of the queued `kind` writes not applied yet, oldest first (for read-your-writes)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT payload FROM writes WHERE kind = ? AND dead = 0 ORDER BY id", (kind,)
+            ).fetchall()
+        return [json.loads(payload) for (payload,) in rows]
+
+    def amend(self, kind, change):
+        """Rewrites queued `kind` writes not applied yet; returns how many were changed or dropped.
+
+        change(payload) returns the new payload, the same payload to keep it, or None to
+        drop the write. Waits for a drain in progress, so each write is either amended
+        here or already applied.
+        """
+        with self._applying, self._transaction() as conn:
+            rows = conn.execute("SELECT id, payload FROM writes WHERE kind = ? AND dead = 0", (kind,)).fetchall()
+            amended = 0
+            for row_id, data in rows:
+                payload = json.loads(data)
+                changed = change(payload)
+                if changed is None:
+                    conn.execute("DELETE FROM writes WHERE id = ?", (row_id,))
+                elif changed != payload:
+                    conn.execute("UPDATE writes SET payload = ? WHERE id = ?", (json.dumps(changed), row_id))
+                else:
+                    continue
+                amended += 1
+        return amended
+
+    def drain(self):
+        """Applies the writes that are due; returns seconds until the next one is due (None if none is queued)."""
+        with self._applying:
+            rows = self._apply_due()
+        with self._drained:
+            self._drained.notify_all()
+
+        if len(rows) == self.drain_size:
+            return 0
+        with self._lock:
+            (next_due,) = self._conn.execute("SELECT MIN(next_attempt_at) FROM writes WHERE dead = 0").fetchone()
+        return None if next_due is None else max(0, next_due - time.time())
+
+    def _apply_due(self):
+        now = time.time()
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT id, kind, payload, enqueued_at, attempts FROM writes "
+                "WHERE dead = 0 AND next_attempt_at <= ? ORDER BY id LIMIT ?",
+                (now, self.drain_size),
+            ).fetchall()
+            # Claim them so another process's drain leaves them alone
+            conn.executemany(
+                "UPDATE writes SET next_attempt_at = ? WHERE id = ?",
+                [(now + WRITE_QUEUE_LEASE_SECONDS, row[0]) for row in rows],
+            )
+
+        groups = {}
+        for row in rows:
+            groups.setdefault(row[1], []).append(row)
+        for kind, group in groups.items():
+            try:
+                self.appliers[kind]([json.loads(row[2]) for row in group])
+            except BreakerOpen as e:
+                # The datastore was not called: wait for the breaker without using up an attempt
+                self._reschedule(group, str(e), attempted=False)
+            except Exception as e:
+                logger.exception("Applying %d queued %s writes failed; will retry", len(group), kind)
+                self._reschedule(group, f"{type(e).__name__}: {e}")
+            else:
+                with self._lock:
+                    self._conn.executemany("DELETE FROM writes WHERE id = ?", [(row[0],) for row in group])
+                with self._stats_lock:
+                    self.applied += len(group)
+                    self.batches += 1
+                    self.last_apply_lag = time.time() - min(row[3] for row in group)
+        return rows
+
+    def _reschedule(self, group, error, attempted=True):
+        updates = []
+        for row_id, _, _, _, attempts in group:
+            attempts += attempted
+            dead = attempts >= WRITE_QUEUE_MAX_ATTEMPTS
+            delay = min(WRITE_QUEUE_RETRY_MAX_SECONDS, WRITE_QUEUE_RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0))
+            # Jitter so writes that failed together are not retried in lockstep
+            updates.append((time.time() + delay * random.uniform(0.5, 1), attempts, int(dead), error, row_id))
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE writes SET next_attempt_at = ?, attempts = ?, dead = ?, last_error = ? WHERE id = ?", updates
+            )
+        with self._stats_lock:
+            if attempted:
+                self.retries += sum(1 for update in updates if not update[2])
+            self.last_error = error
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """Holds the lock and an IMMEDIATE transaction (other processes sharing the file wait)."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def retry_dead(self):
+        """Puts parked writes back in the queue with fresh attempts; returns how many."""
+        with self._lock:
+            count = self._conn.execute(
+                "UPDATE writes SET dead = 0, attempts = 0, next_attempt_at = ? WHERE dead = 1", (time.time(),)
+            ).rowcount
+        self._wake.set()
+        return count
+
+    def stats(self):
+        """Depth, lag and outcome counts for the admin dashboard."""
+        with self._lock:
+            conn = self._conn
+            depth, oldest = conn.execute("SELECT COUNT(*), MIN(enqueued_at) FROM writes WHERE dead = 0").fetchone()
+            (dead,) = conn.execute("SELECT COUNT(*) FROM writes WHERE dead = 1").fetchone()
+            by_kind = dict(conn.execute("SELECT kind, COUNT(*) FROM writes WHERE dead = 0 GROUP BY kind").fetchall())
+        with self._stats_lock:
+            return {
+                "depth": depth,
+                "max_depth": self.max_depth,
+                "by_kind": by_kind,
+                "lag_seconds": time.time() - oldest if oldest is not None else 0.0,
+                "dead": dead,
+                "applied": self.applied,
+                "batches": self.batches,
+                "retries": self.retries,
+                "rejected": self.rejected,
+                "last_apply_lag_seconds": self.last_apply_lag,
+                "last_error": self.last_error,
+            }
+
+    def close(self):
+        """Stops the worker after one last drain; anything left stays queued for the next start."""
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout=5)
+        if self._temp_dir is not None:
+            with self._lock:
+                self._conn.close()
+            shutil.rmtree(self._temp_dir, ignore_errors=True)
+            self._temp_dir = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                delay = self.drain()
+            except Exception:
+                logger.exception("Draining the write queue failed; will retry")
+                delay = WRITE_QUEUE_RETRY_BASE_SECONDS
+            self._wake.wait(delay)
+        with contextlib.suppress(Exception):
+            self.drain()
+
+class VisitBuffer:
+    """Counts visits per day in memory and hands the sums to flush(counts) from a
+    daemon thread every `interval` seconds, and once more at interpreter exit.
+
+    One write per interval replaces one write per session start. When flush() raises,
+    its counts are kept and retried with the next interval's.
+    """
+
+    def __init__(self, flush, interval):
+        self._flush = flush
+        self.interval = interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="nodex-visit-flush", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def add(self, day, count=1):
+        with self._lock:
+            self._pending[day] = self._pending.get(day, 0) + count
+
+    def pending(self, day):
+        """Visits on `day` not handed to flush() yet."""
+        with self._lock:
+            return self._pending.get(day, 0)
+
+    def flush(self):
+        with self._lock:
+            counts, self._pending = self._pending, {}
+        if not counts:
+            return
+        try:
+            self._flush(counts)
+        except Exception:
+            logger.exception("Flushing %d visits failed; will retry", sum(counts.values()))
+            with self._lock:
+                for day, count in counts.items():
+                    self._pending[day] = self._pending.get(day, 0) + count
+
+    def close(self):
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+class PeriodicTask:
+    """Runs a function now and then every `interval` seconds on a daemon thread."""
+
+    def __init__(self, func, interval, name):
+        self._func = func
+        self.interval = interval
+        self.last_run = None
+        self.last_result = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def run_now(self):
+        try:
+            self.last_result = self._func()
+        except Exception:
+            logger.exception("Periodic task %s failed; will retry", self._thread.name)
+        self.last_run = datetime.now()
+        return self.last_result
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        self.run_now()
+        while not self._stop.wait(self.interval):
+            self.run_now()
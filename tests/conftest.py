@@ -0,0 +1,33 @@
+import importlib.util
+import logging
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, "app.py")
+
+# The nodex package sits next to app.py, as it does for `streamlit run`
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope="session")
+def app():
+    """app.py imported as a module (Streamlit runs it in bare mode: no page is rendered)."""
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    spec = importlib.util.spec_from_file_location("nodex_app", APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def db(app, request, tmp_path):
+    """A RealFirestore over a fresh local backend, with seeded events."""
+    from nodex.local_backend import create_local_client
+
+    client = create_local_client({"backend": request.param, "sqlite_path": str(tmp_path / "test.db")})
+    db = app.RealFirestore(client)
+    db.seed_events()
+    return db
@@ -0,0 +1,46 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+
+def shard_counts(db, name):
+    shards = db.db.collection("counters").document(name).collection("shards").stream()
+    return {doc.id: doc.to_dict().get("count", 0) for doc in shards}
+
+
+def test_registrations_are_counted_across_shards(db):
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda i: db.register_user({"id": f"2024{i:04d}", "name": f"User {i}"}), range(30)))
+
+    assert db.get_user_count() == 30
+    assert db.get_today_user_registrations() == 30
+    assert len(shard_counts(db, "users_total")) > 1
+    assert sum(shard_counts(db, "users_total").values()) == 30
+
+
+def test_re_registering_a_member_does_not_count_twice(db):
+    db.register_user({"id": "20240001", "name": "Kim"})
+    db.register_user({"id": "20240001", "name": "Kim Minji"})
+    assert db.get_user_count() == 1
+    assert db.get_user_by_id("20240001")["name"] == "Kim Minji"
+
+
+def test_reconcile_rebuilds_counters_from_the_users_collection(db):
+    today = datetime.now().strftime("%Y-%m-%d")
+    db.register_user({"id": "20240001", "name": "Kim"})
+    # Members stored before the counters existed, and a counter that drifted
+    users = db.db.collection("users")
+    users.document("20230001").set({"id": "20230001", "name": "Lee", "created_at": "2023-03-02"})
+    users.document("20230002").set({"id": "20230002", "name": "Park", "created_at": "2023-03-02"})
+    users.document("20220001").set({"id": "20220001", "name": "Choi"})
+    db._counter_shard_ref("users_daily_2021-01-01", 3).set({"count": 4})
+
+    summary = db.reconcile_user_counters()
+
+    assert summary == {"users": 4, "days": 3}
+    assert db.get_user_count() == 4
+    assert db._read_counter(f"users_daily_{today}") == 1
+    assert db._read_counter("users_daily_2023-03-02") == 2
+    assert db._read_counter("users_daily_2021-01-01") == 0
+    # Running it again changes nothing
+    assert db.reconcile_user_counters() == summary
+    assert db.get_user_count() == 4
@@ -0,0 +1,80 @@
+import io
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from PIL import Image
+
+
+@pytest.fixture
+def image_server():
+    """Local stand-in for an image host: /photo.png is a 640x480 PNG, anything else is 404."""
+    out = io.BytesIO()
+    Image.new("RGB", (640, 480), (200, 40, 40)).save(out, format="PNG")
+    photo = out.getvalue()
+    requests = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests.append(self.path)
+            if self.path != "/photo.png":
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(photo)))
+            self.end_headers()
+            self.wfile.write(photo)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    server.requests = requests
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_downloads_and_caches_thumbnails(app, image_server, tmp_path):
+    url = f"{image_server.base_url}/photo.png"
+    cache = app.EventImageCache(str(tmp_path), max_bytes=10 * 1024 * 1024, width=320)
+
+    thumbnail = cache.thumbnails([url], timeout=5)[url]
+    image = Image.open(io.BytesIO(thumbnail))
+    assert (image.format, image.width) == ("WEBP", 320)
+
+    assert cache.thumbnails([url], timeout=5)[url] == thumbnail
+    # A new process finds the thumbnail on disk
+    assert app.EventImageCache(str(tmp_path), max_bytes=10 * 1024 * 1024, width=320).get(url) == thumbnail
+    assert image_server.requests == ["/photo.png"]
+
+
+def test_failed_images_fall_back_and_are_not_refetched(app, image_server, tmp_path):
+    missing = f"{image_server.base_url}/missing.png"
+    unreachable = "http://127.0.0.1:1/photo.png"
+    cache = app.EventImageCache(str(tmp_path), max_bytes=10 * 1024 * 1024, fetch=lambda url: app.fetch_image(url, 2))
+
+    assert cache.thumbnails([missing, unreachable, "ftp://example.com/x.png"], timeout=5) == {
+        missing: None, unreachable: None, "ftp://example.com/x.png": None,
+    }
+    assert cache.stats()["failed_urls"] == 3
+    assert Image.open(io.BytesIO(cache.placeholder())).format == "WEBP"
+
+    cache.thumbnails([missing], timeout=5)
+    assert image_server.requests == ["/missing.png"]
+
+
+def test_get_survives_a_failing_utime(app, image_server, tmp_path, monkeypatch):
+    url = f"{image_server.base_url}/photo.png"
+    cache = app.EventImageCache(str(tmp_path), max_bytes=10 * 1024 * 1024)
+    thumbnail = cache.thumbnails([url], timeout=5)[url]
+
+    def evicted(path, *args, **kwargs):
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(app.os, "utime", evicted)
+    assert cache.get(url) == thumbnail
@@ -0,0 +1,53 @@
+def make_events(count):
+    return [
+        {"title_en": f"Meetup {i}", "date": f"2030-{1 + i % 12:02d}-{1 + i % 28:02d} 19:00", "max_participants": 10}
+        for i in range(count)
+    ]
+
+
+def test_import_ids_are_deterministic(app):
+    event = {"title_en": "Board Games", "date": "2030-05-20 19:00"}
+    event_id = app.event_import_id(event)
+    assert event_id.startswith("evt_")
+    assert app.event_import_id({"title_en": "  board games ", "date": "2030-05-20 19:00 "}) == event_id
+    assert app.event_import_id({**event, "date": "2030-05-21 19:00"}) != event_id
+    assert app.event_import_id({**event, "id": 42}) == "42"
+
+
+def test_re_importing_updates_instead_of_duplicating(app, db):
+    events = make_events(1200)
+    calls = []
+    summary = db.import_events(events, replace=True, progress=lambda done, total: calls.append((done, total)))
+
+    assert summary == {"created": 1200, "updated": 0, "deleted": len(app.INITIAL_EVENTS)}
+    assert len(db.get_events()) == 1200
+    # Written in several batches under the 500-write limit, reporting progress after each
+    assert len(calls) > 1
+    assert calls[-1] == (1200 + summary["deleted"], 1200 + summary["deleted"])
+
+    assert db.import_events(events) == {"created": 0, "updated": 1200, "deleted": 0}
+    assert len(db.get_events()) == 1200
+
+
+def test_re_importing_keeps_participants(app, db):
+    event = {"title_en": "Hot", "date": "2030-05-20 19:00", "max_participants": 5}
+    db.import_events([event])
+    event_id = app.event_import_id(event)
+    db.register_user({"id": "20240001", "name": "Kim"})
+    assert db.join_event("20240001", event_id, "Hot", "Kim") is True
+
+    db.import_events([{**event, "max_participants": 8, "current_participants": 0, "participant_names": []}])
+
+    stored = db.db.collection("events").document(event_id).get().to_dict()
+    assert stored["max_participants"] == 8
+    assert stored["current_participants"] == 1
+    assert stored["participant_names"] == ["Kim"]
+
+
+def test_files_in_either_format_import_under_the_same_ids(app, db):
+    csv_events = app.parse_event_file("events.csv", b"title_en,date,max_participants\nQuiz,2030-02-01 18:00,12\n")
+    json_events = app.parse_event_file("events.json", b'{"events": [{"title_en": "Quiz", "date": "2030-02-01 18:00"}]}')
+    assert [app.event_import_id(e) for e in csv_events] == [app.event_import_id(e) for e in json_events]
+
+    db.import_events(csv_events)
+    assert db.import_events(json_events) == {"created": 0, "updated": 1, "deleted": 0}
@@ -0,0 +1,77 @@
+import time
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import pytest
+
+
+def test_past_events_with_unparseable_date(app, db):
+    # Stored before bad dates were rejected on write: starts_at is null
+    db.collection("events").document("legacy").set(
+        {"title_en": "Legacy", "date": "next friday", "starts_at": None, "is_upcoming": False})
+    yesterday = (datetime.now() - timedelta(days=1)).strftime(app.EVENT_DATE_FORMAT)
+    db.import_events([{"id": "recent", "title_en": "Recent", "date": yesterday, "is_upcoming": False}])
+
+    past = db.get_past_events()
+
+    ids = [event["id"] for event in past]
+    assert "legacy" in ids
+    assert ids.index("recent") < ids.index("legacy")
+
+
+def test_parse_event_file_rejects_unparseable_dates(app):
+    data = b"title_en,date\nGood,2024-05-20 19:00\nBad,next friday\n"
+    with pytest.raises(ValueError, match="format: 2"):
+        app.parse_event_file("events.csv", data)
+
+
+def test_event_writes_reject_unparseable_dates(app, db):
+    before = {event["id"] for event in db.get_events()}
+    with pytest.raises(ValueError):
+        db.add_event({"title_en": "Bad", "date": "next friday"})
+    with pytest.raises(ValueError):
+        db.import_events([{"title_en": "Good", "date": "2024-05-20 19:00"}, {"title_en": "Bad", "date": "soon"}])
+    with pytest.raises(ValueError):
+        db.update_event(next(iter(before)), {"date": "2024-13-40 25:00"})
+    assert {event["id"] for event in db.get_events()} == before
+
+
+@pytest.fixture
+def utc_host(monkeypatch):
+    """Runs the test with the process's local timezone set to UTC."""
+    monkeypatch.setenv("TZ", "UTC")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_event_dates_are_in_the_event_timezone_not_the_servers(app, utc_host):
+    starts_at = app.parse_event_date("2030-05-20 19:00")
+    assert starts_at.utcoffset() == timedelta(hours=9)
+    assert starts_at == datetime(2030, 5, 20, 10, 0, tzinfo=timezone.utc)
+
+
+def test_events_move_to_past_when_they_start(app, db, utc_host):
+    now = datetime.now(ZoneInfo(app.EVENT_TIMEZONE))
+    db.import_events([
+        {"id": "started", "title_en": "Started", "date": (now - timedelta(minutes=2)).strftime(app.EVENT_DATE_FORMAT)},
+        {"id": "soon", "title_en": "Soon", "date": (now + timedelta(minutes=3)).strftime(app.EVENT_DATE_FORMAT)},
+    ])
+    upcoming = [event["id"] for event in db.get_upcoming_events()]
+    assert "soon" in upcoming and "started" not in upcoming
+    assert "started" in [event["id"] for event in db.get_past_events()]
+
+
+def test_cached_upcoming_events_expire_with_the_minute(app, db, monkeypatch):
+    db.import_events([{"id": "soon", "title_en": "Soon", "date": "2030-05-20 19:00"}])
+    starts_at = app.parse_event_date("2030-05-20 19:00")
+
+    monkeypatch.setattr(app, "event_start_cutoff", lambda: (starts_at - timedelta(minutes=1), 0.05))
+    assert "soon" in [event["id"] for event in db.get_upcoming_events()]
+    monkeypatch.setattr(app, "event_start_cutoff", lambda: (starts_at, 0.05))
+    time.sleep(0.1)
+    assert "soon" not in [event["id"] for event in db.get_upcoming_events()]
+    assert "soon" in [event["id"] for event in db.get_past_events()]
+    db.archive_started_events()
+    assert db.collection("events").document("soon").get().to_dict()["is_upcoming"] is False
@@ -0,0 +1,51 @@
+import threading
+import time
+
+from nodex.resilience import ParallelFetcher
+
+
+def test_needs_run_in_parallel():
+    def slow():
+        time.sleep(0.2)
+        return "done"
+
+    started = time.monotonic()
+    results = ParallelFetcher().fetch({name: slow for name in "abcd"})
+    assert results == dict.fromkeys("abcd", "done")
+    assert time.monotonic() - started < 0.6
+
+
+def test_a_need_past_its_deadline_gets_its_default():
+    release = threading.Event()
+    try:
+        started = time.monotonic()
+        results = ParallelFetcher().fetch(
+            {"fast": lambda: 1, "stuck": release.wait, "late": release.wait},
+            deadlines={"late": 0.2},
+            defaults={"stuck": [], "late": "–"},
+            deadline=0.1,
+        )
+        assert results == {"fast": 1, "stuck": [], "late": "–"}
+        # Deadlines count from the start of the fetch, not one after another
+        assert time.monotonic() - started < 0.5
+    finally:
+        release.set()
+
+
+def test_a_failed_need_gets_its_default_or_none():
+    def broken():
+        raise RuntimeError("boom")
+
+    results = ParallelFetcher().fetch({"ok": lambda: "x", "broken": broken, "other": broken}, defaults={"broken": 0})
+    assert results == {"ok": "x", "broken": 0, "other": None}
+
+
+def test_a_missed_deadline_leaves_the_rerun_with_defaults(db):
+    db.db.faults.slow_rate = 1.0
+    db.db.faults.slow_ms = 500
+    results = ParallelFetcher().fetch(
+        {"events": db.get_events, "visitor_count": db.get_visitor_count},
+        defaults={"events": [], "visitor_count": "–"},
+        deadline=0.1,
+    )
+    assert results == {"events": [], "visitor_count": "–"}
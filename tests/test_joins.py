@@ -0,0 +1,78 @@
+import contextlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from nodex.local_backend import create_local_client
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_concurrent_joins_never_overbook(app, backend, tmp_path):
+    # A little latency per round trip so concurrent transactions interleave
+    client = create_local_client({"backend": backend, "sqlite_path": str(tmp_path / "test.db"), "latency_ms": 1})
+    db = app.RealFirestore(client)
+    db.import_events([{"id": "hot", "title_en": "Hot", "date": "2030-05-20 19:00", "max_participants": 5}])
+    users = [f"2024{i:04d}" for i in range(40)]
+    for user_id in users:
+        db.register_user({"id": user_id, "name": f"User {user_id}"})
+
+    start = threading.Barrier(16)
+
+    def join(user_id):
+        with contextlib.suppress(threading.BrokenBarrierError):
+            start.wait(timeout=1)
+        return db.join_event(user_id, "hot", "Hot", f"User {user_id}")
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(join, users))
+
+    event = client.collection("events").document("hot").get().to_dict()
+    assert results.count(True) == 5
+    assert results.count("event_full") == len(users) - 5
+    assert event["current_participants"] == 5
+    assert len(event["participant_names"]) == 5
+    joined = [user_id for user_id in users if db.get_user_events(user_id)]
+    assert len(joined) == 5
+
+
+def legacy_join(client, user_id, event_id, event_title, user_name):
+    """The read-modify-write join that join_event replaced: four sequential round trips."""
+    from google.cloud.firestore import Increment
+
+    user_ref = client.collection("users").document(user_id)
+    event_ref = client.collection("events").document(event_id)
+    joined_events = user_ref.get().to_dict().get("joined_events", [])
+    event_data = event_ref.get().to_dict()
+    user_ref.update({"joined_events": joined_events + [{"event_id": event_id, "event_title": event_title}]})
+    event_ref.update({
+        "current_participants": Increment(1),
+        "participant_names": event_data.get("participant_names", []) + [user_name],
+    })
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_join_takes_fewer_round_trips_than_read_modify_write(app, backend, tmp_path):
+    latency_ms = 25
+    client = create_local_client({"backend": backend, "sqlite_path": str(tmp_path / "test.db"), "latency_ms": latency_ms})
+    db = app.RealFirestore(client)
+    db.import_events([
+        {"id": "a", "title_en": "A", "date": "2030-05-20 19:00"},
+        {"id": "b", "title_en": "B", "date": "2030-05-21 19:00"},
+    ])
+    db.register_user({"id": "20240001", "name": "Kim"})
+
+    before, started = db.op_counts(), time.perf_counter()
+    assert db.join_event("20240001", "a", "A", "Kim") is True
+    join_seconds, join_ops = time.perf_counter() - started, db.op_counts(since=before)
+
+    before, started = db.op_counts(), time.perf_counter()
+    legacy_join(client, "20240001", "b", "B", "Kim")
+    legacy_seconds, legacy_ops = time.perf_counter() - started, db.op_counts(since=before)
+
+    assert join_ops["calls"] == 2
+    assert legacy_ops["calls"] == 4
+    # Each round trip sleeps `latency_ms`, so the two saved ones show up on the clock too
+    assert join_seconds < legacy_seconds
+    assert join_seconds >= join_ops["calls"] * latency_ms / 1000
@@ -0,0 +1,58 @@
+import pytest
+
+from nodex.local_backend import create_local_client
+from nodex.metering import CountingFirestore, DatastoreMeter
+from nodex.resilience import ParallelFetcher
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_parallel_fetches_are_metered_separately(app, backend, tmp_path):
+    # Latency keeps the fetches in flight together, so each one's reads overlap its siblings'
+    client = create_local_client({"backend": backend, "sqlite_path": str(tmp_path / "test.db"), "latency_ms": 20})
+    db = app.RealFirestore(client)
+    db.seed_events()
+    event_id = db.get_events()[0]["id"]
+    db.add_review({"event_id": event_id, "rating": 5, "user": "a", "comment": "great"})
+    meter = DatastoreMeter()
+    db = app.RealFirestore(client, meter=meter)
+
+    before = db.op_counts()
+    ParallelFetcher().fetch({
+        "events": db.get_events,
+        "past": db.get_past_events,
+        "reviews": db.get_reviews,
+        "visitors": db.get_visitor_count,
+        "users": db.get_user_count,
+    })
+    spent = db.op_counts(since=before)
+
+    methods, pages = meter.snapshot()
+    assert spent["reads"] > 0
+    assert sum(stats["reads"] for stats in methods.values()) == spent["reads"]
+    assert pages["background"]["reads"] == spent["reads"]
+
+
+def test_meter_keeps_totals_for_recent_sessions():
+    meter = DatastoreMeter(max_sessions=2)
+    for session_id, reads in (("a" * 32, 5), ("b" * 32, 1), ("c" * 32, 3)):
+        meter.begin_rerun("home", session_id)
+        meter.record("get_events", 0.01, reads, 0)
+
+    top = meter.top_sessions()
+    assert [(session_id[0], stats["reads"], stats["page"]) for session_id, stats in top] == [("c", 3, "home"), ("b", 1, "home")]
+    assert meter.snapshot()[1]["home"]["reads"] == 9
+
+
+class FakeClient:
+    def get_all(self, refs, transaction=None):
+        return iter([f"doc-{ref}" for ref in refs])
+
+
+def test_stream_reads_are_counted_as_documents_arrive():
+    client = CountingFirestore(FakeClient())
+    # Stops after the first document, as the review transactions do
+    assert next(iter(client.get_all(["a", "b", "c"]))) == "doc-a"
+    assert client.op_counts() == {"calls": 1, "reads": 1, "writes": 0}
+
+    assert list(client.get_all(["d", "e"])) == ["doc-d", "doc-e"]
+    assert client.op_counts() == {"calls": 2, "reads": 3, "writes": 0}
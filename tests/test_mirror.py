@@ -0,0 +1,77 @@
+import time
+
+import pytest
+
+import nodex.mirror
+from nodex.mirror import SnapshotMirror
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            pytest.fail("Timed out waiting for the mirror")
+        time.sleep(0.02)
+
+
+class FlakySource:
+    """Passes listeners through to a client until `down` is set, then refuses them."""
+
+    def __init__(self, client):
+        self.client = client
+        self.down = False
+
+    def collection(self, name):
+        if self.down:
+            raise ConnectionError("listener refused")
+        return self.client.collection(name)
+
+
+@pytest.fixture
+def mirror(db):
+    mirror = SnapshotMirror(FlakySource(db.db), check_interval=0.05)
+    wait_until(lambda: mirror.is_live("events") and mirror.is_live("reviews"))
+    yield mirror
+    mirror.stop()
+
+
+def test_listing_reads_are_served_from_the_mirror(app, db, mirror):
+    session = app.RealFirestore(db.db, mirror=mirror)
+    before = session.op_counts()
+    events = session.get_events()
+    assert session.op_counts(since=before)["reads"] == 0
+    assert sorted(e["id"] for e in events) == sorted(e["id"] for e in db.get_events())
+
+
+def test_writes_reach_the_mirror_and_the_writer_reads_its_own(app, db, mirror):
+    reader = app.RealFirestore(db.db, mirror=mirror)
+    writer = app.RealFirestore(db.db, mirror=mirror)
+    event_id = reader.get_events()[0]["id"]
+
+    writer.update_event(event_id, {"title_en": "Renamed"})
+    # Within its grace period the writer reads Firestore, so it sees the change at once
+    assert writer._reader("events") is db.db
+    assert next(e for e in writer.get_events() if e["id"] == event_id)["title_en"] == "Renamed"
+    wait_until(lambda: next(e for e in reader.get_events() if e["id"] == event_id)["title_en"] == "Renamed")
+
+
+def test_a_disconnected_mirror_goes_stale_then_is_bypassed(app, db, mirror, monkeypatch):
+    monkeypatch.setattr(nodex.mirror, "MIRROR_MAX_STALE_SECONDS", 0.5)
+    monkeypatch.setattr(nodex.mirror, "MIRROR_MAX_BACKOFF_SECONDS", 0.05)
+    session = app.RealFirestore(db.db, mirror=mirror)
+
+    mirror._source.down = True
+    mirror._state["events"]["watch"].unsubscribe()
+    wait_until(lambda: mirror.staleness("events") > 0)
+    assert mirror.status()["events"]["state"] == "reconnecting"
+    # Still served, marked stale, until it has been down too long
+    assert mirror.is_live("events")
+    wait_until(lambda: not mirror.is_live("events"))
+    assert session._reader("events") is db.db
+    assert mirror.is_live("reviews")
+
+    mirror._source.down = False
+    wait_until(lambda: mirror.is_live("events"))
+    assert mirror.staleness("events") == 0
+    assert mirror.status()["events"]["reconnects"] == 1
+    assert session._reader("events") is mirror.client
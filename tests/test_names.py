@@ -0,0 +1,56 @@
+import pytest
+
+
+@pytest.mark.parametrize("raw, normalized", [
+    ("Kim Minji", "kim minji"),
+    ("  KIM   minji ", "kim minji"),
+    ("Straße", "strasse"),
+    ("", ""),
+    (None, ""),
+])
+def test_normalize_name(app, raw, normalized):
+    assert app.normalize_name(raw) == normalized
+
+
+def test_names_resolve_ignoring_case_and_whitespace(db):
+    db.register_user({"id": "20240001", "name": "Kim Minji"})
+    assert db.resolve_user_id("  kim   MINJI ") == "20240001"
+    assert db.get_user_by_name("KIM MINJI")["id"] == "20240001"
+    assert db.resolve_user_id("Kim Min") is None
+
+
+def test_resolution_is_one_get_then_a_cache_hit(db):
+    db.register_user({"id": "20240001", "name": "Kim Minji"})
+    before = db.op_counts()
+    db.resolve_user_id("Kim Minji")
+    assert db.op_counts(since=before) == {"calls": 1, "reads": 1, "writes": 0}
+    before = db.op_counts()
+    db.resolve_user_id("kim minji")
+    assert db.op_counts(since=before)["calls"] == 0
+
+
+def test_duplicate_names_resolve_to_the_earliest_registration(app, db):
+    db.register_user({"id": "20240002", "name": "Lee Jiwoo", "created_at": "2024-03-01"})
+    db.register_user({"id": "20240001", "name": "lee jiwoo", "created_at": "2024-03-05"})
+    assert db.resolve_user_id("Lee Jiwoo") == "20240002"
+
+    # The rebuilt index orders by registration date, then student ID
+    users = db.db.collection("users")
+    users.document("20230009").set({"id": "20230009", "name": "LEE JIWOO", "created_at": "2024-03-01"})
+    assert db.rebuild_name_index() == 1
+    assert app.RealFirestore(db.db).resolve_user_id("lee jiwoo") == "20230009"
+
+
+def test_renaming_a_member_moves_them_in_the_index(db):
+    db.register_user({"id": "20240001", "name": "Park"})
+    assert db.resolve_user_id("park") == "20240001"
+    db.register_user({"id": "20240001", "name": "Choi"})
+    assert db.resolve_user_id("park") is None
+    assert db.resolve_user_id("choi") == "20240001"
+
+
+def test_members_missing_from_the_index_are_found_until_it_is_rebuilt(db):
+    db.db.collection("users").document("20220001").set({"id": "20220001", "name": "Jung Hoseok"})
+    assert db.resolve_user_id("Jung  Hoseok") == "20220001"
+    assert db.rebuild_name_index() == 1
+    assert db.resolve_user_id("jung hoseok") == "20220001"
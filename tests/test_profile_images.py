@@ -0,0 +1,64 @@
+import io
+
+import pytest
+from PIL import Image, UnidentifiedImageError
+
+
+def png_bytes(width, height, color=(200, 40, 40)):
+    out = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(out, format="PNG")
+    return out.getvalue()
+
+
+def test_make_thumbnails_crops_to_squares(app):
+    thumbnails = app.make_thumbnails(png_bytes(300, 200))
+    assert sorted(thumbnails) == sorted(app.PROFILE_THUMBNAIL_SIZES)
+    for size, data in thumbnails.items():
+        with Image.open(io.BytesIO(data)) as thumb:
+            assert thumb.format == "WEBP"
+            assert thumb.size == (size, size)
+
+
+def test_make_thumbnails_rejects_non_images(app):
+    with pytest.raises(UnidentifiedImageError):
+        app.make_thumbnails(b"not an image")
+
+
+def test_pipeline_stores_thumbnails_and_references_them(app, db, tmp_path):
+    db.register_user({"id": "20240001", "name": "Kim", "profile_image": "data:image/png;base64,AAAA"})
+    pipeline = app.ImagePipeline(app.LocalBlobStore(str(tmp_path / "blobs")))
+
+    digest = pipeline.submit_profile_image(db, "20240001", png_bytes(64, 64)).result(timeout=10)
+
+    user = db.get_user_by_id("20240001")
+    assert user["profile_image_ref"] == {"hash": digest, "sizes": list(app.PROFILE_THUMBNAIL_SIZES)}
+    assert "profile_image" not in user
+    with Image.open(io.BytesIO(pipeline.get_thumbnail(user["profile_image_ref"], size=100))) as thumb:
+        assert thumb.size == (128, 128)
+
+
+def test_identical_uploads_are_processed_once(app, db, tmp_path, monkeypatch):
+    decoded = []
+    make_thumbnails = app.make_thumbnails
+    monkeypatch.setattr(app, "make_thumbnails", lambda data: decoded.append(data) or make_thumbnails(data))
+    pipeline = app.ImagePipeline(app.LocalBlobStore(str(tmp_path / "blobs")))
+    data = png_bytes(80, 80)
+    for user_id in ("20240001", "20240002"):
+        db.register_user({"id": user_id, "name": f"User {user_id}"})
+
+    first = pipeline.submit_profile_image(db, "20240001", data).result(timeout=10)
+    second = pipeline.submit_profile_image(db, "20240002", data).result(timeout=10)
+
+    assert first == second
+    assert len(decoded) == 1
+    assert db.get_user_by_id("20240002")["profile_image_ref"]["hash"] == first
+
+
+def test_failed_processing_leaves_the_user_unchanged(app, db, tmp_path):
+    db.register_user({"id": "20240001", "name": "Kim"})
+    pipeline = app.ImagePipeline(app.LocalBlobStore(str(tmp_path / "blobs")))
+
+    future = pipeline.submit_profile_image(db, "20240001", b"not an image")
+
+    assert isinstance(future.exception(timeout=10), UnidentifiedImageError)
+    assert "profile_image_ref" not in db.get_user_by_id("20240001")
@@ -0,0 +1,17 @@
+from nodex.profiling import RenderProfiler
+
+
+def test_only_one_rerun_at_a_time_runs_under_cprofile(tmp_path):
+    profiler = RenderProfiler(enabled=True, slow_rerun_ms=0, cprofile=True, trace_dir=str(tmp_path))
+    first = profiler.begin("home", "a1b2c3d4e5")
+    # Overlapping reruns are still traced, just without cProfile
+    second = profiler.begin("events", "b1b2c3d4e5")
+    assert first.profile is not None
+    assert second.profile is None
+    profiler.end(second)
+    profiler.end(first)
+
+    third = profiler.begin("home", "c1b2c3d4e5")
+    assert third.profile is not None
+    profiler.end(third)
+    assert sorted(path.suffix for path in tmp_path.iterdir()) == [".json", ".json", ".json", ".prof", ".prof"]
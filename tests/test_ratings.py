@@ -0,0 +1,58 @@
+def review(event_id, rating, user="a"):
+    return {"event_id": event_id, "rating": rating, "user": user, "comment": ""}
+
+
+def summary(db, event_id):
+    rating = db.get_event_ratings([event_id]).get(event_id)
+    return rating and (rating["count"], rating["sum"], rating["average"], rating["histogram"])
+
+
+def test_aggregates_follow_adds_updates_and_deletes(db):
+    event_id, other_id = [event["id"] for event in db.get_events()[:2]]
+    five = db.add_review(review(event_id, 5)).id
+    db.add_review(review(event_id, 4))
+    three = db.add_review(review(event_id, 3)).id
+    db.add_review(review(other_id, 1))
+    assert summary(db, event_id) == (3, 12, 4.0, {"5": 1, "4": 1, "3": 1})
+
+    db.update_review(three, {"is_visible": False})
+    assert summary(db, event_id) == (2, 9, 4.5, {"5": 1, "4": 1})
+    # Hiding it again changes nothing; showing it counts it back
+    db.update_review(three, {"is_visible": False})
+    db.update_review(three, {"is_visible": True})
+    assert summary(db, event_id) == (3, 12, 4.0, {"5": 1, "4": 1, "3": 1})
+
+    db.delete_review(five)
+    db.delete_review(five)
+    assert summary(db, event_id) == (2, 7, 3.5, {"4": 1, "3": 1})
+    assert summary(db, other_id) == (1, 1, 1.0, {"1": 1})
+
+
+def test_ratings_for_several_events_are_one_read_each_then_cached(db):
+    event_ids = [event["id"] for event in db.get_events()[:3]]
+    db.add_review(review(event_ids[0], 5))
+    before = db.op_counts()
+    ratings = db.get_event_ratings(event_ids)
+    assert db.op_counts(since=before) == {"calls": 1, "reads": 3, "writes": 0}
+    assert list(ratings) == [event_ids[0]]
+    before = db.op_counts()
+    db.get_event_ratings(event_ids)
+    assert db.op_counts(since=before)["calls"] == 0
+
+
+def test_rebuild_recomputes_aggregates_from_reviews(db):
+    event_id, other_id = [event["id"] for event in db.get_events()[:2]]
+    db.add_review(review(event_id, 5))
+    db.add_review(review(event_id, 2))
+    expected = summary(db, event_id)
+    # Aggregates that drifted, and reviews written without them
+    ratings = db.db.collection("event_ratings")
+    ratings.document(event_id).set({"event_id": event_id, "count": 9, "sum": 9, "histogram": {"1": 9}})
+    ratings.document("deleted-event").set({"event_id": "deleted-event", "count": 1, "sum": 5, "histogram": {"5": 1}})
+    db.db.collection("reviews").document("legacy").set({**review(other_id, 4), "is_visible": True})
+    db.db.collection("reviews").document("hidden").set({**review(other_id, 1), "is_visible": False})
+
+    assert db.rebuild_rating_aggregates() == 2
+    assert summary(db, event_id) == expected
+    assert summary(db, other_id) == (1, 4, 4.0, {"4": 1})
+    assert not ratings.document("deleted-event").get().exists
@@ -0,0 +1,44 @@
+from nodex.caching import ReadCache
+
+
+def test_cached_reads_skip_the_datastore(db):
+    db.get_events()
+    before = db.op_counts()
+    db.get_events()
+    db.get_reviews()
+    db.get_reviews()
+    spent = db.op_counts(since=before)
+    assert spent["calls"] == 1
+
+
+def test_writes_from_another_session_invalidate_shared_reads(app, db):
+    other = app.RealFirestore(db.db, cache=db.cache)
+    events = db.get_events()
+    event_id = events[0]["id"]
+
+    other.update_event(event_id, {"title_en": "Renamed"})
+    assert next(e for e in db.get_events() if e["id"] == event_id)["title_en"] == "Renamed"
+
+    other.add_event({"title_en": "New", "date": "2030-01-01 10:00"})
+    assert len(db.get_events()) == len(events) + 1
+
+    other.delete_event(event_id)
+    assert event_id not in {e["id"] for e in db.get_events()}
+
+
+def test_a_load_racing_an_invalidation_is_not_stored():
+    cache = ReadCache()
+
+    def stale_load():
+        # A write lands while this load is still reading
+        cache.invalidate("events")
+        return ["stale"]
+
+    assert cache.get_or_load(("events", "all"), stale_load) == ["stale"]
+    assert cache.get_or_load(("events", "all"), lambda: ["fresh"]) == ["fresh"]
+    assert cache.get_or_load(("events", "all"), lambda: ["unused"]) == ["fresh"]
+
+
+def test_cached_values_are_copies(db):
+    db.get_events()[0]["title_en"] = "Mutated by a caller"
+    assert db.get_events()[0]["title_en"] != "Mutated by a caller"
@@ -0,0 +1,96 @@
+import contextlib
+import threading
+import time
+
+import pytest
+
+from nodex.local_backend import create_local_client
+from nodex.resilience import (
+    DATASTORE_CALL_WORKERS, CircuitBreaker, DatastoreTimeout, DatastoreUnavailable, LastGoodReads, resilient,
+    run_with_deadline,
+)
+
+
+def test_run_with_deadline_fails_fast_when_workers_are_busy():
+    release = threading.Event()
+    try:
+        for _ in range(DATASTORE_CALL_WORKERS):
+            with pytest.raises(DatastoreTimeout):
+                run_with_deadline(release.wait, 0.01)
+        started = time.monotonic()
+        with pytest.raises(DatastoreTimeout, match="busy"):
+            run_with_deadline(lambda: "never runs", 5)
+        assert time.monotonic() - started < 1
+    finally:
+        release.set()
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        try:
+            assert run_with_deadline(lambda: "ok", 1) == "ok"
+            break
+        except DatastoreTimeout:
+            time.sleep(0.01)
+    else:
+        pytest.fail("Workers were not released after their calls returned")
+
+
+def test_half_open_trial_ignores_calls_served_from_cache(app):
+    client = create_local_client({"backend": "memory"})
+    breaker = CircuitBreaker(threshold=1, reset_seconds=0.05)
+    db = app.RealFirestore(client, breaker=breaker, last_good=LastGoodReads())
+    db.seed_events()
+    events = db.get_events()
+
+    client.faults.error_rate = 1.0
+    with pytest.raises(DatastoreUnavailable):
+        db.get_user_by_id("nobody")
+    assert breaker.status()["state"] == breaker.OPEN
+    time.sleep(0.06)
+
+    # A cache hit takes the trial slot but must neither close the breaker nor keep the slot
+    assert db.get_events() == events
+    assert breaker.status()["state"] == breaker.HALF_OPEN
+    with pytest.raises(DatastoreUnavailable):
+        db.get_user_by_id("nobody")
+    assert breaker.status()["state"] == breaker.OPEN
+
+
+class SlowStore:
+    """Just enough of RealFirestore for @resilient: calls that take 50 ms."""
+
+    def __init__(self):
+        self.breaker = CircuitBreaker()
+        self.last_good = None
+        self.stale_reads = {}
+        self.threads = []
+
+    def _await_warmup(self):
+        pass
+
+    def op_counts(self, since=None):
+        return None
+
+    def op_scope(self):
+        return contextlib.nullcontext()
+
+    def _slow_call(self):
+        time.sleep(0.05)
+        self.threads.append(threading.current_thread())
+
+    read = resilient("read", deadline=0.01)(_slow_call)
+    write = resilient("write")(_slow_call)
+
+
+def test_slow_writes_run_to_completion_on_the_callers_thread():
+    store = SlowStore()
+    with pytest.raises(DatastoreUnavailable):
+        store.read()
+    assert store.threads == []
+    # The abandoned read finishes in the background, after its caller gave up
+    time.sleep(0.1)
+    assert len(store.threads) == 1
+
+    # A write is never abandoned like that: its caller learns whether it was applied
+    store.threads.clear()
+    store.write()
+    assert store.threads == [threading.current_thread()]
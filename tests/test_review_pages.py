@@ -0,0 +1,44 @@
+def add_stored_reviews(db, count, hidden=()):
+    reviews = db.db.collection("reviews")
+    for i in range(count):
+        # Three reviews per minute, so pages also break inside runs of equal timestamps
+        reviews.document(f"r{i:03d}").set({
+            "event_id": "e", "rating": 5, "user": f"u{i}", "comment": "",
+            "created_at": f"2026-10-18 10:{i // 3:02d}", "is_visible": i not in hidden,
+        })
+
+
+def read_all_pages(db, limit):
+    pages, cursor = [], None
+    while True:
+        before = db.op_counts()
+        reviews, cursor = db.get_visible_reviews_page(limit=limit, after=cursor)
+        assert db.op_counts(since=before)["reads"] <= max(limit, 1)
+        pages.append([review["id"] for review in reviews])
+        if cursor is None:
+            return pages
+
+
+def test_pages_cover_every_visible_review_once_newest_first(db):
+    add_stored_reviews(db, 30, hidden={4, 17})
+    pages = read_all_pages(db, limit=12)
+
+    assert [len(page) for page in pages] == [12, 12, 4]
+    ids = [review_id for page in pages for review_id in page]
+    expected = sorted((f"r{i:03d}" for i in range(30) if i not in {4, 17}), key=lambda r: (int(r[1:]) // 3, r), reverse=True)
+    assert ids == expected
+
+
+def test_a_full_last_page_is_followed_by_an_empty_one(db):
+    add_stored_reviews(db, 24)
+    pages = read_all_pages(db, limit=12)
+    assert [len(page) for page in pages] == [12, 12, 0]
+
+
+def test_newly_hidden_reviews_drop_out_of_later_pages(db):
+    add_stored_reviews(db, 10)
+    _, cursor = db.get_visible_reviews_page(limit=5)
+    db.update_review("r000", {"is_visible": False})
+    rest, cursor = db.get_visible_reviews_page(limit=5, after=cursor)
+    assert cursor is None
+    assert [review["id"] for review in rest] == ["r004", "r003", "r002", "r001"]
@@ -0,0 +1,60 @@
+from datetime import date
+
+import pytest
+
+
+@pytest.mark.parametrize("period, day, key, start", [
+    ("day", date(2026, 10, 18), "2026-10-18", date(2026, 10, 18)),
+    ("week", date(2026, 10, 18), "2026-W42", date(2026, 10, 12)),
+    # ISO weeks belong to the year their Monday is in
+    ("week", date(2026, 1, 1), "2026-W01", date(2025, 12, 29)),
+    ("week", date(2024, 12, 31), "2025-W01", date(2024, 12, 30)),
+    ("month", date(2026, 2, 28), "2026-02", date(2026, 2, 1)),
+])
+def test_period_key(app, period, day, key, start):
+    got_key, got_start = app.period_key(period, day)
+    assert got_key == key
+    assert got_start.date() == start
+    assert (got_start.hour, got_start.minute) == (0, 0)
+
+
+def test_period_key_rejects_unknown_periods(app):
+    with pytest.raises(ValueError):
+        app.period_key("year", date(2026, 1, 1))
+
+
+def test_period_range(app):
+    def keys(period, first_day, last_day):
+        return [key for key, _ in app.period_range(period, first_day, last_day)]
+
+    assert keys("day", date(2026, 2, 27), date(2026, 3, 1)) == ["2026-02-27", "2026-02-28", "2026-03-01"]
+    assert keys("week", date(2026, 10, 1), date(2026, 10, 18)) == ["2026-W40", "2026-W41", "2026-W42"]
+    assert keys("month", date(2025, 11, 30), date(2026, 2, 1)) == ["2025-11", "2025-12", "2026-01", "2026-02"]
+    assert keys("month", date(2026, 3, 1), date(2026, 2, 1)) == []
+
+
+def test_series_roll_up_into_weeks_and_months(db):
+    db.flush_visits({"2026-09-28": 2, "2026-09-30": 3, "2026-10-05": 4})
+    db.flush_visits({"2026-09-30": 1})
+
+    days = db.get_stats_series("visits", "day", date(2026, 9, 29), date(2026, 10, 1))
+    assert [(p["key"], p["count"]) for p in days] == [("2026-09-29", 0), ("2026-09-30", 4), ("2026-10-01", 0)]
+    weeks = db.get_stats_series("visits", "week", date(2026, 9, 28), date(2026, 10, 11))
+    assert [(p["key"], p["count"]) for p in weeks] == [("2026-W40", 6), ("2026-W41", 4)]
+    months = db.get_stats_series("visits", "month", date(2026, 9, 1), date(2026, 10, 31))
+    assert [(p["key"], p["count"]) for p in months] == [("2026-09", 6), ("2026-10", 4)]
+
+
+def test_rebuilt_rollups_match_the_daily_counts(db):
+    for i, created_at in enumerate(["2026-09-28", "2026-09-28", "2026-10-02", "2026-10-31"]):
+        db.register_user({"id": f"2024{i:04d}", "name": f"User {i}", "created_at": created_at})
+    # A rollup that drifted from its days
+    db._series_ref("registrations", "month", "2026-10").set({"count": 99}, merge=True)
+
+    db.rebuild_series_rollups("registrations")
+    db.cache.clear()
+
+    months = db.get_stats_series("registrations", "month", date(2026, 9, 1), date(2026, 10, 31))
+    assert [p["count"] for p in months] == [2, 2]
+    weeks = db.get_stats_series("registrations", "week", date(2026, 9, 28), date(2026, 10, 4))
+    assert [p["count"] for p in weeks] == [3]
@@ -0,0 +1,93 @@
+import os
+
+from nodex.local_backend import create_local_client
+from nodex.write_queue import VisitBuffer, WriteQueue
+
+
+def make_queued_db(app, tmp_path):
+    client = create_local_client({"backend": "memory"})
+    writer = app.RealFirestore(client)
+    queue = WriteQueue(str(tmp_path / "queue.db"), {"review": writer.add_reviews})
+    # Stop the worker so writes stay queued until the test drains them
+    queue.close()
+    db = app.RealFirestore(client, write_queue=queue)
+    db.seed_events()
+    return db, queue
+
+
+def test_visits_from_many_sessions_are_queued_as_one_write(app, tmp_path):
+    client = create_local_client({"backend": "memory"})
+    writer = app.RealFirestore(client)
+    queue = WriteQueue(str(tmp_path / "queue.db"), {"visit": lambda visits: writer.flush_visits(visits[0]["counts"])})
+    queue.close()
+    buffer = VisitBuffer(lambda counts: queue.enqueue("visit", {"counts": counts}), interval=3600)
+    sessions = [app.RealFirestore(client, write_queue=queue, visit_buffer=buffer) for _ in range(25)]
+    for session in sessions:
+        session.log_visit()
+    assert queue.stats()["depth"] == 0
+    assert sessions[0].get_visitor_count() == 25
+
+    buffer.flush()
+    assert queue.stats()["by_kind"] == {"visit": 1}
+    assert sessions[0].get_visitor_count() == 25
+    queue.drain()
+    buffer.close()
+    assert app.RealFirestore(client).get_visitor_count() == 25
+
+
+def test_visits_are_kept_when_a_flush_fails():
+    flushed = []
+
+    def flush(counts):
+        if not flushed:
+            flushed.append(None)
+            raise TimeoutError("datastore is slow")
+        flushed.append(counts)
+
+    buffer = VisitBuffer(flush, interval=3600)
+    buffer.add("2026-10-18", 3)
+    buffer.flush()
+    assert buffer.pending("2026-10-18") == 3
+    buffer.add("2026-10-18")
+    buffer.close()
+    assert flushed[1:] == [{"2026-10-18": 4}]
+    assert buffer.pending("2026-10-18") == 0
+
+
+def test_a_queue_without_a_path_removes_its_directory_on_close():
+    queue = WriteQueue(None, {})
+    directory = os.path.dirname(queue.path)
+    assert os.path.exists(queue.path)
+    queue.close()
+    assert not os.path.exists(directory)
+
+
+def test_moderating_a_queued_review_changes_what_is_stored(app, tmp_path):
+    db, queue = make_queued_db(app, tmp_path)
+    event_id = db.get_events()[0]["id"]
+    hidden = db.add_review({"event_id": event_id, "rating": 5, "user": "a", "comment": "hide me"}).id
+    deleted = db.add_review({"event_id": event_id, "rating": 1, "user": "b", "comment": "delete me"}).id
+
+    db.update_review(hidden, {"is_visible": False})
+    db.delete_review(deleted)
+    assert [review["id"] for review in db.get_visible_reviews_page()[0]] == []
+    assert db.get_event_ratings([event_id]) == {}
+
+    queue.drain()
+    assert queue.stats()["depth"] == 0
+    stored = {review["id"]: review for review in db.get_reviews()}
+    assert stored[hidden]["is_visible"] is False
+    assert deleted not in stored
+    assert db.get_event_ratings([event_id]) == {}
+
+
+def test_moderating_a_stored_review_updates_the_datastore(app, tmp_path):
+    db, queue = make_queued_db(app, tmp_path)
+    event_id = db.get_events()[0]["id"]
+    review_id = db.add_review({"event_id": event_id, "rating": 4, "user": "a", "comment": "ok"}).id
+    queue.drain()
+
+    db.update_review(review_id, {"is_visible": False})
+    assert [review["is_visible"] for review in db.get_reviews()] == [False]
+    db.delete_review(review_id)
+    assert db.get_reviews() == []